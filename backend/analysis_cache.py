@@ -0,0 +1,232 @@
+"""
+Content-addressed cache for analysis results
+Keyed by the SHA-256 of the uploaded bytes plus the model version, so /report
+and any re-analysis of the same file skip decoding, validation and the model.
+
+Two tiers:
+- in-memory LRU bounded by an estimate of the bytes held (analysis dict + decoded images).
+  Lazy AnalysisImages report every render and encoding back, so an entry is re-sized
+  (and older entries evicted) as its images are drawn after put()
+- optional on-disk tier (pickle files in a private directory, LRU by access time)
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+CachedAnalysis = Tuple[Dict[str, Any], Dict[str, Image.Image]]
+
+
+def estimate_analysis_bytes(analysis: Dict[str, Any]) -> int:
+    """Approximate memory held by an analysis dict"""
+    return len(pickle.dumps(analysis, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def estimate_images_bytes(images: Dict[str, Image.Image]) -> int:
+    """Approximate memory held by decoded images"""
+    if hasattr(images, "nbytes"):
+        # Lazy AnalysisImages: count what is rendered now, without forcing the rest
+        return images.nbytes()
+    return sum(
+        image.width * image.height * len(image.getbands()) for image in images.values() if image is not None
+    )
+
+
+def estimate_entry_bytes(analysis: Dict[str, Any], images: Dict[str, Image.Image]) -> int:
+    """Approximate memory held by one cached analysis"""
+    return estimate_analysis_bytes(analysis) + estimate_images_bytes(images)
+
+
+class AnalysisCache:
+    """Size-bounded LRU of (analysis, images) with an optional disk tier"""
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 2 * 1024 * 1024 * 1024,
+    ):
+        """
+        Args:
+            max_memory_bytes: Upper bound for the in-memory tier (0 disables it)
+            disk_dir: Directory for the on-disk tier (None disables it)
+            max_disk_bytes: Upper bound for the on-disk tier
+        """
+        self.max_memory_bytes = max(0, int(max_memory_bytes))
+        self.max_disk_bytes = max(0, int(max_disk_bytes))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[CachedAnalysis, int]]" = OrderedDict()
+        self._memory_bytes = 0
+
+        # Metrics
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_evictions = 0
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_hash: str, model_version: str) -> str:
+        """Cache key for an upload; changing the model invalidates every entry"""
+        version = hashlib.sha256(model_version.encode("utf-8")).hexdigest()[:16]
+        return f"{file_hash}-{version}"
+
+    def get(self, file_hash: str, model_version: str) -> Optional[CachedAnalysis]:
+        """
+        Look up a cached analysis
+
+        Returns:
+            (analysis, images) or None. Returned objects are shared - treat them as read-only.
+        """
+        key = self.make_key(file_hash, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+        self._admit(key, value)
+        return value
+
+    def put(self, file_hash: str, model_version: str, analysis: Dict[str, Any], images: Dict[str, Image.Image]):
+        """Store an analysis and its rendered images in both tiers"""
+        key = self.make_key(file_hash, model_version)
+        value = (analysis, images)
+        self._admit(key, value)
+        self._write_disk(key, value)
+
+    def _admit(self, key: str, value: CachedAnalysis):
+        """
+        Size an entry and store it in memory. Sizes are measured before taking the
+        lock, so the cache never waits on an AnalysisImages lock while holding its own.
+        """
+        analysis, images = value
+        analysis_bytes = estimate_analysis_bytes(analysis)
+        if hasattr(images, "size_listener"):
+            images.size_listener = partial(self._resize, key, value, analysis_bytes)
+        size = analysis_bytes + estimate_images_bytes(images)
+        with self._lock:
+            self._store_memory(key, value, size)
+
+    def _resize(self, key: str, value: CachedAnalysis, analysis_bytes: int, images_bytes: int):
+        """AnalysisImages size_listener: re-account an entry whose images were rendered or encoded"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is value:
+                self._store_memory(key, value, analysis_bytes + images_bytes)
+
+    def _store_memory(self, key: str, value: CachedAnalysis, size: int):
+        """Insert into the LRU and evict the oldest entries past the bound (caller holds the lock)"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[1]
+        if size > self.max_memory_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._evictions += 1
+
+    # ----------------- disk tier -----------------
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.pkl"
+
+    def _read_disk(self, key: str) -> Optional[CachedAnalysis]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # access time drives disk LRU
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Dropping unreadable cache file {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, value: CachedAnalysis):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Failed to write cache file {path.name}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        total = 0
+        for path in self.disk_dir.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self._disk_evictions += 1
+
+    # ----------------- admin -----------------
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+        if self.disk_dir is not None:
+            for path in self.disk_dir.glob("*.pkl"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_enabled": self.disk_dir is not None,
+                "max_disk_bytes": self.max_disk_bytes if self.disk_dir is not None else 0,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": ((self._hits + self._disk_hits) / lookups) if lookups else 0.0,
+                "evictions": self._evictions,
+                "disk_evictions": self._disk_evictions,
+            }
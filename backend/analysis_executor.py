@@ -0,0 +1,118 @@
+"""
+Bounded executor for the CPU-bound analysis pipeline
+Runs decoding, validation, inference and PDF generation off the event loop so
+lightweight routes stay responsive, and rejects work when the wait queue is full
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue is full and the request should be retried later"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnalysisExecutor:
+    """Thread pool with a concurrency limit and a bounded wait queue"""
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 8, retry_after: int = 5):
+        """
+        Args:
+            max_concurrency: Analyses allowed to run at the same time
+            max_queue: Analyses allowed to wait for a free slot before new ones are rejected
+            retry_after: Seconds suggested to rejected clients (Retry-After header)
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after = int(retry_after)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._pending = 0  # running + waiting
+        self._running = 0
+
+        # Metrics
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait_s = 0.0
+        self._max_wait_s = 0.0
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Schedule fn(*args, **kwargs) on the pool
+
+        Returns:
+            concurrent.futures.Future resolving to (result, queue_wait_seconds)
+
+        Raises:
+            QueueFullError: If max_concurrency analyses are running and max_queue are already waiting
+        """
+        with self._lock:
+            if self._pending >= self.max_concurrency + self.max_queue:
+                self._rejected += 1
+                raise QueueFullError(self.retry_after)
+            self._pending += 1
+
+        submitted = time.perf_counter()
+        # The task sees the submitter's context variables (e.g. the request's stage timings)
+        context = contextvars.copy_context()
+
+        def task():
+            wait = time.perf_counter() - submitted
+            with self._lock:
+                self._running += 1
+                self._total_wait_s += wait
+                self._max_wait_s = max(self._max_wait_s, wait)
+            try:
+                return context.run(fn, *args, **kwargs), wait
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        try:
+            future = self._pool.submit(task)
+        except Exception:
+            self._release(None)
+            raise
+        # Released on completion or cancellation (e.g. client disconnected before it started)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, float]:
+        """
+        Run fn(*args, **kwargs) on the pool without blocking the event loop
+
+        Returns:
+            Tuple of (result, queue_wait_seconds)
+
+        Raises:
+            QueueFullError: If max_concurrency analyses are running and max_queue are already waiting
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "waiting": self._pending - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_queue_wait_ms": (self._total_wait_s / started * 1000.0) if started else 0.0,
+                "max_queue_wait_ms": self._max_wait_s * 1000.0,
+            }
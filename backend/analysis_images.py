@@ -0,0 +1,203 @@
+"""
+Lazily rendered analysis images
+run_full_analysis returns an AnalysisImages mapping holding the original upload and
+the Grad-CAM heatmap and regions. Each visualization is drawn the first time it is
+read and then kept, so callers that never touch an image never pay for its render.
+"""
+
+import base64
+import hashlib
+import hmac
+import io
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from image_encoding import ImageEncoding, encode_image
+from stage_timing import span
+
+# Analysis image keys -> names used in /analyze responses and image URLs
+IMAGE_NAMES = {
+    "original": "original",
+    "overlay_image": "overlay",
+    "heatmap_only": "heatmap_only",
+    "bbox_image": "bbox",
+    "cancer_type_image": "cancer_type",
+}
+IMAGE_KEYS = {name: key for key, name in IMAGE_NAMES.items()}
+
+
+def decode_image_b64(data: Optional[str]) -> Optional[Image.Image]:
+    """Inverse of pil_to_base64: base64 image string -> RGB PIL image"""
+    if not data:
+        return None
+    image = Image.open(io.BytesIO(base64.b64decode(data)))
+    image.load()
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+class AnalysisImages(Mapping):
+    """Read-only mapping of image key -> PIL image (or None), rendered on first access"""
+
+    def __init__(
+        self,
+        original: Optional[Image.Image],
+        heatmap: Optional[np.ndarray] = None,
+        boxes: Optional[List] = None,
+        regions: Optional[List[Dict[str, Any]]] = None,
+        rendered: Optional[Dict[str, Optional[Image.Image]]] = None,
+        stored_b64: Optional[Dict[str, Optional[str]]] = None,
+    ):
+        """
+        Args:
+            original: The uploaded image (RGB), or None to decode it from stored_b64
+            heatmap: Normalized Grad-CAM heatmap, or None if it could not be generated
+            boxes: Filtered region boxes from compute_gradcam_findings
+            regions: detailed_findings['regions']
+            rendered: Images already available as PIL images
+            stored_b64: Images saved in the database, decoded only when read
+        """
+        self.heatmap = heatmap
+        self.boxes = list(boxes or [])
+        self.regions = list(regions or [])
+        self._images: Dict[str, Optional[Image.Image]] = {}
+        if original is not None:
+            self._images["original"] = original
+        self._images.update({k: v for k, v in (rendered or {}).items() if v is not None})
+        self._stored_b64 = {k: v for k, v in (stored_b64 or {}).items() if v and k not in self._images}
+        self._encoded: Dict[Tuple[str, ImageEncoding], bytes] = {}
+        self._lock = threading.RLock()
+        # Called with nbytes() whenever an image is rendered, decoded or encoded and kept
+        # (set by AnalysisCache, so the entry holding these images is re-sized)
+        self.size_listener: Optional[Callable[[int], None]] = None
+
+    def __getitem__(self, key: str) -> Optional[Image.Image]:
+        if key not in IMAGE_NAMES:
+            raise KeyError(key)
+        with self._lock:
+            if key in self._images:
+                return self._images[key]
+            if key in self._stored_b64:
+                image = decode_image_b64(self._stored_b64.pop(key))
+            else:
+                image = self._render(key)
+            self._images[key] = image
+        self._grew()
+        return image
+
+    def _grew(self):
+        listener = self.size_listener
+        if listener is not None:
+            listener(self.nbytes())
+
+    def __iter__(self):
+        return iter(IMAGE_NAMES)
+
+    def __len__(self) -> int:
+        return len(IMAGE_NAMES)
+
+    def _render(self, key: str) -> Optional[Image.Image]:
+        original = self["original"] if key != "original" else None
+        if self.heatmap is None or original is None:
+            return None
+        from grad_cam import render_gradcam_image  # Imports TensorFlow; only needed once something renders
+
+        with span(f"render_{IMAGE_NAMES[key]}"):
+            return render_gradcam_image(key, original, self.heatmap, self.boxes, self.regions)
+
+    def is_rendered(self, key: str) -> bool:
+        with self._lock:
+            return key in self._images
+
+    def encoded(self, key: str, encoding: ImageEncoding, keep: bool = True) -> Optional[bytes]:
+        """
+        self[key] encoded with encoding; kept per (key, encoding) unless keep is False.
+        None if the image is not available.
+        """
+        with self._lock:
+            cached = self._encoded.get((key, encoding))
+        if cached is not None:
+            return cached
+        image = self[key]
+        if image is None:
+            return None
+        data = encode_image(image, encoding)
+        if keep:
+            with self._lock:
+                self._encoded[(key, encoding)] = data
+            self._grew()
+        return data
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the images rendered and encoded so far"""
+        with self._lock:
+            images = [image for image in self._images.values() if image is not None]
+            size = sum(len(data) for data in self._encoded.values())
+            size += sum(len(data) for data in self._stored_b64.values())
+        size += sum(image.width * image.height * len(image.getbands()) for image in images)
+        return size + (self.heatmap.nbytes if self.heatmap is not None else 0)
+
+    def render_state(self) -> Optional[Dict[str, Any]]:
+        """JSON-serializable heatmap and boxes, enough to render the images again later"""
+        if self.heatmap is None:
+            return None
+        return {
+            "heatmap": np.asarray(self.heatmap, dtype=np.float32).tolist(),
+            "boxes": [[float(v) for v in box] for box in self.boxes],
+        }
+
+    @classmethod
+    def from_render_state(
+        cls,
+        original: Optional[Image.Image],
+        state: Optional[Dict[str, Any]],
+        regions: Optional[List[Dict[str, Any]]] = None,
+        rendered: Optional[Dict[str, Optional[Image.Image]]] = None,
+        stored_b64: Optional[Dict[str, Optional[str]]] = None,
+    ) -> "AnalysisImages":
+        """Inverse of render_state()"""
+        heatmap = np.asarray(state["heatmap"], dtype=np.float32) if state else None
+        boxes = [tuple(box) for box in state.get("boxes", [])] if state else None
+        return cls(original, heatmap, boxes, regions, rendered, stored_b64)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["size_listener"] = None  # Belongs to the cache instance holding these images
+        state["_encoded"] = {}  # Encoded variants are cheap to redo and would bloat the disk cache
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("size_listener", None)
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+
+def sign_image_url(analysis_id: int, secret: str) -> str:
+    """Short HMAC so image URLs work in <img src> without an Authorization header"""
+    digest = hmac.new(secret.encode("utf-8"), f"analysis-images:{analysis_id}".encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:32]
+
+
+def image_url(analysis_id: int, name: str, secret: str, query: str = "") -> str:
+    """Relative URL of GET /analyses/{analysis_id}/images/{name}, with optional extra query parameters"""
+    url = f"/analyses/{analysis_id}/images/{name}?sig={sign_image_url(analysis_id, secret)}"
+    return f"{url}&{query}" if query else url
+
+
+def verify_image_signature(analysis_id: int, sig: Optional[str], secret: str) -> bool:
+    return bool(sig) and hmac.compare_digest(sig, sign_image_url(analysis_id, secret))
+
+
+def image_media_type(data: bytes) -> Optional[str]:
+    """Media type of encoded bytes browsers can display, or None"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
@@ -0,0 +1,134 @@
+"""
+Persisted analyses
+Converts between the analysis dict produced by run_full_analysis and Analysis rows,
+so reports can be rebuilt from the database without re-running the model
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from analysis_images import AnalysisImages
+
+# Analysis dict image keys -> Analysis columns holding them as base64 images
+IMAGE_COLUMNS = {
+    "original": "original_image_b64",
+    "overlay_image": "overlay_image_b64",
+    "heatmap_only": "heatmap_image_b64",
+    "bbox_image": "bbox_image_b64",
+    "cancer_type_image": "cancer_type_image_b64",
+}
+
+
+def analysis_record_fields(
+    analysis: Dict[str, Any],
+    images_b64: Optional[Dict[str, Optional[str]]] = None,
+    render_state: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Column values for an Analysis row
+
+    Args:
+        analysis: Analysis dict (numpy types already converted)
+        images_b64: Optional base64 images keyed like run_full_analysis images
+        render_state: AnalysisImages.render_state(), so missing images can be rendered later
+
+    Returns:
+        Keyword arguments for Analysis(...)
+    """
+    view_analysis = analysis.get("view_analysis", {}) or {}
+    stats = analysis.get("stats", {}) or {}
+    image_size = analysis.get("image_size", {}) or {}
+
+    fields = {
+        "file_format": analysis.get("file_format"),
+        "image_width": image_size.get("width"),
+        "image_height": image_size.get("height"),
+        "result": analysis.get("result"),
+        "confidence": analysis.get("confidence"),
+        "benign_prob": analysis.get("benign_prob"),
+        "malignant_prob": analysis.get("malignant_prob"),
+        "risk_level": analysis.get("risk_level"),
+        "risk_icon": analysis.get("risk_icon"),
+        "risk_color": analysis.get("risk_color"),
+        "model_version": analysis.get("model_version"),
+        "view_type": view_analysis.get("view_type"),
+        "laterality": view_analysis.get("laterality"),
+        "mean_intensity": stats.get("mean_intensity"),
+        "std_intensity": stats.get("std_intensity"),
+        "min_intensity": stats.get("min_intensity"),
+        "max_intensity": stats.get("max_intensity"),
+        "brightness": stats.get("brightness"),
+        "contrast": stats.get("contrast"),
+        "findings_json": json.dumps(analysis.get("findings", {})),
+    }
+    for key, column in IMAGE_COLUMNS.items():
+        if images_b64 and images_b64.get(key):
+            fields[column] = images_b64[key]
+    if render_state is not None:
+        fields["render_state_json"] = json.dumps(render_state)
+    return fields
+
+
+def load_render_state(record) -> Optional[Dict[str, Any]]:
+    """Heatmap and boxes saved with the row, or None for rows saved before lazy images"""
+    data = getattr(record, "render_state_json", None)
+    if not data:
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def analysis_from_record(record) -> Tuple[Dict[str, Any], AnalysisImages]:
+    """
+    Rebuild the analysis dict and images from an Analysis row
+
+    Returns:
+        Tuple of (analysis, images) shaped like run_full_analysis output.
+        Images not stored in the row are rendered on access from the saved heatmap.
+    """
+    malignant_prob = record.malignant_prob or 0.0
+    benign_prob = record.benign_prob if record.benign_prob is not None else 100.0 - malignant_prob
+    is_malignant = (record.result or "").startswith("Malignant")
+
+    try:
+        findings = json.loads(record.findings_json) if record.findings_json else {}
+    except ValueError:
+        findings = {}
+
+    analysis = {
+        "result": record.result,
+        "probability": malignant_prob if is_malignant else benign_prob,
+        "confidence": record.confidence,
+        "benign_prob": benign_prob,
+        "malignant_prob": malignant_prob,
+        "risk_level": record.risk_level,
+        "risk_icon": record.risk_icon,
+        "risk_color": record.risk_color,
+        "stats": {
+            "mean_intensity": record.mean_intensity,
+            "std_intensity": record.std_intensity,
+            "min_intensity": record.min_intensity,
+            "max_intensity": record.max_intensity,
+            "brightness": record.brightness,
+            "contrast": record.contrast,
+        },
+        "image_size": {"width": record.image_width, "height": record.image_height},
+        "file_format": record.file_format or "N/A",
+        "model_version": getattr(record, "model_version", None),
+        "findings": findings,
+        "view_analysis": {"view_type": record.view_type, "laterality": record.laterality},
+    }
+    stored_b64 = {key: getattr(record, column, None) for key, column in IMAGE_COLUMNS.items()}
+    images = AnalysisImages.from_render_state(
+        None, load_render_state(record), findings.get("regions"), stored_b64=stored_b64
+    )
+    return analysis, images
+
+
+def has_stored_images(record) -> bool:
+    """Reports need at least the original image and the Grad-CAM overlay (stored or renderable)"""
+    return bool(record.original_image_b64) and (
+        bool(record.overlay_image_b64) or load_render_state(record) is not None
+    )
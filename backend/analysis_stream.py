@@ -0,0 +1,128 @@
+"""
+Progressive /analyze responses
+Runs an analysis on the AnalysisExecutor and streams each stage to the client
+as soon as it is ready, as NDJSON lines or Server-Sent Events
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from analysis_executor import AnalysisExecutor, QueueFullError
+
+# ?stream=<name> values and the Accept media types that select them
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+Emit = Callable[[str, Dict[str, Any]], None]
+
+
+def negotiate_stream_format(stream: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """
+    Pick the streaming format from the query parameter, falling back to the Accept header
+
+    Returns:
+        "ndjson", "sse", or None for a single JSON response
+
+    Raises:
+        HTTPException: 400 for an unknown ?stream value
+    """
+    if stream:
+        stream = stream.lower()
+        if stream not in STREAM_MEDIA_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported stream format '{stream}'. Use one of: {', '.join(STREAM_MEDIA_TYPES)}",
+            )
+        return stream
+    accept = (accept or "").lower()
+    for name, media_type in STREAM_MEDIA_TYPES.items():
+        if media_type in accept:
+            return name
+    return None
+
+
+def format_stream_event(stream_format: str, event: str, data: Dict[str, Any]) -> str:
+    """One NDJSON line ({"event", "data"}) or one SSE message"""
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+async def stream_analysis(
+    executor: AnalysisExecutor,
+    produce: Callable[[Emit], Dict[str, Any]],
+    stream_format: str,
+    prepare: Callable[[Dict[str, Any]], Dict[str, Any]] = lambda payload: payload,
+) -> StreamingResponse:
+    """
+    Run produce(emit) on the executor and stream every emitted event
+
+    produce calls emit(event, payload) for each stage; its return value is sent as
+    the final "complete" event. prepare makes payloads JSON-serializable.
+    Errors before the first event become normal HTTP errors (status code kept);
+    errors after it are sent as an "error" event that ends the stream.
+
+    Raises:
+        HTTPException: 503 with Retry-After when the executor queue is full
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    submitted_at = time.perf_counter()
+    started = {}
+
+    def emit(event: str, payload: Dict[str, Any]):
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, (event, prepare(payload)))
+        except RuntimeError:
+            pass  # Client went away and the loop is closed
+
+    def task():
+        started["at"] = time.perf_counter()
+        try:
+            emit("complete", produce(emit))
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            emit("error", {"status_code": 500, "detail": f"Analysis failed: {e}"})
+
+    try:
+        executor.submit(task)
+    except QueueFullError as e:
+        print(f"⚠️ Analysis queue full - rejecting request (retry after {e.retry_after}s)")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy analyzing other images. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    # Hold the response until the first event so rejections keep their status code
+    first_event, first_data = await events.get()
+    if first_event == "error":
+        raise HTTPException(status_code=first_data["status_code"], detail=first_data["detail"])
+    queue_wait = started.get("at", submitted_at) - submitted_at
+    print(f"⏱️ Queue wait: {queue_wait * 1000:.1f} ms (streaming {stream_format})")
+
+    async def body():
+        event, payload = first_event, first_data
+        while True:
+            yield format_stream_event(stream_format, event, payload)
+            if event in ("complete", "error"):
+                return
+            event, payload = await events.get()
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers={
+            "X-Queue-Wait-Ms": f"{queue_wait * 1000:.1f}",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Keep reverse proxies from buffering the stream
+        },
+    )
@@ -3,8 +3,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import timedelta
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 import json
 import os
 from google.auth.transport import requests
@@ -15,8 +15,10 @@ from schemas import (
     UserCreate, UserResponse, UserUpdate, UserLogin,
     PatientCreate, PatientResponse, PatientUpdate,
     AnalysisResponse, AnalysisDetailResponse,
-    ReportResponse, Token, DashboardStats
+    ReportResponse, ReportFromAnalysisRequest, Token, DashboardStats
 )
+from analysis_store import analysis_from_record, has_stored_images
+from report_generator import generate_report_pdf, generate_view_analysis
 from auth import (
     authenticate_user, create_user, create_access_token,
     get_current_active_user, get_optional_user, get_password_hash,
@@ -467,6 +469,155 @@ async def get_report_pdf(
     )
 
 
+def _new_report_number(db: Session, analysis_id: int) -> str:
+    """Same format as /report, suffixed if several reports are generated within a second"""
+    base = f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}-{analysis_id}"
+    report_number, n = base, 1
+    while db.query(Report.id).filter(Report.report_number == report_number).first():
+        n += 1
+        report_number = f"{base}-{n}"
+    return report_number
+
+
+def _report_fields(
+    report_data: ReportFromAnalysisRequest,
+    analysis_record: Analysis,
+    report: Optional[Report] = None,
+) -> Dict[str, str]:
+    """
+    Patient/doctor fields printed on the report: the supplied value, else the one stored
+    with the report being regenerated, else the patient record or a placeholder
+    """
+    patient = analysis_record.patient
+    defaults = {
+        "patient_name": (patient.name if patient else None) or "Patient Name",
+        "patient_age": (patient.age if patient else None) or "N/A",
+        "patient_sex": (patient.sex if patient else None) or "Female",
+        "patient_hn": (patient.patient_hn if patient else None) or "N/A",
+        "department": "Radiology",
+        "request_doctor": "Dr. [Name]",
+        "report_by": "Dr. [Radiologist Name]",
+    }
+    return {
+        field: getattr(report_data, field) or (getattr(report, field) if report else None) or default
+        for field, default in defaults.items()
+    }
+
+
+def _render_report_from_analysis(analysis_record: Analysis, fields: Dict[str, str]) -> bytes:
+    """Build the PDF from a stored analysis and its stored images - no upload, no model"""
+    if not has_stored_images(analysis_record):
+        raise HTTPException(
+            status_code=409,
+            detail="This analysis has no stored images. Upload the image to /report instead."
+        )
+
+    analysis, images = analysis_from_record(analysis_record)
+    view_analysis = generate_view_analysis(analysis, images["original"])
+
+    try:
+        return generate_report_pdf(
+            result=analysis["result"],
+            probability=analysis["probability"],
+            risk_level=analysis["risk_level"],
+            benign_prob=analysis["benign_prob"],
+            malignant_prob=analysis["malignant_prob"],
+            stats=analysis["stats"],
+            image_size=(analysis["image_size"]["width"], analysis["image_size"]["height"]),
+            file_format=analysis["file_format"],
+            original_image=images["original"],
+            overlay_image=images["overlay_image"],
+            heatmap_only=images["heatmap_only"],
+            bbox_image=images["bbox_image"],
+            cancer_type_image=images["cancer_type_image"],
+            confidence=analysis["confidence"],
+            findings=analysis["findings"],
+            view_analysis=view_analysis,
+            **fields,
+        )
+    except Exception as exc:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {exc}")
+
+
+def _pdf_response(report: Report):
+    from fastapi.responses import Response
+    return Response(
+        content=report.pdf_data,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="report_{report.report_number}.pdf"',
+            "X-Report-Id": str(report.id),
+            "X-Report-Number": report.report_number,
+        }
+    )
+
+
+# Sync handlers: FastAPI runs them in its threadpool, so PDF rendering does not block the event loop
+@reports_router.post("/{analysis_id}")
+def create_report_from_analysis(
+    analysis_id: int,
+    report_data: Optional[ReportFromAnalysisRequest] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate a PDF report from a stored analysis.
+    Only patient/doctor fields are needed - the image is not uploaded again and the model is not run.
+    """
+    analysis_record = db.query(Analysis).filter(
+        Analysis.id == analysis_id,
+        Analysis.user_id == current_user.id
+    ).first()
+    if not analysis_record:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    fields = _report_fields(report_data or ReportFromAnalysisRequest(), analysis_record)
+    pdf_bytes = _render_report_from_analysis(analysis_record, fields)
+
+    # The patient fields are stored too, so a regenerate that only corrects a doctor keeps them
+    report = Report(
+        analysis_id=analysis_record.id,
+        report_number=_new_report_number(db, analysis_record.id),
+        pdf_data=pdf_bytes,
+        **fields
+    )
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    return _pdf_response(report)
+
+
+@reports_router.post("/{report_id}/regenerate")
+def regenerate_report(
+    report_id: int,
+    report_data: Optional[ReportFromAnalysisRequest] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-render an existing report from its stored analysis, e.g. after correcting patient details.
+    Fields that are not supplied keep the values stored with the report. Reports created before
+    the patient fields were stored fall back to the patient record, as when they were created.
+    """
+    report = db.query(Report).join(Analysis).filter(
+        Report.id == report_id,
+        Analysis.user_id == current_user.id
+    ).first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    fields = _report_fields(report_data or ReportFromAnalysisRequest(), report.analysis, report)
+    report.pdf_data = _render_report_from_analysis(report.analysis, fields)
+    for field, value in fields.items():
+        setattr(report, field, value)
+    report.generated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(report)
+    return _pdf_response(report)
+
+
 # ==================== DASHBOARD ROUTES ====================
 
 @dashboard_router.get("/stats", response_model=DashboardStats)
@@ -0,0 +1,129 @@
+"""
+Near-duplicate lookup benchmark: indexed search vs a linear scan
+
+Fills a HammingIndex with N random 64-bit perceptual hashes and times lookups of
+near duplicates (1-3 bits flipped from a stored hash) and of unseen hashes. The linear
+scan is the old check_duplicate loop over every stored hash, with popcount distance.
+
+"clustered" hashes are drawn around a few hundred centers, like pHashes of similar
+mammograms, so bands repeat and buckets get longer than with uniform hashes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_duplicates --sizes 1000,100000,1000000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from duplicate_detector import NEAR_DUPLICATE_DISTANCE
+from phash_index import HASH_BITS, HammingIndex, hamming
+
+LINEAR_SCAN_MAX = 100_000  # The scan takes seconds per lookup beyond this
+
+
+def random_hashes(rng, n, distribution):
+    if distribution == "uniform":
+        return [int(v) for v in rng.integers(0, 2 ** 64, n, dtype=np.uint64)]
+    # 8 random bits flipped from one of 256 centers
+    centers = random_hashes(rng, 256, "uniform")
+    flips = rng.integers(0, HASH_BITS, (n, 8))
+    hashes = []
+    for center, bits in zip(rng.integers(0, len(centers), n), flips):
+        h = centers[center]
+        for bit in bits:
+            h ^= 1 << int(bit)
+        hashes.append(h)
+    return hashes
+
+
+def near(rng, h):
+    """h with 1 to NEAR_DUPLICATE_DISTANCE distinct bits flipped"""
+    for bit in rng.choice(HASH_BITS, rng.integers(1, NEAR_DUPLICATE_DISTANCE + 1), replace=False):
+        h ^= 1 << int(bit)
+    return h
+
+
+def linear_nearest(stored, h, max_distance):
+    for candidate, value in stored.items():
+        if hamming(h, candidate) <= max_distance:
+            return value
+    return None
+
+
+def time_lookups(lookup, queries):
+    timings = []
+    for q in queries:
+        started = time.perf_counter()
+        lookup(q)
+        timings.append(time.perf_counter() - started)
+    return {
+        "p50_us": round(float(np.percentile(timings, 50)) * 1e6, 1),
+        "p99_us": round(float(np.percentile(timings, 99)) * 1e6, 1),
+    }
+
+
+def run(sizes, queries=1000, distribution="uniform"):
+    results = []
+    for n in sizes:
+        rng = np.random.default_rng(n)
+        hashes = random_hashes(rng, n, distribution)
+        index = HammingIndex()
+        started = time.perf_counter()
+        for i, h in enumerate(hashes):
+            index.add(h, i)
+        build_s = time.perf_counter() - started
+
+        hits = [near(rng, hashes[i]) for i in rng.integers(0, n, queries)]
+        misses = random_hashes(rng, queries, "uniform")
+        row = {
+            "stored": n,
+            "distribution": distribution,
+            "build_s": round(build_s, 2),
+            "index_hit": time_lookups(lambda q: index.nearest(q, NEAR_DUPLICATE_DISTANCE), hits),
+            "index_miss": time_lookups(lambda q: index.nearest(q, NEAR_DUPLICATE_DISTANCE), misses),
+        }
+        assert all(index.nearest(q, NEAR_DUPLICATE_DISTANCE) is not None for q in hits)
+        if n <= LINEAR_SCAN_MAX:
+            stored = dict(index)
+            sample = misses[: max(10, queries * 1000 // n)]  # Keep the scan to a few seconds
+            row["linear_miss"] = time_lookups(lambda q: linear_nearest(stored, q, NEAR_DUPLICATE_DISTANCE), sample)
+        results.append(row)
+        linear = row.get("linear_miss", {}).get("p50_us", float("nan"))
+        print(f"{n:>9} stored ({distribution}): index hit p50 {row['index_hit']['p50_us']:8.1f} us, "
+              f"miss p50 {row['index_miss']['p50_us']:8.1f} us, linear miss p50 {linear:10.1f} us")
+    return results
+
+
+def markdown_table(results):
+    lines = [
+        "| Stored hashes | Index hit p50 / p99 (µs) | Index miss p50 / p99 (µs) | Linear scan p50 (µs) |",
+        "|---:|---:|---:|---:|",
+    ]
+    for r in results:
+        linear = f"{r['linear_miss']['p50_us']:,.0f}" if "linear_miss" in r else "-"
+        lines.append(
+            f"| {r['stored']:,} | {r['index_hit']['p50_us']:.1f} / {r['index_hit']['p99_us']:.1f} "
+            f"| {r['index_miss']['p50_us']:.1f} / {r['index_miss']['p99_us']:.1f} | {linear} |"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma-separated stored hash counts")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--distribution", choices=("uniform", "clustered"), default="uniform")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run([int(n) for n in args.sizes.split(",")], queries=args.queries, distribution=args.distribution)
+    print()
+    print(markdown_table(results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,88 @@
+"""
+Image encoding benchmark: encode time vs bytes per format, quality and display size
+
+Encodes the original and the Grad-CAM overlay of synthetic mammograms at realistic
+sizes with every option image_encoding supports, and prints a markdown table.
+
+Usage (from backend/):
+    python -m benchmarks.bench_encoding --sizes 1024x1280,2400x3000,3328x4096 --repeat 3
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_mammogram
+from image_encoding import ImageEncoding, encode_image
+
+OPTIONS = [
+    ("PNG (default, level 6)", ImageEncoding("png")),
+    ("PNG level 1", ImageEncoding("png", png_compress_level=1)),
+    ("WebP lossless", ImageEncoding("webp")),
+    ("WebP q80", ImageEncoding("webp", quality=80)),
+    ("JPEG q95", ImageEncoding("jpeg", quality=95)),
+    ("JPEG q85", ImageEncoding("jpeg", quality=85)),
+    ("PNG level 1, max_dim 1024", ImageEncoding("png", max_dim=1024, png_compress_level=1)),
+    ("WebP lossless, max_dim 1024", ImageEncoding("webp", max_dim=1024)),
+    ("JPEG q85, max_dim 1024", ImageEncoding("jpeg", quality=85, max_dim=1024)),
+]
+
+
+def make_overlay(image):
+    """Grad-CAM overlay of a synthetic blob, drawn by the real renderer"""
+    from grad_cam import create_heatmap_overlay
+
+    heatmap = np.zeros((14, 14), dtype=np.float32)
+    heatmap[4:9, 3:8] = np.linspace(0.3, 1.0, 25, dtype=np.float32).reshape(5, 5)
+    return create_heatmap_overlay(image, heatmap, alpha=0.5)
+
+
+def run(sizes, repeat=3):
+    results = []
+    for width, height in sizes:
+        original = synthetic_mammogram(seed=1, width=width, height=height)
+        images = {"original": original, "overlay": make_overlay(original)}
+        for kind, image in images.items():
+            for label, encoding in OPTIONS:
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    data = encode_image(image, encoding)
+                    timings.append(time.perf_counter() - started)
+                results.append({
+                    "size": f"{width}x{height}",
+                    "image": kind,
+                    "option": label,
+                    "encoding": encoding._asdict(),
+                    "median_ms": round(float(np.median(timings)) * 1000, 1),
+                    "bytes": len(data),
+                })
+                print(f"{width}x{height} {kind:8s} {label:30s} {results[-1]['median_ms']:8.1f} ms {len(data) / 1e6:7.2f} MB")
+    return results
+
+
+def markdown_table(results):
+    lines = ["| Size | Image | Option | Encode (ms) | Size (KB) |", "|---|---|---|---:|---:|"]
+    for r in results:
+        lines.append(f"| {r['size']} | {r['image']} | {r['option']} | {r['median_ms']:.0f} | {r['bytes'] / 1024:.0f} |")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1024x1280,2400x3000,3328x4096", help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes.split(",")]
+    results = run(sizes, repeat=args.repeat)
+    print()
+    print(markdown_table(results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,124 @@
+"""
+ImageContext benchmark: memory and time of the /analyze CPU stages
+
+Runs duplicate check, validation, statistics, preprocessing, Grad-CAM findings and
+view analysis on a synthetic mammogram, once with one shared ImageContext (as
+/analyze does) and once letting every stage convert the image itself. Each mode
+runs in a fresh process so peak RSS is comparable. Model inference is not included.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_context --sizes 600x800,2400x3000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+MODES = ("per_stage", "shared")
+
+
+def run_stages(data, model, heatmap, shared):
+    from PIL import Image
+
+    from duplicate_detector import DuplicateDetector
+    from grad_cam import compute_gradcam_findings, generate_mammogram_view_analysis
+    from image_context import ImageContext
+    from main import get_image_statistics
+    from mammogram_validator import validate_mammogram_image
+
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    context = ImageContext(image, data) if shared else None
+    DuplicateDetector().check_duplicate(data, image, "bench.png", context=context)
+    file_hash = context.file_hash if shared else DuplicateDetector.get_file_hash(data)
+    validate_mammogram_image(image, "image/png", context=context)
+    preprocessed = ImageContext.of(image, context).model_input
+    get_image_statistics(image, context=context)
+    _, _, _, findings = compute_gradcam_findings(image, preprocessed, model, 0.7, heatmap=heatmap, context=context)
+    generate_mammogram_view_analysis(image, heatmap, 0.7, findings["regions"], filename="bench.png", context=context)
+    return file_hash
+
+
+def child(width, height, mode, repeat):
+    """Measure one mode in this process and print a JSON line"""
+    import tensorflow as tf
+
+    from benchmarks.synthetic import synthetic_mammogram
+
+    buf = io.BytesIO()
+    synthetic_mammogram(seed=3, width=width, height=height).save(buf, format="PNG")
+    data = buf.getvalue()
+    # compute_gradcam_findings only needs a model with a conv layer when the heatmap is given
+    model = tf.keras.Sequential([tf.keras.Input((224, 224, 3)), tf.keras.layers.Conv2D(1, 3)])
+    yy, xx = np.mgrid[0:14, 0:14]
+    heatmap = np.exp(-((xx - 5) ** 2 + (yy - 7) ** 2) / 8.0).astype(np.float32)
+    shared = mode == "shared"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import grad_cam, main  # noqa: F401  Imported before measuring RSS
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        run_stages(data, model, heatmap, shared)  # First run: peak RSS
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+        tracemalloc.start()
+        run_stages(data, model, heatmap, shared)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run_stages(data, model, heatmap, shared)
+            timings.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "size": f"{width}x{height}",
+        "mode": mode,
+        "median_ms": round(float(np.median(timings)) * 1000, 1),
+        "tracemalloc_peak_mb": round(peak / 1e6, 1),
+        "maxrss_growth_mb": round(rss_growth / 1024, 1),  # ru_maxrss is in KB on Linux
+    }))
+
+
+def run(sizes, repeat=3):
+    results = []
+    for width, height in sizes:
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_image_context", "--child", mode,
+                 "--sizes", f"{width}x{height}", "--repeat", str(repeat)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            r = results[-1]
+            print(f"{r['size']} {mode:10s} {r['median_ms']:8.1f} ms  peak {r['tracemalloc_peak_mb']:7.1f} MB  "
+                  f"RSS +{r['maxrss_growth_mb']:.1f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="600x800,2400x3000", help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes.split(",")]
+    if args.child:
+        child(*sizes[0], args.child, args.repeat)
+        sys.exit(0)
+
+    results = run(sizes, repeat=args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
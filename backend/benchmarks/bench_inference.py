@@ -0,0 +1,121 @@
+"""
+Inference latency benchmark: model.predict vs the compiled tf.function path
+
+Compares p50/p99 latency of single-image inference for
+- model.predict (the original serving path)
+- compiled predict (tf.function with a fixed input signature)
+- eager Grad-CAM explainer (prediction + heatmap in one taped pass)
+- compiled Grad-CAM explainer, with and without XLA jit_compile
+
+Uses the real model when it is available, otherwise a random-weight model with
+the same architecture (_create_compatible_model).
+
+Usage (from backend/):
+    python -m benchmarks.bench_inference --iterations 200 --batch-size 1
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+
+def percentile_summary(timings_s):
+    """p50/p99/mean in milliseconds for a list of durations in seconds"""
+    ms = np.array(timings_s) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def time_callable(fn, batch, iterations, warmup):
+    for _ in range(warmup):
+        fn(batch)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(batch)
+        timings.append(time.perf_counter() - started)
+    return percentile_summary(timings)
+
+
+def load_benchmark_model(use_real_model):
+    import main
+
+    if use_real_model:
+        try:
+            return main.get_model(), "real"
+        except Exception as e:
+            print(f"⚠️ Real model unavailable ({e}), using random weights")
+    return main._create_compatible_model(), "random-weights"
+
+
+def run(iterations=200, warmup=10, batch_size=1, use_real_model=True, include_xla=True):
+    import main
+    from grad_cam import GradCAMExplainer, get_last_conv_layer_index
+
+    model, model_kind = load_benchmark_model(use_real_model)
+    batch = np.random.default_rng(0).random((batch_size, 224, 224, 3)).astype(np.float32)
+    conv_idx = get_last_conv_layer_index(model)
+
+    compiled_predict = main.build_compiled_predict(model)
+    paths = {
+        "predict": lambda b: model.predict(b, verbose=0),
+        "compiled_predict": lambda b: compiled_predict(b).numpy(),
+        "explainer_eager": GradCAMExplainer(model, conv_idx).explain,
+        "explainer_compiled": GradCAMExplainer(model, conv_idx, compiled=True).explain,
+    }
+    if include_xla:
+        xla_predict = main.build_compiled_predict(model, jit_compile=True)
+        paths["compiled_predict_xla"] = lambda b: xla_predict(b).numpy()
+        paths["explainer_compiled_xla"] = GradCAMExplainer(model, conv_idx, compiled=True, jit_compile=True).explain
+
+    results = {
+        "model": model_kind,
+        "batch_size": batch_size,
+        "iterations": iterations,
+        "paths": {},
+    }
+    for name, fn in paths.items():
+        try:
+            results["paths"][name] = time_callable(fn, batch, iterations, warmup)
+        except Exception as e:
+            results["paths"][name] = {"error": str(e)}
+    return results
+
+
+def print_table(results):
+    print(f"\nModel: {results['model']}, batch size {results['batch_size']}, {results['iterations']} iterations")
+    print(f"{'path':<26}{'p50 (ms)':>12}{'p99 (ms)':>12}{'mean (ms)':>12}")
+    for name, r in results["paths"].items():
+        if "error" in r:
+            print(f"{name:<26}  error: {r['error']}")
+        else:
+            print(f"{name:<26}{r['p50_ms']:>12.2f}{r['p99_ms']:>12.2f}{r['mean_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--random-weights", action="store_true", help="Skip loading the real model")
+    parser.add_argument("--no-xla", action="store_true", help="Skip the XLA jit_compile variants")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(
+        iterations=args.iterations,
+        warmup=args.warmup,
+        batch_size=args.batch_size,
+        use_real_model=not args.random_weights,
+        include_xla=not args.no_xla,
+    )
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
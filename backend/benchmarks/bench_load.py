@@ -0,0 +1,424 @@
+"""
+End-to-end HTTP load test
+
+Drives the whole app - upload, analysis, PDF, database - with concurrent clients and
+a weighted mix of requests:
+- analyze: POST /analyze with a new synthetic mammogram, as a signed-in user
+- report: POST /report with an image analyzed earlier (the frontend's analyze -> report flow)
+- report_from_analysis: POST /reports/{analysis_id}, the PDF from a stored analysis
+- analysis_image: GET one of an analysis' lazy image URLs
+- list_analyses: GET /analyses/
+- dashboard: GET /dashboard/stats
+
+By default the app runs in this process behind httpx's ASGI transport, with a
+random-weight model and a temporary SQLite database. --url targets a running
+server instead (uvicorn or serve.py), and --spawn-workers starts serve.py
+with a random-weight model itself.
+
+Reports throughput, p50/p95/p99 latency and error rate, overall and per request
+kind, plus peak RSS of the serving process. --baseline compares against an earlier
+--json output and exits with status 1 if anything regressed beyond --tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.bench_load --requests 60 --concurrency 4 --json load.json
+    python -m benchmarks.bench_load --baseline benchmarks/load_baseline.json
+    python -m benchmarks.bench_load --url http://127.0.0.1:8001 --pid <server pid>
+    python -m benchmarks.bench_load --spawn-workers 2 --mix analyze=1,report=1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+OPERATIONS = ("analyze", "report", "report_from_analysis", "analysis_image", "list_analyses", "dashboard")
+DEFAULT_MIX = "analyze=4,report=2,report_from_analysis=1,analysis_image=2,list_analyses=1,dashboard=1"
+SEED_ANALYSES = 2  # Analyses uploaded before the clock starts, so every request kind has a target
+
+# A p95 below this many ms over the baseline is noise, whatever the relative change
+ABSOLUTE_SLACK_MS = 5.0
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'analyze=4,report=1' -> {'analyze': 4.0, 'report': 1.0}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown request kind '{name}', expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("The request mix needs at least one positive weight")
+    return mix
+
+
+def latency_summary(latencies_s: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max in milliseconds"""
+    if not latencies_s:
+        return {}
+    ms = np.array(latencies_s) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "mean_ms": round(float(ms.mean()), 1),
+        "max_ms": round(float(ms.max()), 1),
+    }
+
+
+class RssSampler:
+    """Peak RSS of a process tree, sampled on a background thread"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        from benchmarks.bench_workers import memory_mb
+
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, memory_mb(self.pid)["rss_mb"])
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+class LoadScenario:
+    """The request kinds, sharing a signed-in user and the analyses created so far"""
+
+    def __init__(self, client, uploads: List[Tuple[str, bytes]], seed: int = 0):
+        self.client = client
+        self.uploads = iter(uploads)
+        self.rng = random.Random(seed)
+        self.token: Optional[str] = None
+        self.analyses: List[Dict[str, Any]] = []  # {"id", "filename", "data", "image_urls"}
+
+    @property
+    def auth_headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def sign_in(self):
+        email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        password = "load-test-password"
+        response = await self.client.post("/auth/signup", json={"email": email, "name": "Load Test", "password": password})
+        response.raise_for_status()
+        response = await self.client.post("/auth/login/json", json={"email": email, "password": password})
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+
+    async def analyze(self):
+        filename, data = next(self.uploads)
+        response = await self.client.post(
+            "/analyze",
+            params={"authorization": f"Bearer {self.token}"},  # /analyze reads the token from the query
+            files={"file": (filename, data, "image/png")},
+        )
+        if response.status_code == 200:
+            body = response.json()
+            urls = [url for name, url in (body.get("images") or {}).items() if name != "original" and url]
+            self.analyses.append({"id": body.get("analysis_id"), "filename": filename, "data": data, "image_urls": urls})
+        return response
+
+    async def report(self):
+        analysis = self.rng.choice(self.analyses)
+        return await self.client.post(
+            "/report",
+            files={"file": (analysis["filename"], analysis["data"], "image/png")},
+            data={"patient_name": "Load Test", "patient_age": "50 Years"},
+        )
+
+    async def report_from_analysis(self):
+        analysis = self.rng.choice([a for a in self.analyses if a["id"]] or self.analyses)
+        return await self.client.post(
+            f"/reports/{analysis['id']}", json={"patient_name": "Load Test"}, headers=self.auth_headers
+        )
+
+    async def analysis_image(self):
+        urls = [url for analysis in self.analyses for url in analysis["image_urls"]]
+        if not urls:
+            raise RuntimeError("No image URLs: /analyze returned inline images (ANALYZE_IMAGES=inline?)")
+        return await self.client.get(self.rng.choice(urls))
+
+    async def list_analyses(self):
+        return await self.client.get("/analyses/", params={"limit": 20}, headers=self.auth_headers)
+
+    async def dashboard(self):
+        return await self.client.get("/dashboard/stats", headers=self.auth_headers)
+
+
+async def drive(scenario: LoadScenario, schedule: List[str], concurrency: int) -> Tuple[List[Tuple[str, str, float]], float]:
+    """
+    Run the schedule with `concurrency` clients, each taking the next request as soon as its last one finished
+
+    Returns:
+        ([(kind, status, latency_s)], elapsed_s)
+    """
+    pending = list(reversed(schedule))
+    records: List[Tuple[str, str, float]] = []
+
+    async def client_loop():
+        while pending:
+            kind = pending.pop()
+            started = time.perf_counter()
+            try:
+                response = await getattr(scenario, kind)()
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            records.append((kind, status, time.perf_counter() - started))
+            print(f"  {len(records)}/{len(schedule)} {kind} -> {status}", file=sys.stderr)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return records, time.perf_counter() - started
+
+
+def summarize(records: List[Tuple[str, str, float]], elapsed: float) -> Dict[str, Any]:
+    def group(items):
+        ok = [latency for _, status, latency in items if status.isdigit() and 200 <= int(status) < 300]
+        statuses = sorted({status for _, status, _ in items})
+        return {
+            "requests": len(items),
+            "ok": len(ok),
+            "error_rate": round(1 - len(ok) / len(items), 4) if items else 0.0,
+            "status_counts": {s: sum(1 for _, status, _ in items if status == s) for s in statuses},
+            "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            **latency_summary(ok),
+        }
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "overall": group(records),
+        "operations": {kind: group([r for r in records if r[0] == kind]) for kind in OPERATIONS if any(r[0] == kind for r in records)},
+    }
+
+
+async def run_scenario(client, requests: int, concurrency: int, mix: Dict[str, float], image_size: Tuple[int, int],
+                       start_seed: int, seed: int) -> Dict[str, Any]:
+    from benchmarks.synthetic import distinct_mammograms, to_png_bytes
+
+    schedule = random.Random(seed).choices(list(mix), weights=list(mix.values()), k=requests)
+    width, height = image_size
+    images = distinct_mammograms(SEED_ANALYSES + schedule.count("analyze"), width, height, start_seed=start_seed)
+    uploads = [(f"loadtest_{image_seed}.png", to_png_bytes(image)) for image_seed, image in images]
+
+    scenario = LoadScenario(client, uploads, seed=seed)
+    await client.post("/clear-duplicates")  # Earlier runs against the same server used the same images
+    await scenario.sign_in()
+    for _ in range(SEED_ANALYSES):
+        (await scenario.analyze()).raise_for_status()
+
+    records, elapsed = await drive(scenario, schedule, concurrency)
+    return summarize(records, elapsed)
+
+
+def in_process_app(database_url: Optional[str], real_model: bool):
+    """main.app with its database at database_url (a temporary SQLite file if None)"""
+    temp_dir = None
+    if "main" in sys.modules:
+        print("⚠️ main was already imported: using its database", file=sys.stderr)
+    elif database_url is None:
+        temp_dir = tempfile.mkdtemp(prefix="bench_load_")
+        database_url = f"sqlite:///{os.path.join(temp_dir, 'load.db')}"
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("WARMUP_ON_STARTUP", "false")  # The ASGI transport does not send startup events
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        from database import create_tables
+
+        if not main.DATABASE_AVAILABLE:
+            raise RuntimeError("Database routes are not mounted (missing database/auth dependencies)")
+        create_tables()
+        if not real_model:
+            from benchmarks.bench_stages import build_model
+            build_model()
+        main.get_model()
+    return main.app, temp_dir
+
+
+def run(requests: int = 60, concurrency: int = 4, mix: str = DEFAULT_MIX, image_size=(600, 800),
+        url: Optional[str] = None, pid: Optional[int] = None, spawn_workers: int = 0, port: int = 8766,
+        database_url: Optional[str] = None, real_model: bool = False, start_seed: int = 0,
+        seed: int = 0) -> Dict[str, Any]:
+    import httpx
+
+    from benchmarks.bench_stages import environment
+
+    weights = parse_mix(mix)
+    config = {
+        "mode": "url" if url else "spawn" if spawn_workers else "asgi",
+        "requests": requests,
+        "concurrency": concurrency,
+        "mix": weights,
+        "image_size": f"{image_size[0]}x{image_size[1]}",
+        "workers": spawn_workers or None,
+        "model": "real" if real_model else "random-weights",
+    }
+    scenario_args = (requests, concurrency, weights, image_size, start_seed, seed)
+    timeout = httpx.Timeout(300.0)
+
+    if not url and not spawn_workers:
+        app, temp_dir = in_process_app(database_url, real_model)
+        try:
+            async def in_process():
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+                    return await run_scenario(client, *scenario_args)
+
+            with RssSampler(os.getpid()) as sampler, contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(in_process())
+            # ru_maxrss (KB on Linux) also catches peaks between samples
+            peak = max(sampler.peak_mb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    else:
+        proc = temp_dir = None
+        if spawn_workers:
+            from benchmarks.bench_workers import start_server
+
+            if database_url is None:
+                temp_dir = tempfile.mkdtemp(prefix="bench_load_")
+                database_url = f"sqlite:///{os.path.join(temp_dir, 'load.db')}"
+            os.environ["DATABASE_URL"] = database_url  # Inherited by the server process
+            proc = start_server(spawn_workers, port, random_weights=not real_model, startup_timeout=300)
+            url, pid = f"http://127.0.0.1:{port}", proc.pid
+        try:
+            async def remote():
+                async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+                    return await run_scenario(client, *scenario_args)
+
+            with (RssSampler(pid) if pid else contextlib.nullcontext()) as sampler:
+                results = asyncio.run(remote())
+            peak = sampler.peak_mb if pid else None
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=60)
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {"environment": environment(), "config": config, **results, "peak_rss_mb": round(peak, 1) if peak else None}
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25) -> List[str]:
+    """
+    Regressions of results against baseline: lower throughput, higher p95, higher error
+    rate or higher peak RSS, beyond a relative tolerance
+
+    Returns:
+        One message per regression (empty if none)
+    """
+    regressions = []
+    before, after = baseline["overall"], results["overall"]
+    if after["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {after['throughput_rps']:.2f} req/s < baseline {before['throughput_rps']:.2f} req/s")
+
+    groups = [("overall", before, after)] + [
+        (kind, baseline["operations"][kind], stats)
+        for kind, stats in results["operations"].items() if kind in baseline.get("operations", {})
+    ]
+    for name, before, after in groups:
+        if "p95_ms" in before and "p95_ms" in after:
+            if after["p95_ms"] > before["p95_ms"] * (1 + tolerance) + ABSOLUTE_SLACK_MS:
+                regressions.append(f"{name} p95 {after['p95_ms']:.1f} ms > baseline {before['p95_ms']:.1f} ms")
+        if after["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name} error rate {after['error_rate']:.1%} > baseline {before['error_rate']:.1%}")
+
+    if results.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"peak RSS {results['peak_rss_mb']:.0f} MB > baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]):
+    config = results["config"]
+    print(f"\n{config['requests']} requests, concurrency {config['concurrency']}, {config['mode']} mode, "
+          f"{config['image_size']} images, {results['elapsed_s']:.1f} s")
+    print(f"{'':<22}{'n':>5}{'ok':>5}{'err %':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, r in [("overall", results["overall"])] + list(results["operations"].items()):
+        print(f"{name:<22}{r['requests']:>5}{r['ok']:>5}{r['error_rate'] * 100:>8.1f}{r['throughput_rps']:>8.2f}"
+              f"{r.get('p50_ms', 0):>9.1f}{r.get('p95_ms', 0):>9.1f}{r.get('p99_ms', 0):>9.1f}")
+    errors = {s: n for s, n in results["overall"]["status_counts"].items() if not s.startswith("2")}
+    if errors:
+        print(f"Errors by status: {errors}")
+    if results["peak_rss_mb"]:
+        print(f"Peak RSS: {results['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60, help="Timed requests (after seeding)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted request kinds, e.g. analyze=4,report=1")
+    parser.add_argument("--size", default="600x800", help="Synthetic image WIDTHxHEIGHT")
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--pid", type=int, help="With --url: server process to sample peak RSS from")
+    parser.add_argument("--spawn-workers", type=int, default=0, help="Start serve.py with this many workers")
+    parser.add_argument("--port", type=int, default=8766, help="Port for --spawn-workers")
+    parser.add_argument("--database-url", help="Database for the in-process or spawned app (default: temporary SQLite)")
+    parser.add_argument("--real-model", action="store_true", help="Load the real model instead of random weights")
+    parser.add_argument("--start-seed", type=int, default=0, help="First synthetic image seed")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request schedule")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = run(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mix=args.mix,
+        image_size=tuple(int(v) for v in args.size.split("x")),
+        url=args.url,
+        pid=args.pid,
+        spawn_workers=args.spawn_workers,
+        port=args.port,
+        database_url=args.database_url,
+        real_model=args.real_model,
+        start_seed=args.start_seed,
+        seed=args.seed,
+    )
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"⚠️ Baseline was recorded with a different configuration: {baseline.get('config')}")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressions against {args.baseline}:")
+            for message in regressions:
+                print(f"  - {message}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
@@ -0,0 +1,359 @@
+"""
+Per-stage micro-benchmarks on synthetic mammograms
+
+Times each public function of grad_cam, mammogram_validator, duplicate_detector,
+image_hashing and report_generator, plus run_full_analysis end to end, on deterministic synthetic
+mammograms (benchmarks.synthetic.benchmark_mammogram) at 512 px, 2k and 4k. No
+patient data and no trained model are needed: the model is _create_compatible_model
+with fixed random weights.
+
+Functions are called without an ImageContext, so each number is the cost of that
+function on its own. Per-region helpers (get_region_location,
+analyze_region_characteristics, classify_cancer_type) are covered by
+extract_detailed_findings.
+
+Usage (from backend/):
+    python -m benchmarks.bench_stages --sizes 512,2k --json stages.json
+    python -m benchmarks.bench_stages --only duplicate --compare stages.json
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.bench_inference import percentile_summary
+from benchmarks.synthetic import SIZES, benchmark_mammogram, to_png_bytes
+
+CONFIDENCE = 0.7
+STORED_HASHES = 1000  # Previous uploads the duplicate detector compares against
+
+
+class SelfTimed:
+    """Case that does untimed setup and returns the seconds of its measured part"""
+
+    def __init__(self, fn: Callable[[], float]):
+        self.fn = fn
+
+
+class StageInputs:
+    """Everything the benchmarked functions take, computed once per image size"""
+
+    def __init__(self, size: str, model):
+        import main
+        from grad_cam import (
+            compute_gradcam_findings, get_last_conv_layer_index, make_gradcam_heatmap,
+        )
+        from image_context import ImageContext
+
+        self.size = size
+        self.model = model
+        self.image = benchmark_mammogram(size, seed=0, view="MLO")
+        self.cc_image = benchmark_mammogram(size, seed=1, view="CC")
+        self.data = to_png_bytes(self.image)
+        context = ImageContext(self.image, self.data)
+        self.gray = context.gray
+        self.rgb = context.rgb
+        self.tissue_mask = context.tissue_mask(threshold=15)
+        self.preprocessed = context.model_input
+        self.conv_idx = get_last_conv_layer_index(model)
+        self.heatmap = make_gradcam_heatmap(self.preprocessed, model, self.conv_idx)
+        _, self.boxes, _, self.findings = compute_gradcam_findings(
+            self.image, self.preprocessed, model, CONFIDENCE, heatmap=self.heatmap
+        )
+        self.regions = self.findings["regions"]
+        self.analysis, images = main.run_full_analysis(self.image, filename="bench_R-MLO.png")
+        self.images = {key: images[key] for key in images}
+
+
+def grad_cam_cases(inputs: StageInputs) -> Dict[str, Callable[[], Any]]:
+    import grad_cam as g
+
+    image, gray, mask, heatmap, model = inputs.image, inputs.gray, inputs.tissue_mask, inputs.heatmap, inputs.model
+    explainer = g.GradCAMExplainer(model, inputs.conv_idx)
+    cases = {
+        "GradCAMExplainer.explain": lambda: explainer.explain(inputs.preprocessed),
+        "make_gradcam_heatmap": lambda: g.make_gradcam_heatmap(inputs.preprocessed, model, inputs.conv_idx),
+        "get_last_conv_layer_index": lambda: g.get_last_conv_layer_index(model),
+        "create_tissue_mask": lambda: g.create_tissue_mask(gray),
+        "create_intensity_based_heatmap": lambda: g.create_intensity_based_heatmap(gray),
+        "create_heatmap_overlay": lambda: g.create_heatmap_overlay(image, heatmap),
+        "detect_bounding_boxes": lambda: g.detect_bounding_boxes(
+            heatmap, image.size, threshold=0.5, min_area=50, tissue_mask=mask
+        ),
+        "extract_detailed_findings": lambda: g.extract_detailed_findings(heatmap, inputs.boxes, image.size, CONFIDENCE),
+        "compute_gradcam_findings": lambda: g.compute_gradcam_findings(
+            image, inputs.preprocessed, model, CONFIDENCE, heatmap=heatmap
+        ),
+        "draw_bounding_boxes": lambda: g.draw_bounding_boxes(image, inputs.boxes),
+        "draw_bounding_boxes_with_cancer_type": lambda: g.draw_bounding_boxes_with_cancer_type(image, inputs.regions),
+        "render_heatmap_only": lambda: g.render_heatmap_only(heatmap),
+        "create_gradcam_visualization": lambda: g.create_gradcam_visualization(
+            image, inputs.preprocessed, model, CONFIDENCE, heatmap=heatmap
+        ),
+        "analyze_breast_density": lambda: g.analyze_breast_density(gray, mask),
+        "analyze_tissue_texture": lambda: g.analyze_tissue_texture(gray, mask),
+        "analyze_breast_symmetry": lambda: g.analyze_breast_symmetry(gray),
+        "analyze_skin_and_nipple": lambda: g.analyze_skin_and_nipple(gray, mask),
+        "analyze_vascular_patterns": lambda: g.analyze_vascular_patterns(gray, mask),
+        "analyze_pectoral_muscle": lambda: g.analyze_pectoral_muscle(gray),
+        "analyze_calcification_patterns": lambda: g.analyze_calcification_patterns(heatmap, gray, mask),
+        "perform_comprehensive_image_analysis": lambda: g.perform_comprehensive_image_analysis(image, heatmap, mask),
+        "analyze_cc_view": lambda: g.analyze_cc_view(inputs.cc_image, heatmap, CONFIDENCE, inputs.regions),
+        "analyze_mlo_view": lambda: g.analyze_mlo_view(image, heatmap, CONFIDENCE, inputs.regions),
+        "detect_colored_text_label": lambda: g.detect_colored_text_label(inputs.rgb),
+        "detect_text_label_in_image": lambda: g.detect_text_label_in_image(gray, image),
+        "detect_text_label_pattern_based": lambda: g.detect_text_label_pattern_based(gray),
+        "detect_breast_laterality": lambda: g.detect_breast_laterality(gray),
+        "detect_mammogram_view_type": lambda: g.detect_mammogram_view_type(gray),
+        "generate_mammogram_view_analysis": lambda: g.generate_mammogram_view_analysis(
+            image, heatmap, CONFIDENCE, inputs.regions, filename="bench.png"
+        ),
+    }
+    for kind in g.GRADCAM_IMAGE_KINDS:
+        cases[f"render_gradcam_image[{kind}]"] = functools.partial(
+            g.render_gradcam_image, kind, image, heatmap, inputs.boxes, inputs.regions
+        )
+    return cases
+
+
+def validator_cases(inputs: StageInputs) -> Dict[str, Callable[[], Any]]:
+    from mammogram_validator import MammogramValidator, validate_mammogram_image
+
+    validator = MammogramValidator()
+    return {
+        "MammogramValidator.validate": lambda: validator.validate(inputs.image),
+        "MammogramValidator.validate_file_type": lambda: validator.validate_file_type("image/png"),
+        "validate_mammogram_image": lambda: validate_mammogram_image(inputs.image, "image/png"),
+    }
+
+
+def duplicate_cases(inputs: StageInputs) -> Dict[str, Callable[[], Any]]:
+    from duplicate_detector import DuplicateDetector
+
+    rng = np.random.default_rng(0)
+    stored = [format(int(value), "016x") for value in rng.integers(0, 2 ** 63, STORED_HASHES, dtype=np.int64)]
+    phash = DuplicateDetector.get_perceptual_hash(inputs.image)
+
+    def check_new_upload():
+        # A populated detector seeing a new image
+        detector = DuplicateDetector()
+        for i, value in enumerate(stored):
+            detector.remember(f"file-{i}", int(value, 16), f"upload_{i}.png")
+        started = time.perf_counter()
+        detector.check_duplicate(inputs.data, inputs.image, "bench.png")
+        return time.perf_counter() - started
+
+    return {
+        "DuplicateDetector.get_file_hash": lambda: DuplicateDetector.get_file_hash(inputs.data),
+        "DuplicateDetector.get_perceptual_hash": lambda: DuplicateDetector.get_perceptual_hash(inputs.image),
+        "DuplicateDetector.hamming_distance": lambda: DuplicateDetector.hamming_distance(phash, stored[0]),
+        f"DuplicateDetector.check_duplicate[{STORED_HASHES} stored]": SelfTimed(check_new_upload),
+    }
+
+
+def hashing_cases(inputs: StageInputs) -> Dict[str, Callable[[], Any]]:
+    import image_hashing as h
+    from image_context import ImageContext
+
+    thumbnail = ImageContext(inputs.image).hash_thumbnail
+    batch = np.stack([thumbnail] * 64)
+    return {
+        "hash_thumbnail[full image]": lambda: h.hash_thumbnail(inputs.image),
+        "ImageContext.hash_thumbnail": lambda: ImageContext(inputs.image).hash_thumbnail,
+        "average_hash": lambda: h.average_hash(thumbnail),
+        "difference_hash": lambda: h.difference_hash(thumbnail),
+        "dct_hash": lambda: h.dct_hash(thumbnail),
+        "hash_thumbnails[64 images]": lambda: h.hash_thumbnails(batch),
+    }
+
+
+def report_cases(inputs: StageInputs) -> Dict[str, Callable[[], Any]]:
+    from report_generator import (
+        generate_comparison_report_pdf, generate_report_pdf, generate_view_analysis, pil_to_rl_image,
+    )
+
+    analysis, images = inputs.analysis, inputs.images
+    report_args = dict(
+        result=analysis["result"],
+        probability=analysis["probability"],
+        risk_level=analysis["risk_level"],
+        benign_prob=analysis["benign_prob"],
+        malignant_prob=analysis["malignant_prob"],
+        stats=analysis["stats"],
+        image_size=(analysis["image_size"]["width"], analysis["image_size"]["height"]),
+        file_format=analysis["file_format"],
+        original_image=images["original"],
+        overlay_image=images["overlay_image"],
+        heatmap_only=images["heatmap_only"],
+        bbox_image=images["bbox_image"],
+        cancer_type_image=images["cancer_type_image"],
+        confidence=analysis["confidence"],
+        findings=analysis["findings"],
+        view_analysis=analysis["view_analysis"],
+    )
+    comparison_args = {}
+    for suffix in ("1", "2"):
+        comparison_args.update({f"{key}{suffix}": value for key, value in report_args.items()})
+
+    return {
+        "pil_to_rl_image": lambda: pil_to_rl_image(images["original"]),
+        "generate_view_analysis": lambda: generate_view_analysis(analysis["view_analysis"], images["original"]),
+        "generate_report_pdf": lambda: generate_report_pdf(**report_args),
+        "generate_comparison_report_pdf": lambda: generate_comparison_report_pdf(**comparison_args),
+    }
+
+
+def pipeline_cases(inputs: StageInputs) -> Dict[str, Callable[[], Any]]:
+    import main
+
+    def analysis_and_images():
+        _, images = main.run_full_analysis(inputs.image, filename="bench_R-MLO.png")
+        return [images[key] for key in images]  # Renders every image, as /report does
+
+    return {
+        "run_full_analysis": lambda: main.run_full_analysis(inputs.image, filename="bench_R-MLO.png"),
+        "run_full_analysis+images": analysis_and_images,
+    }
+
+
+SUITES = {
+    "grad_cam": grad_cam_cases,
+    "mammogram_validator": validator_cases,
+    "duplicate_detector": duplicate_cases,
+    "image_hashing": hashing_cases,
+    "report_generator": report_cases,
+    "main": pipeline_cases,
+}
+
+
+def time_case(case, repeat: int, max_seconds: float) -> Dict[str, Any]:
+    """One warm-up call, then up to `repeat` timed calls (at least one) within max_seconds"""
+    run = case.fn if isinstance(case, SelfTimed) else case
+    run()
+    timings: List[float] = []
+    budget_end = time.perf_counter() + max_seconds
+    while len(timings) < repeat and (not timings or time.perf_counter() < budget_end):
+        started = time.perf_counter()
+        measured = run()
+        timings.append(measured if isinstance(case, SelfTimed) else time.perf_counter() - started)
+    return {**percentile_summary(timings), "runs": len(timings)}
+
+
+def build_model():
+    import tensorflow as tf
+
+    import main
+
+    tf.keras.utils.set_random_seed(0)
+    model = main._create_compatible_model()
+    main.model_registry.install(model, version="random-weights-seed0")  # Served instead of the real model
+    return model
+
+
+def environment() -> Dict[str, Any]:
+    import PIL
+    import tensorflow as tf
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "tensorflow": tf.__version__,
+        "cpus": os.cpu_count(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(sizes: List[str], repeat: int = 5, max_seconds: float = 10.0, only: str = None) -> Dict[str, Any]:
+    """
+    Returns:
+        {"environment": {...}, "results": {size: {"module.function": {p50_ms, p99_ms, mean_ms, runs}}}}
+    """
+    pattern = re.compile(only) if only else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main  # noqa: F401  Imported (and its startup output hidden) before timing
+        model = build_model()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            inputs = StageInputs(size, model)
+        width, height = SIZES[size]
+        print(f"\n{size} ({width}x{height})")
+        results[size] = {}
+        for module, make_cases in SUITES.items():
+            for name, case in make_cases(inputs).items():
+                key = f"{module}.{name}"
+                if pattern and not pattern.search(key):
+                    continue
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        results[size][key] = time_case(case, repeat, max_seconds)
+                except Exception as e:
+                    results[size][key] = {"error": f"{type(e).__name__}: {e}"}
+                print_row(key, results[size][key])
+    return {"environment": environment(), "results": results}
+
+
+def print_row(key: str, r: Dict[str, Any], baseline: Dict[str, Any] = None):
+    if "error" in r:
+        print(f"  {key:<66} error: {r['error']}")
+        return
+    line = f"  {key:<66}{r['p50_ms']:>11.2f} ms  ({r['runs']} runs)"
+    if baseline and "p50_ms" in baseline and baseline["p50_ms"] > 0:
+        line += f"  {r['p50_ms'] / baseline['p50_ms']:>6.2f}x vs {baseline['p50_ms']:.2f} ms"
+    print(line)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Tuple[str, str, float]]:
+    """
+    (size, stage, p50 ratio current/baseline) for stages present in both runs, slowest change first
+    """
+    ratios = []
+    for size, stages in current["results"].items():
+        for key, r in stages.items():
+            before = baseline.get("results", {}).get(size, {}).get(key, {})
+            if "p50_ms" in r and before.get("p50_ms"):
+                ratios.append((size, key, r["p50_ms"] / before["p50_ms"]))
+    return sorted(ratios, key=lambda item: item[2], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="512,2k,4k", help=f"Comma-separated subset of {','.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per function")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Stop repeating a function after this long")
+    parser.add_argument("--only", help="Regex on 'module.function' selecting what to run")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier --json output to compare p50 against")
+    args = parser.parse_args()
+
+    results = run(args.sizes.split(","), repeat=args.repeat, max_seconds=args.max_seconds, only=args.only)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\np50 vs {args.compare} (commit {baseline.get('environment', {}).get('commit')}):")
+        for size, key, ratio in compare(results, baseline):
+            print(f"  {size:>4} {key:<66}{ratio:>7.2f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,198 @@
+"""
+Throughput scaling benchmark for the pre-fork server (serve.py)
+
+For each worker count, starts `serve.py` in a subprocess, waits until every
+worker has warmed up, then fires concurrent /analyze requests with distinct
+synthetic mammograms and reports
+- throughput (requests/s) and p50/p99 latency
+- speed-up relative to 1 worker
+- memory: summed RSS (what independent processes would roughly cost) vs summed PSS
+  (actual footprint, shared pages split between the processes that map them)
+
+Usage (from backend/):
+    python -m benchmarks.bench_workers --workers 1 2 4 --requests 40 --random-weights
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_inference import percentile_summary
+from benchmarks.synthetic import distinct_mammograms, to_png_bytes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _read_kb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(root_pid):
+    """Root pid plus its direct children (Linux /proc)"""
+    pids = [root_pid]
+    try:
+        with open(f"/proc/{root_pid}/task/{root_pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def memory_mb(root_pid):
+    pids = process_tree(root_pid)
+    rss = sum(_read_kb(f"/proc/{pid}/status", "VmRSS") for pid in pids)
+    pss = sum(_read_kb(f"/proc/{pid}/smaps_rollup", "Pss") for pid in pids)
+    return {"processes": len(pids), "rss_mb": round(rss / 1024, 1), "pss_mb": round(pss / 1024, 1)}
+
+
+def start_server(workers, port, random_weights, startup_timeout):
+    """Launch the pre-fork server and block until all workers report warm-up"""
+    cmd = [sys.executable, "-m", "benchmarks.bench_workers", "--serve",
+           "--workers", str(workers), "--port", str(port)]
+    if random_weights:
+        cmd.append("--random-weights")
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+    warmed = threading.Semaphore(0)
+
+    def pump():
+        for line in proc.stdout:
+            if "warm-up" in line and "Worker" in line:
+                warmed.release()
+
+    threading.Thread(target=pump, daemon=True).start()
+    deadline = time.time() + startup_timeout
+    for _ in range(workers):
+        if not warmed.acquire(timeout=max(0.0, deadline - time.time())):
+            proc.kill()
+            raise RuntimeError(f"Workers did not warm up within {startup_timeout}s")
+    time.sleep(1.0)  # let uvicorn start accepting on the shared socket
+    return proc
+
+
+def fire(port, uploads, concurrency):
+    import requests
+
+    url = f"http://127.0.0.1:{port}/analyze"
+
+    def one(item):
+        name, payload = item
+        started = time.perf_counter()
+        response = requests.post(url, files={"file": (name, payload, "image/png")}, timeout=300)
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, uploads))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for status, latency in results if status == 200]
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "status_counts": {str(s): sum(1 for r, _ in results if r == s) for s in sorted({r for r, _ in results})},
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        **(percentile_summary(ok) if ok else {}),
+    }
+
+
+def run(worker_counts=(1, 2, 4), requests_per_level=40, concurrency_per_worker=2,
+        random_weights=False, port=8765, startup_timeout=300):
+    uploads = [(f"synthetic_{seed}.png", to_png_bytes(image))
+               for seed, image in distinct_mammograms(requests_per_level)]
+    results = {"cpu_count": os.cpu_count(), "requests_per_level": requests_per_level, "levels": []}
+
+    for workers in worker_counts:
+        proc = start_server(workers, port, random_weights, startup_timeout)
+        try:
+            idle_memory = memory_mb(proc.pid)
+            load = fire(port, uploads, concurrency=workers * concurrency_per_worker)
+            results["levels"].append({
+                "workers": workers,
+                **load,
+                "memory_idle": idle_memory,
+                "memory_after": memory_mb(proc.pid),
+            })
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    base = results["levels"][0]["throughput_rps"] if results["levels"] else 0
+    for level in results["levels"]:
+        level["speedup"] = round(level["throughput_rps"] / base, 2) if base else 0.0
+    return results
+
+
+def print_table(results):
+    print(f"\n/analyze throughput, {results['requests_per_level']} requests per level, "
+          f"{results['cpu_count']} CPU(s)")
+    print(f"{'workers':>7} {'ok':>4} {'req/s':>8} {'speedup':>8} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'sum RSS MB':>11} {'sum PSS MB':>11}")
+    for level in results["levels"]:
+        mem = level["memory_after"]
+        print(f"{level['workers']:>7} {level['ok']:>4} {level['throughput_rps']:>8.2f} {level['speedup']:>8.2f} "
+              f"{level.get('p50_ms', 0):>9.1f} {level.get('p99_ms', 0):>9.1f} "
+              f"{mem['rss_mb']:>11.1f} {mem['pss_mb']:>11.1f}")
+
+
+def serve_for_benchmark(workers, port, random_weights):
+    """Child mode: run the pre-fork server, optionally with a random-weight model"""
+    sys.path.insert(0, BACKEND_DIR)
+    import serve
+
+    load_model = None
+    if random_weights:
+        def load_model():
+            import main
+            return main._create_compatible_model()
+
+    serve.run_prefork(host="127.0.0.1", port=port, workers=workers, load_model=load_model, log_level="warning")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Pre-fork /analyze throughput scaling benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per worker count")
+    parser.add_argument("--concurrency-per-worker", type=int, default=2)
+    parser.add_argument("--random-weights", action="store_true", help="Use a random-weight model")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_for_benchmark(args.workers[0], args.port, args.random_weights)
+        return
+
+    results = run(
+        worker_counts=args.workers,
+        requests_per_level=args.requests,
+        concurrency_per_worker=args.concurrency_per_worker,
+        random_weights=args.random_weights,
+        port=args.port,
+    )
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,154 @@
+"""
+Synthetic mammogram-like test images for benchmarks
+Grayscale breast silhouette on a black background with a few dense regions.
+Each seed gives a different silhouette and tissue layout, so consecutive
+uploads pass the validator and are not flagged by the duplicate detector.
+"""
+
+import io
+from typing import Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Benchmark sizes (width, height), by longest side; mammograms are roughly 4:5 portrait
+SIZES = {
+    "512": (410, 512),
+    "2k": (1638, 2048),
+    "4k": (3277, 4096),
+}
+
+
+def synthetic_mammogram(
+    seed: int = 0,
+    width: int = 600,
+    height: int = 800,
+    pectoral: bool = False,
+    calcifications: int = 0,
+    label: Optional[str] = None,
+) -> Image.Image:
+    """
+    Build a synthetic RGB mammogram
+
+    Args:
+        seed: Random seed controlling silhouette, tissue blobs and noise
+        width: Image width in pixels
+        height: Image height in pixels
+        pectoral: Add a bright pectoral muscle wedge in the upper chest-wall corner (MLO-like)
+        calcifications: Number of small bright spots scattered over the tissue
+        label: View label such as "MLO" or "CC", printed in the top corner away from the
+            chest wall after the laterality ("R-MLO" for a chest wall on the left)
+
+    Returns:
+        PIL RGB image (gray values replicated across channels)
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    xx /= width
+    yy /= height
+
+    # Breast silhouette attached to the left or right edge
+    chest_wall_right = rng.random() < 0.5
+    if chest_wall_right:
+        xx = xx[:, ::-1]
+    center_y = rng.uniform(0.35, 0.65)
+    reach = rng.uniform(0.45, 0.95)
+    spread = rng.uniform(0.25, 0.48)
+    d = (xx / reach) ** 2 + ((yy - center_y) / spread) ** 2
+    tissue = np.where(d < 1, 90 + 70 * (1 - d), 0)
+
+    # Dense regions: large soft blobs change the low frequencies the perceptual hash looks at
+    for _ in range(rng.integers(3, 7)):
+        cx, cy = rng.uniform(0.05, reach * 0.8), rng.uniform(center_y - spread * 0.7, center_y + spread * 0.7)
+        sigma = rng.uniform(0.04, 0.15)
+        tissue += rng.uniform(30, 80) * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * sigma ** 2))
+
+    # Smooth parenchymal pattern: random low-frequency cosines
+    for _ in range(4):
+        fx, fy = rng.integers(1, 6, size=2)
+        phase = rng.uniform(0, 2 * np.pi)
+        tissue += rng.uniform(10, 25) * np.cos(2 * np.pi * (fx * xx + fy * yy) + phase)
+
+    # Coarse density map: random 8x8 field, smoothly upsampled
+    coarse = Image.fromarray(rng.uniform(0, 255, (8, 8)).astype(np.uint8)).resize((width, height), Image.Resampling.BICUBIC)
+    tissue += (np.asarray(coarse, dtype=np.float32) - 128) * 0.8
+
+    tissue = np.where(d < 1, tissue, 0) + rng.normal(0, 6, (height, width))
+
+    # Optional features use their own generator so the base image of a seed never changes
+    extras = np.random.default_rng([seed, 1])
+    if pectoral:
+        # Triangle from the chest wall: bright, with a soft edge along the hypotenuse
+        depth = extras.uniform(0.2, 0.3)
+        edge = 1 - (xx / depth + yy / (depth * 1.6))
+        muscle = 160 + 50 * np.minimum(edge * 6, 1) + extras.normal(0, 8, (height, width))
+        tissue = np.where(edge > 0, np.maximum(tissue, muscle), tissue)
+    if calcifications:
+        inside = np.argwhere(d < 0.8)
+        radius = max(1, round(min(width, height) / 400))
+        for y, x in inside[extras.integers(0, len(inside), calcifications)]:
+            tissue[max(0, y - radius):y + radius + 1, max(0, x - radius):x + radius + 1] = extras.uniform(235, 255)
+
+    gray = np.clip(tissue, 0, 255).astype(np.uint8)
+    image = Image.fromarray(gray)
+    if label:
+        text = f"{'L' if chest_wall_right else 'R'}-{label}"
+        font_size = max(12, height // 40)
+        try:
+            font = ImageFont.load_default(size=font_size)
+        except TypeError:  # Pillow < 10.1: fixed-size bitmap font
+            font = ImageFont.load_default()
+        left, _, right, _ = font.getbbox(text)
+        margin = height // 50
+        x = margin if chest_wall_right else width - margin - (right - left)
+        ImageDraw.Draw(image).text((x, margin), text, fill=255, font=font)
+    return image.convert("RGB")
+
+
+def benchmark_mammogram(size: str = "512", seed: int = 0, view: str = "MLO") -> Image.Image:
+    """
+    Synthetic mammogram with every feature the analyzers look for: tissue, a pectoral
+    wedge (MLO only), calcification-like spots and a corner view label
+
+    Args:
+        size: Key of SIZES
+        seed: Random seed
+        view: "MLO" or "CC"
+    """
+    width, height = SIZES[size]
+    return synthetic_mammogram(
+        seed, width, height,
+        pectoral=view == "MLO",
+        calcifications=25,
+        label=view,
+    )
+
+
+def to_png_bytes(image: Image.Image) -> bytes:
+    """Encode a PIL image as PNG upload bytes"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def distinct_mammograms(count: int, width: int = 600, height: int = 800, start_seed: int = 0):
+    """
+    Generate `count` synthetic mammograms that the duplicate detector treats as different images
+
+    Returns:
+        List of (seed, PIL image) tuples
+    """
+    from duplicate_detector import DuplicateDetector
+
+    detector = DuplicateDetector()
+    images = []
+    seed = start_seed
+    while len(images) < count:
+        image = synthetic_mammogram(seed, width, height)
+        data = image.tobytes()
+        is_duplicate, _ = detector.check_duplicate(data, image, f"synthetic_{seed}.png")
+        if not is_duplicate:
+            detector.remember(*detector.fingerprint(data, image), f"synthetic_{seed}.png")
+            images.append((seed, image))
+        seed += 1
+    return images
@@ -1,6 +1,6 @@
 # database.py - Database configuration and models
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, LargeBinary
+from sqlalchemy import create_engine, inspect, text, Column, Integer, BigInteger, String, Float, DateTime, Text, Boolean, ForeignKey, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -94,6 +94,7 @@ class Analysis(Base):
     risk_level = Column(String(50))
     risk_icon = Column(String(10))
     risk_color = Column(String(20))
+    model_version = Column(String(100))  # Model file stem + content hash that produced the result
     
     # View analysis (CC/MLO)
     view_type = Column(String(50))  # CC, MLO, L-MLO, R-MLO, etc.
@@ -115,6 +116,10 @@ class Analysis(Base):
     overlay_image_b64 = Column(Text)
     heatmap_image_b64 = Column(Text)
     bbox_image_b64 = Column(Text)
+    cancer_type_image_b64 = Column(Text)
+    
+    # Grad-CAM heatmap and region boxes (JSON) for rendering missing images on demand
+    render_state_json = Column(Text)
     
     # Timestamps
     analyzed_at = Column(DateTime, default=datetime.utcnow)
@@ -135,6 +140,12 @@ class Report(Base):
     # Report metadata
     report_number = Column(String(100), unique=True, index=True)
     
+    # Patient details printed on the report, kept so a regenerate does not change them
+    patient_name = Column(String(255))
+    patient_age = Column(String(20))
+    patient_sex = Column(String(20))
+    patient_hn = Column(String(100))
+
     # Doctor information
     department = Column(String(100), default="Radiology")
     request_doctor = Column(String(255))
@@ -162,6 +173,38 @@ class UploadHistory(Base):
     analysis_id = Column(Integer, ForeignKey("analyses.id"), nullable=True)
 
 
+class UploadFingerprint(Base):
+    """Hashes of accepted uploads, shared by all workers for duplicate detection"""
+    __tablename__ = "upload_fingerprints"
+    
+    id = Column(Integer, primary_key=True)
+    scope = Column(String(100), nullable=False)  # user:<id>, session:<id> or anonymous
+    file_hash = Column(String(64), nullable=False)  # SHA-256 of the file
+    phash = Column(BigInteger, nullable=False)  # 64-bit perceptual hash, stored signed
+    filename = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, index=True)  # TTL and LRU eviction
+    
+    __table_args__ = (
+        UniqueConstraint("scope", "file_hash", name="uq_upload_fingerprints_scope_file"),
+        # Workers fetch only the rows added since their last sync
+        Index("ix_upload_fingerprints_scope_id", "scope", "id"),
+    )
+
+
+class ReportJob(Base):
+    """Status of queued PDF reports, so any worker can answer a poll for a job another worker runs"""
+    __tablename__ = "report_jobs"
+    
+    job_id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False)  # queued, running, done, failed
+    report_id = Column(Integer, ForeignKey("reports.id"), nullable=True)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, index=True)  # TTL cleanup
+
+
 class AuditLog(Base):
     """Audit log for tracking user actions"""
     __tablename__ = "audit_logs"
@@ -177,9 +220,30 @@ class AuditLog(Base):
 
 # ==================== DATABASE FUNCTIONS ====================
 
+def add_missing_columns():
+    """
+    Add nullable columns that were added to the models after the table was created.
+    create_all() only creates missing tables, it never alters existing ones.
+    """
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"✅ Added column {table.name}.{column.name}")
+
+
 def create_tables():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("✅ Database tables created successfully")
 
 
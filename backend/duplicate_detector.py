@@ -1,21 +1,42 @@
 """
 Duplicate image detection using perceptual hashing
-Detects when the same image is uploaded multiple times, even with different filenames
+Detects when the same image is uploaded multiple times, even with different filenames.
+Fingerprints are kept per scope (user or session) in a store, see duplicate_store.
+check_duplicate only reads the store; callers remember() an upload once its analysis
+succeeded, so a rejected or failed upload can be retried.
 """
 
 import hashlib
-import numpy as np
 from PIL import Image
-from typing import Tuple
-import io
+from typing import Any, Dict, Optional, Tuple
+
+from duplicate_store import DEFAULT_SCOPE, MemoryFingerprintStore
+from image_context import ImageContext
+from image_hashing import dct_hash, to_hex
+from phash_index import HASH_BITS, hamming
+
+# Perceptual hashes this close are the same image, possibly compressed differently.
+# Stricter than the frontend (<=5) to reduce false positives
+NEAR_DUPLICATE_DISTANCE = 3
+
+
+def index_bands(max_distance: int) -> int:
+    """Fewest bands that keep a search within max_distance exact (more bands = more candidates)"""
+    return next(bands for bands in (4, 8, 16, 32, 64) if bands > max_distance)
 
 
 class DuplicateDetector:
     """Detects duplicate images using file hash and perceptual hash"""
     
-    def __init__(self):
-        self.uploaded_hashes = {}  # Store hashes of uploaded images
-        self.uploaded_phashes = {}  # Store perceptual hashes
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_DISTANCE, store=None):
+        """
+        Args:
+            max_distance: Perceptual hash distance up to which images count as duplicates
+            store: Fingerprint store (default: MemoryFingerprintStore, this process only).
+                Stores are thread-safe, so the detector itself takes no lock
+        """
+        self.max_distance = max_distance
+        self.store = store if store is not None else MemoryFingerprintStore(bands=index_bands(max_distance))
     
     @staticmethod
     def get_file_hash(image_data: bytes) -> str:
@@ -31,35 +52,19 @@ class DuplicateDetector:
         return hashlib.sha256(image_data).hexdigest()
     
     @staticmethod
-    def get_perceptual_hash(image: Image.Image) -> str:
+    def get_perceptual_hash(image: Image.Image, context: Optional[ImageContext] = None) -> str:
         """
         Generate perceptual hash of image (detects similar images)
-        Uses 8x8 grayscale approach
+        DCT pHash of the 32x32 grayscale thumbnail, see image_hashing
         
         Args:
             image: PIL Image object
+            context: ImageContext of image, reuses its thumbnail
             
         Returns:
             Hex string of the perceptual hash
         """
-        # Resize to 8x8
-        img_small = image.resize((8, 8), Image.Resampling.LANCZOS)
-        
-        # Convert to grayscale
-        img_gray = img_small.convert('L')
-        
-        # Get pixel data
-        pixels = np.array(img_gray)
-        
-        # Calculate average pixel value
-        avg = pixels.mean()
-        
-        # Create binary hash: 1 if pixel > avg, 0 otherwise
-        hash_bits = (pixels > avg).flatten()
-        
-        # Convert to hex
-        hash_int = int(''.join(hash_bits.astype(int).astype(str)), 2)
-        return format(hash_int, '016x')
+        return to_hex(dct_hash(ImageContext.of(image, context).hash_thumbnail))
     
     @staticmethod
     def hamming_distance(hash1: str, hash2: str) -> int:
@@ -76,62 +81,53 @@ class DuplicateDetector:
         """
         if len(hash1) != len(hash2):
             return float('inf')
-        
-        # Convert hex to binary and count differing bits
-        bin1 = bin(int(hash1, 16))[2:].zfill(64)
-        bin2 = bin(int(hash2, 16))[2:].zfill(64)
-        
-        distance = sum(b1 != b2 for b1, b2 in zip(bin1, bin2))
-        return distance
+        return hamming(int(hash1, 16), int(hash2, 16))
+    
+    def _file_hash(self, image_data: bytes, context: Optional[ImageContext]) -> str:
+        if context is not None and context.data is image_data:
+            return context.file_hash
+        return self.get_file_hash(image_data)
     
-    def check_duplicate(self, image_data: bytes, image: Image.Image, filename: str) -> Tuple[bool, str]:
+    def fingerprint(
+        self, image_data: bytes, image: Image.Image, context: Optional[ImageContext] = None
+    ) -> Tuple[str, int]:
+        """(file hash, perceptual hash) of an upload, as check_duplicate and remember use them"""
+        return self._file_hash(image_data, context), dct_hash(ImageContext.of(image, context).hash_thumbnail)
+    
+    def check_duplicate(
+        self,
+        image_data: bytes,
+        image: Image.Image,
+        filename: str,
+        context: Optional[ImageContext] = None,
+        scope: str = DEFAULT_SCOPE,
+    ) -> Tuple[bool, str]:
         """
-        Check if image is a duplicate of previously uploaded images
+        Check if image is a duplicate of previously remembered uploads (read-only)
         
         Args:
             image_data: Raw image bytes
             image: PIL Image object
             filename: Original filename
+            context: ImageContext built from image_data, reuses its file hash and thumbnail
+            scope: Only uploads in the same scope (user or session) count as duplicates
             
         Returns:
             Tuple of (is_duplicate, reason_message)
         """
         try:
-            # If no images have been uploaded yet, this is the first one
-            if not self.uploaded_hashes and not self.uploaded_phashes:
-                # Store this image's hashes for future comparisons
-                file_hash = self.get_file_hash(image_data)
-                phash = self.get_perceptual_hash(image)
-                self.uploaded_hashes[file_hash] = filename
-                self.uploaded_phashes[phash] = filename
-                return False, ""
-            
-            # Get file hash (exact duplicate detection)
-            file_hash = self.get_file_hash(image_data)
-            
-            # Check against previously uploaded file hashes
-            for prev_hash, prev_filename in self.uploaded_hashes.items():
-                if file_hash == prev_hash:
-                    return True, f"❌ Exact duplicate detected: This image matches '{prev_filename}'. Please upload a different mammogram."
-            
-            # Get perceptual hash (similar image detection)
-            phash = self.get_perceptual_hash(image)
-            
-            # Check against previously uploaded perceptual hashes
-            for prev_phash, prev_filename in self.uploaded_phashes.items():
-                distance = self.hamming_distance(phash, prev_phash)
-                
-                # Threshold: distance <= 3 means very similar (same image, possibly compressed differently)
-                # This is stricter than the frontend (<=5) to reduce false positives
-                if distance <= 3:
-                    return True, f"❌ Duplicate detected: This image is very similar to '{prev_filename}' (similarity: {64-distance}/64). Please upload a different mammogram."
-            
-            # Store this image's hashes for future comparisons
-            self.uploaded_hashes[file_hash] = filename
-            self.uploaded_phashes[phash] = filename
-            
-            return False, ""
+            # Hashing may build the thumbnail from the full upload: it runs outside the
+            # store's lock, so concurrent requests only serialize on the index lookup
+            file_hash, phash = self.fingerprint(image_data, image, context)
             
+            # Exact (file hash) or similar (perceptual hash) upload seen before
+            match = self.store.find(scope, file_hash, phash, self.max_distance)
+            if match is None:
+                return False, ""
+            if match.exact:
+                return True, f"❌ Exact duplicate detected: This image matches '{match.filename}'. Please upload a different mammogram."
+            return True, f"❌ Duplicate detected: This image is very similar to '{match.filename}' (similarity: {HASH_BITS - match.distance}/{HASH_BITS}). Please upload a different mammogram."
+        
         except Exception as e:
             print(f"⚠️ Error checking for duplicates: {e}")
             import traceback
@@ -139,10 +135,27 @@ class DuplicateDetector:
             # Fail-safe: allow image through if duplicate check fails
             return False, ""
     
-    def clear(self):
-        """Clear stored hashes (call after analysis session ends)"""
-        self.uploaded_hashes.clear()
-        self.uploaded_phashes.clear()
+    def remember(self, file_hash: str, phash: int, filename: str, scope: str = DEFAULT_SCOPE):
+        """
+        Record an upload whose analysis succeeded, so later uploads of it are duplicates
+        
+        Args:
+            file_hash, phash: fingerprint(image_data, image, context) of the upload
+            filename: Original filename, named in duplicate messages
+            scope: Same scope as passed to check_duplicate
+        """
+        self.store.add(scope, file_hash, phash, filename)
+    
+    def count(self, scope: str = DEFAULT_SCOPE) -> int:
+        """Uploads remembered in a scope"""
+        return self.store.count(scope)
+    
+    def clear(self, scope: Optional[str] = None):
+        """Clear stored hashes of one scope, or of every scope (call after analysis session ends)"""
+        self.store.clear(scope)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"max_distance": self.max_distance, **self.store.stats()}
 
 
 # Global instance for the application
@@ -0,0 +1,479 @@
+"""
+Where the duplicate detector keeps fingerprints of accepted uploads
+
+Fingerprints are grouped by scope (one user, one browser session, or anonymous), so
+one user's uploads never block another's and clearing a session clears only that
+session.
+
+- MemoryFingerprintStore: this process only (tests, servers without a database)
+- DatabaseFingerprintStore: the upload_fingerprints table, shared by every worker and
+  kept across restarts. Each worker keeps a read-through index per scope and fetches
+  only the rows added since its last lookup, so a lookup costs one indexed query plus
+  an in-memory search. Queries run outside the index lock, so lookups from concurrent
+  analyses do not wait on each other's database round trips. Rows expire after a TTL,
+  and each scope keeps its most recently seen entries up to a size limit.
+
+Both stores are thread-safe.
+
+backfill_fingerprints indexes the analyses already stored in the database (python
+duplicate_store.py --backfill).
+"""
+
+import base64
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from phash_index import HammingIndex
+
+DEFAULT_SCOPE = "anonymous"
+
+
+class Match(NamedTuple):
+    """A stored upload matching a new one"""
+
+    filename: str
+    distance: int  # Hamming distance of the perceptual hashes, 0 for exact file matches
+    exact: bool  # Same file bytes (SHA-256)
+
+
+class Entry(NamedTuple):
+    row_id: Optional[int]
+    file_hash: str
+    phash: int
+    filename: str
+
+
+def to_signed64(h: int) -> int:
+    """Unsigned 64-bit hash -> value that fits a signed BIGINT column"""
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class ScopeIndex:
+    """Exact (SHA-256) and near (perceptual hash) lookups over one scope's uploads"""
+
+    def __init__(self, bands: int):
+        self.files: Dict[str, Entry] = {}
+        self.phashes: HammingIndex[Entry] = HammingIndex(bands=bands)
+        self.last_row_id = 0  # Highest database row seen (DatabaseFingerprintStore)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def add(self, entry: Entry):
+        self.files[entry.file_hash] = entry
+        self.phashes.add(entry.phash, entry)
+
+    def remove(self, entry: Entry):
+        if self.files.get(entry.file_hash) == entry:
+            del self.files[entry.file_hash]
+        if self.phashes.get(entry.phash) == entry:
+            self.phashes.remove(entry.phash)
+
+    def find(self, file_hash: str, phash: int, max_distance: int) -> Optional[Tuple[Entry, Match]]:
+        entry = self.files.get(file_hash)
+        if entry is not None:
+            return entry, Match(entry.filename, 0, True)
+        found = self.phashes.nearest(phash, max_distance)
+        if found is None:
+            return None
+        entry, distance = found
+        return entry, Match(entry.filename, distance, False)
+
+
+class MemoryFingerprintStore:
+    """Per-scope fingerprints held in this process"""
+
+    def __init__(self, bands: int = 4):
+        self.bands = bands
+        self._scopes: Dict[str, ScopeIndex] = {}
+        # Requests are analyzed on a thread pool
+        self._lock = threading.Lock()
+
+    def find(self, scope: str, file_hash: str, phash: int, max_distance: int) -> Optional[Match]:
+        with self._lock:
+            index = self._scopes.get(scope)
+            found = index.find(file_hash, phash, max_distance) if index else None
+        return found[1] if found else None
+
+    def add(self, scope: str, file_hash: str, phash: int, filename: str) -> Optional[str]:
+        """Store an upload. Returns None (the file is never already stored in memory mode)."""
+        with self._lock:
+            index = self._scopes.get(scope)
+            if index is None:
+                index = self._scopes[scope] = ScopeIndex(self.bands)
+            index.add(Entry(None, file_hash, phash, filename))
+        return None
+
+    def count(self, scope: str = DEFAULT_SCOPE) -> int:
+        with self._lock:
+            index = self._scopes.get(scope)
+            return len(index) if index else 0
+
+    def clear(self, scope: Optional[str] = None):
+        with self._lock:
+            if scope is None:
+                self._scopes.clear()
+            else:
+                self._scopes.pop(scope, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "scopes": len(self._scopes),
+                "entries": sum(len(index) for index in self._scopes.values()),
+            }
+
+
+class DatabaseFingerprintStore:
+    """Fingerprints in the upload_fingerprints table with a per-worker read-through index"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        bands: int = 4,
+        ttl_seconds: float = 24 * 3600,
+        max_per_scope: int = 10000,
+        cached_scopes: int = 256,
+        purge_interval: float = 300,
+        sync_overlap: int = 100,
+    ):
+        """
+        Args:
+            session_factory: SQLAlchemy session factory (database.SessionLocal)
+            bands: HammingIndex bands, see duplicate_detector.index_bands
+            ttl_seconds: Entries not seen for this long are forgotten (0 keeps them forever)
+            max_per_scope: Entries kept per scope; the least recently seen go first
+            cached_scopes: Scopes whose index this worker keeps in memory (LRU)
+            purge_interval: Seconds between deletions of expired rows
+            sync_overlap: Row ids below the highest one seen that are fetched again on every
+                sync. Ids are allocated before commit (Postgres sequences), so a row can
+                become visible after a higher id was already synced
+        """
+        self.session_factory = session_factory
+        self.bands = bands
+        self.ttl_seconds = ttl_seconds
+        self.max_per_scope = max_per_scope
+        self.cached_scopes = max(1, cached_scopes)
+        self.purge_interval = purge_interval
+        self.sync_overlap = max(0, int(sync_overlap))
+        self._scopes: "OrderedDict[str, ScopeIndex]" = OrderedDict()
+        # Guards the indexes and counters only; database queries run without it
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+        # Metrics
+        self._lookups = 0
+        self._matches = 0
+        self._rows_synced = 0
+        self._stale_matches = 0
+        self._evicted = 0
+        self._purged = 0
+
+    def _cutoff(self) -> Optional[datetime]:
+        if not self.ttl_seconds:
+            return None
+        return datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+    def _scope_index(self, scope: str) -> ScopeIndex:
+        """The scope's index, created empty if this worker has none (caller holds the lock)"""
+        index = self._scopes.get(scope)
+        if index is None:
+            index = self._scopes[scope] = ScopeIndex(self.bands)
+            while len(self._scopes) > self.cached_scopes:
+                self._scopes.popitem(last=False)
+        else:
+            self._scopes.move_to_end(scope)
+        return index
+
+    def _sync(self, db, scope: str, index: ScopeIndex):
+        """Add the scope's rows written (by any worker) since the last sync"""
+        from database import UploadFingerprint
+
+        with self._lock:
+            last_row_id = index.last_row_id
+        # Rows just below the high-water mark are fetched again: one whose id was allocated
+        # earlier may have committed after a higher id was synced
+        query = db.query(
+            UploadFingerprint.id, UploadFingerprint.file_hash, UploadFingerprint.phash, UploadFingerprint.filename
+        ).filter(UploadFingerprint.scope == scope, UploadFingerprint.id > last_row_id - self.sync_overlap)
+        cutoff = self._cutoff()
+        if cutoff is not None:
+            query = query.filter(UploadFingerprint.last_seen_at >= cutoff)
+        rows = query.order_by(UploadFingerprint.id).all()
+
+        with self._lock:
+            for row_id, file_hash, phash, filename in rows:
+                entry = Entry(row_id, file_hash, from_signed64(phash), filename)
+                if index.files.get(file_hash) != entry:
+                    index.add(entry)
+                    self._rows_synced += 1
+                index.last_row_id = max(index.last_row_id, row_id)
+
+    def find(self, scope: str, file_hash: str, phash: int, max_distance: int) -> Optional[Match]:
+        from database import UploadFingerprint
+
+        with self._lock:
+            self._lookups += 1
+            index = self._scope_index(scope)
+        db = self.session_factory()
+        try:
+            self._sync(db, scope, index)
+            while True:
+                with self._lock:
+                    found = index.find(file_hash, phash, max_distance)
+                if found is None:
+                    return None
+                entry, match = found
+                # Matches are rare: confirm the row was not cleared or expired by another worker
+                row = db.get(UploadFingerprint, entry.row_id)
+                cutoff = self._cutoff()
+                if row is not None and (cutoff is None or row.last_seen_at >= cutoff):
+                    row.last_seen_at = datetime.utcnow()
+                    db.commit()
+                    with self._lock:
+                        self._matches += 1
+                    return match
+                with self._lock:
+                    index.remove(entry)
+                    self._stale_matches += 1
+        finally:
+            db.close()
+
+    def add(self, scope: str, file_hash: str, phash: int, filename: str) -> Optional[str]:
+        """
+        Store an upload
+
+        Returns:
+            None, or the filename of the same file stored meanwhile by another worker
+        """
+        from sqlalchemy.exc import IntegrityError
+
+        from database import UploadFingerprint
+
+        db = self.session_factory()
+        try:
+            row = UploadFingerprint(scope=scope, file_hash=file_hash, phash=to_signed64(phash), filename=filename)
+            db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                existing = db.query(UploadFingerprint.filename).filter(
+                    UploadFingerprint.scope == scope, UploadFingerprint.file_hash == file_hash
+                ).scalar()
+                return existing or filename
+            with self._lock:
+                index = self._scope_index(scope)
+                index.add(Entry(row.id, file_hash, phash, filename))
+                over_limit = len(index) > self.max_per_scope
+            if over_limit:
+                self._evict(db, scope, index)
+            self._maybe_purge(db)
+            return None
+        finally:
+            db.close()
+
+    def _evict(self, db, scope: str, index: ScopeIndex):
+        """Drop the scope's least recently seen rows beyond max_per_scope"""
+        from database import UploadFingerprint
+
+        self._sync(db, scope, index)
+        with self._lock:
+            excess = len(index) - self.max_per_scope
+        if excess <= 0:
+            return
+        rows: List[Tuple[int, str, int, str]] = (
+            db.query(UploadFingerprint.id, UploadFingerprint.file_hash, UploadFingerprint.phash, UploadFingerprint.filename)
+            .filter(UploadFingerprint.scope == scope)
+            .order_by(UploadFingerprint.last_seen_at, UploadFingerprint.id)
+            .limit(excess)
+            .all()
+        )
+        db.query(UploadFingerprint).filter(UploadFingerprint.id.in_([r[0] for r in rows])).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            for row_id, file_hash, phash, filename in rows:
+                index.remove(Entry(row_id, file_hash, from_signed64(phash), filename))
+            self._evicted += len(rows)
+
+    def _maybe_purge(self, db):
+        """Delete expired rows of every scope, at most once per purge_interval"""
+        from database import UploadFingerprint
+
+        cutoff = self._cutoff()
+        with self._lock:
+            if cutoff is None or time.monotonic() - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = time.monotonic()
+        deleted = db.query(UploadFingerprint).filter(UploadFingerprint.last_seen_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        with self._lock:
+            self._purged += deleted
+            if deleted:
+                # Rebuilt from the remaining rows on the next lookup
+                self._scopes.clear()
+
+    def count(self, scope: str = DEFAULT_SCOPE) -> int:
+        from database import UploadFingerprint
+
+        db = self.session_factory()
+        try:
+            return db.query(UploadFingerprint).filter(UploadFingerprint.scope == scope).count()
+        finally:
+            db.close()
+
+    def clear(self, scope: Optional[str] = None):
+        """Forget a scope's uploads (every scope if None) in the database and in this worker"""
+        from database import UploadFingerprint
+
+        db = self.session_factory()
+        try:
+            query = db.query(UploadFingerprint)
+            if scope is not None:
+                query = query.filter(UploadFingerprint.scope == scope)
+            query.delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            if scope is None:
+                self._scopes.clear()
+            else:
+                self._scopes.pop(scope, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "database",
+                "ttl_seconds": self.ttl_seconds,
+                "max_per_scope": self.max_per_scope,
+                "cached_scopes": len(self._scopes),
+                "cached_entries": sum(len(index) for index in self._scopes.values()),
+                "lookups": self._lookups,
+                "matches": self._matches,
+                "rows_synced": self._rows_synced,
+                "stale_matches": self._stale_matches,
+                "evicted": self._evicted,
+                "purged": self._purged,
+            }
+
+
+def analysis_scope(user_id: Optional[int]) -> str:
+    """Scope of an upload analyzed by user_id (main.duplicate_scope of a signed-in request)"""
+    return f"user:{user_id}" if user_id is not None else DEFAULT_SCOPE
+
+
+def backfill_fingerprints(
+    session_factory: Callable[[], Any],
+    since: Optional[datetime] = None,
+    batch_size: int = 64,
+) -> Dict[str, int]:
+    """
+    Fingerprint the original images of stored analyses
+
+    Analyses are read in id order, batch_size at a time; each batch is decoded,
+    thumbnailed and hashed in one call. A fingerprint already stored for the same scope
+    and file gets the recomputed perceptual hash (so rows written by an older hash
+    function match again), otherwise a row is added with last_seen_at set to the
+    analysis time, so the TTL applies as if the file had been uploaded then.
+    Running workers fetch only rows near or above the highest id they have seen: restart
+    them after rehashing existing ones.
+
+    Args:
+        session_factory: SQLAlchemy session factory (database.SessionLocal)
+        since: Only analyses from this time on (None: all)
+        batch_size: Analyses decoded and hashed per batch
+
+    Returns:
+        {"analyses", "added", "updated", "skipped"} counts; skipped images could not be decoded
+    """
+    import numpy as np
+    from PIL import Image
+
+    from database import Analysis, UploadFingerprint
+    from image_context import ImageContext
+    from image_hashing import hash_thumbnails
+
+    counts = {"analyses": 0, "added": 0, "updated": 0, "skipped": 0}
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            query = db.query(
+                Analysis.id, Analysis.user_id, Analysis.filename, Analysis.original_image_b64, Analysis.analyzed_at
+            ).filter(Analysis.id > last_id, Analysis.original_image_b64.isnot(None))
+            if since is not None:
+                query = query.filter(Analysis.analyzed_at >= since)
+            rows = query.order_by(Analysis.id).limit(batch_size).all()
+            if not rows:
+                return counts
+            last_id = rows[-1].id
+            counts["analyses"] += len(rows)
+
+            # Newest analysis of each (scope, file) wins
+            uploads: Dict[Tuple[str, str], Tuple[Any, np.ndarray]] = {}
+            for row in rows:
+                try:
+                    data = base64.b64decode(row.original_image_b64)
+                    image = Image.open(io.BytesIO(data)).convert("RGB")
+                except Exception:
+                    counts["skipped"] += 1
+                    continue
+                key = (analysis_scope(row.user_id), hashlib.sha256(data).hexdigest())
+                uploads[key] = (row, ImageContext(image).hash_thumbnail)
+            if not uploads:
+                continue
+            phashes = hash_thumbnails(np.stack([thumbnail for _, thumbnail in uploads.values()]))
+
+            file_hashes = {file_hash for _, file_hash in uploads}
+            existing = {
+                (fingerprint.scope, fingerprint.file_hash): fingerprint
+                for fingerprint in db.query(UploadFingerprint).filter(UploadFingerprint.file_hash.in_(file_hashes))
+            }
+            for ((scope, file_hash), (row, _)), phash in zip(uploads.items(), phashes):
+                fingerprint = existing.get((scope, file_hash))
+                if fingerprint is not None:
+                    fingerprint.phash = to_signed64(int(phash))
+                    counts["updated"] += 1
+                else:
+                    db.add(UploadFingerprint(
+                        scope=scope, file_hash=file_hash, phash=to_signed64(int(phash)), filename=row.filename,
+                        created_at=row.analyzed_at, last_seen_at=row.analyzed_at,
+                    ))
+                    counts["added"] += 1
+            db.commit()
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Duplicate fingerprint maintenance")
+    parser.add_argument("--backfill", action="store_true", help="Fingerprint the images of stored analyses")
+    parser.add_argument(
+        "--hours", type=float, default=None,
+        help="Only analyses from the last N hours (match DUPLICATE_TTL_HOURS; default: all)",
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.error("nothing to do (use --backfill)")
+
+    from database import SessionLocal, create_tables
+
+    create_tables()
+    since = datetime.utcnow() - timedelta(hours=args.hours) if args.hours else None
+    print(backfill_fingerprints(SessionLocal, since=since, batch_size=args.batch_size))
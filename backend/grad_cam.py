@@ -1,22 +1,136 @@
 import tensorflow as tf
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import matplotlib
-import re
+import threading
 
-matplotlib.use("Agg")  # Ensure headless rendering for serverless environments
-import matplotlib.cm as cm
-import matplotlib.pyplot as plt
 from scipy import ndimage
 
-# Try to import OCR libraries
-try:
-    import pytesseract
-    import cv2
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-    print("WARNING: pytesseract or cv2 not available. OCR-based text detection disabled.")
+from heatmap_render import blend_heatmap, render_heatmap_panel
+from image_context import ImageContext, analysis_resolution
+from intensity_histogram import IntensityHistogram
+from label_ocr import OCR_AVAILABLE, label_ocr, parse_mammogram_label
+from stage_timing import span
+
+INPUT_SIGNATURE = [tf.TensorSpec(shape=[None, 224, 224, 3], dtype=tf.float32)]
+
+
+class GradCAMExplainer:
+    """
+    Grad-CAM gradient model built once per loaded model.
+    Returns the sigmoid output and the Grad-CAM heatmap from a single taped forward pass,
+    so a request no longer needs a separate model.predict call.
+
+    With compiled=True the taped pass runs as a tf.function with a fixed
+    [None, 224, 224, 3] input signature (traced once), optionally XLA-compiled.
+    """
+
+    def __init__(self, model, last_conv_layer_index, compiled=False, jit_compile=False):
+        self.model = model
+        self.last_conv_layer_index = last_conv_layer_index
+        self.compiled = compiled
+        self.jit_compile = jit_compile
+
+        # For loaded Sequential models, we need to create inputs manually
+        inputs = tf.keras.Input(shape=(224, 224, 3))
+
+        # Pass through all layers up to and including the last conv layer
+        x = inputs
+        conv_output = None
+        for i, layer in enumerate(model.layers):
+            x = layer(x)
+            if i == last_conv_layer_index:
+                conv_output = x
+
+        # Model that maps inputs to activations of the last conv layer and the output predictions
+        self.grad_model = tf.keras.Model(inputs=inputs, outputs=[conv_output, x])
+
+        self._explain_fn = self._explain_tensors
+        if compiled:
+            self._explain_fn = tf.function(
+                self._explain_tensors,
+                input_signature=INPUT_SIGNATURE,
+                jit_compile=jit_compile,
+            )
+
+    def _explain_tensors(self, img_tensor, pred_index=0):
+        with tf.GradientTape() as tape:
+            conv_outputs, predictions = self.grad_model(img_tensor, training=False)
+            class_channel = predictions[:, pred_index]
+
+        # Samples are independent, so the gradient of the batch sum gives per-sample gradients
+        grads = tape.gradient(class_channel, conv_outputs)
+        if grads is None:
+            return class_channel, None
+
+        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+        heatmaps = tf.einsum("nhwc,nc->nhw", conv_outputs, pooled_grads)
+        heatmaps = tf.maximum(heatmaps, 0)
+
+        # Normalize each heatmap to [0, 1] (all-zero heatmaps stay zero)
+        max_vals = tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True)
+        heatmaps = tf.math.divide_no_nan(heatmaps, max_vals)
+
+        return class_channel, heatmaps
+
+    def explain(self, img_array, pred_index=0):
+        """
+        Run one taped forward pass over a batch.
+
+        Args:
+            img_array: Preprocessed input batch (batch_size, 224, 224, 3)
+            pred_index: Index of the output unit to explain
+
+        Returns:
+            Tuple of (predictions, heatmaps)
+            - predictions: numpy array of shape (batch_size,) with the sigmoid output
+            - heatmaps: list of normalized heatmaps, one per sample (None if gradients failed)
+        """
+        img_tensor = tf.convert_to_tensor(img_array, dtype=tf.float32)
+        if pred_index == 0:
+            predictions, heatmaps = self._explain_fn(img_tensor)
+        else:
+            # The compiled function is traced for the single sigmoid output only
+            predictions, heatmaps = self._explain_tensors(img_tensor, pred_index)
+        predictions = predictions.numpy()
+
+        if heatmaps is None:
+            return predictions, [None] * len(predictions)
+
+        return predictions, list(heatmaps.numpy())
+
+
+_explainer_cache = {}
+_explainer_lock = threading.Lock()
+
+
+def get_gradcam_explainer(model, last_conv_layer_index=None, compiled=False, jit_compile=False):
+    """
+    Get the cached Grad-CAM explainer for a model, building it on first use.
+    Keyed by model identity, last conv layer index and compilation options.
+
+    Returns:
+        GradCAMExplainer, or None if the model has no convolutional layer
+    """
+    if last_conv_layer_index is None:
+        last_conv_layer_index = get_last_conv_layer_index(model)
+        if last_conv_layer_index is None:
+            return None
+
+    key = (id(model), last_conv_layer_index, compiled, jit_compile)
+    explainer = _explainer_cache.get(key)
+    if explainer is not None and explainer.model is model:
+        return explainer
+
+    with _explainer_lock:
+        explainer = _explainer_cache.get(key)
+        if explainer is None or explainer.model is not model:
+            # Drop explainers of models that are no longer loaded
+            for stale_key in [k for k, e in _explainer_cache.items() if e.model is not model]:
+                del _explainer_cache[stale_key]
+            explainer = GradCAMExplainer(model, last_conv_layer_index, compiled=compiled, jit_compile=jit_compile)
+            _explainer_cache[key] = explainer
+    return explainer
+
 
 def make_gradcam_heatmap(img_array, model, last_conv_layer_index, pred_index=None):
     """
@@ -31,52 +145,9 @@ def make_gradcam_heatmap(img_array, model, last_conv_layer_index, pred_index=Non
     Returns:
         Normalized heatmap as numpy array
     """
-    # Get the last convolutional layer
-    last_conv_layer = model.layers[last_conv_layer_index]
-    
-    # For loaded Sequential models, we need to create inputs manually
-    # Create a new input tensor
-    inputs = tf.keras.Input(shape=(224, 224, 3))
-    
-    # Pass through all layers up to and including the last conv layer
-    x = inputs
-    for i, layer in enumerate(model.layers):
-        x = layer(x)
-        if i == last_conv_layer_index:
-            conv_output = x
-    
-    # Get the final output
-    final_output = x
-    
-    # Create a model that maps inputs to activations of the last conv layer and the output predictions
-    grad_model = tf.keras.Model(
-        inputs=inputs,
-        outputs=[conv_output, final_output]
-    )
-    
-    with tf.GradientTape() as tape:
-        conv_outputs, predictions = grad_model(img_array)
-        if pred_index is None:
-            pred_index = 0
-        class_channel = predictions[:, pred_index]
-    
-    grads = tape.gradient(class_channel, conv_outputs)
-    
-    if grads is None:
-        return None
-    
-    pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
-    
-    conv_outputs = conv_outputs[0]
-    heatmap = conv_outputs @ pooled_grads[..., tf.newaxis]
-    heatmap = tf.squeeze(heatmap)
-    
-    heatmap = tf.maximum(heatmap, 0)
-    max_val = tf.math.reduce_max(heatmap)
-    if max_val > 0:
-        heatmap = heatmap / max_val
-    
-    return heatmap.numpy()
+    explainer = get_gradcam_explainer(model, last_conv_layer_index)
+    _, heatmaps = explainer.explain(img_array, pred_index=pred_index or 0)
+    return heatmaps[0]
 
 def create_tissue_mask(img_array, threshold=15):
     """
@@ -138,7 +209,7 @@ def create_heatmap_overlay(original_image, heatmap, alpha=0.5, colormap='jet'):
         original_image: PIL Image object
         heatmap: Normalized heatmap array
         alpha: Transparency of the heatmap overlay (0-1)
-        colormap: Matplotlib colormap name
+        colormap: Colormap name (see heatmap_render.COLORMAP_SEGMENTS)
     
     Returns:
         PIL Image with heatmap overlay
@@ -168,32 +239,11 @@ def create_heatmap_overlay(original_image, heatmap, alpha=0.5, colormap='jet'):
         Image.BILINEAR
     ))
     
-    heatmap_resized = heatmap_resized.astype(np.float32) / 255.0
-    
     # Create tissue mask to avoid showing heatmap on black background
     tissue_mask = create_tissue_mask(img_array, threshold=15)
     
-    # Zero out heatmap in background areas
-    heatmap_resized = heatmap_resized * tissue_mask
-    
-    cmap = cm.get_cmap(colormap)
-    heatmap_colored = cmap(heatmap_resized)
-    heatmap_colored = (heatmap_colored[:, :, :3] * 255).astype(np.uint8)
-    
-    if len(img_array.shape) == 2:
-        img_array = np.stack([img_array] * 3, axis=-1)
-    elif img_array.shape[2] == 4:
-        img_array = img_array[:, :, :3]
-    
-    # Only apply overlay where there is tissue
-    overlay = img_array.copy().astype(np.float32)
-    tissue_mask_3d = np.stack([tissue_mask] * 3, axis=-1)
-    overlay = np.where(tissue_mask_3d, 
-                       (1 - alpha) * img_array + alpha * heatmap_colored,
-                       img_array)
-    overlay = np.clip(overlay, 0, 255).astype(np.uint8)
-    
-    return Image.fromarray(overlay)
+    # Only apply overlay where there is tissue (uint8 LUT lookup + PIL blend, no float RGBA copy)
+    return blend_heatmap(original_image, heatmap_resized, alpha=alpha, mask=tissue_mask, colormap=colormap)
 
 def get_last_conv_layer_index(model):
     """
@@ -893,137 +943,183 @@ def extract_detailed_findings(heatmap, boxes, original_image_size, confidence):
     return findings
 
 
-def create_gradcam_visualization(original_image, preprocessed_img, model, confidence):
+def compute_gradcam_findings(original_image, preprocessed_img, model, confidence, heatmap=None, context=None):
     """
-    Generate complete Grad-CAM visualization including heatmap, overlay, and bounding boxes.
+    Heatmap, region boxes and findings, without rendering any image.
+    The images are drawn later from these by render_gradcam_image.
     
     Args:
         original_image: PIL Image (original upload)
         preprocessed_img: Preprocessed numpy array for model input
         model: Trained Keras model
         confidence: Model prediction confidence
+        heatmap: Optional heatmap already computed by GradCAMExplainer (skips the gradient pass)
+        context: Optional ImageContext of original_image (shares its arrays and tissue mask)
     
     Returns:
-        Tuple of (heatmap_array, overlay_image, heatmap_only_image, bbox_image, cancer_type_image, error_message, detailed_findings)
-        - heatmap_array: Normalized activation heatmap
-        - overlay_image: Heatmap overlaid on original image
-        - heatmap_only_image: Standalone heatmap visualization
-        - bbox_image: Original image with simple bounding boxes
-        - cancer_type_image: Image with cancer type labels attached to boxes
-        - error_message: Error string if generation failed, None otherwise
-        - detailed_findings: Dictionary with extracted findings from the image
+        Tuple of (heatmap_array, boxes, error_message, detailed_findings)
+        - boxes: Filtered (x1, y1, x2, y2, confidence) region boxes in original image coordinates
     """
     last_conv_layer_idx = get_last_conv_layer_index(model)
     
     if last_conv_layer_idx is None:
         error_msg = "No convolutional layer found in model"
         print(error_msg)
-        return None, None, None, None, None, error_msg, None
+        return None, None, error_msg, None
     
     print(f"DEBUG: Found conv layer at index {last_conv_layer_idx}")
     print(f"DEBUG: Model has {len(model.layers)} layers")
     
     try:
-        heatmap = make_gradcam_heatmap(preprocessed_img, model, last_conv_layer_idx)
+        if heatmap is None:
+            with span("gradcam"):
+                heatmap = make_gradcam_heatmap(preprocessed_img, model, last_conv_layer_idx)
         
         if heatmap is None:
             error_msg = "Heatmap generation returned None - gradient calculation may have failed"
             print(error_msg)
-            return None, None, None, None, None, error_msg, None
+            return None, None, error_msg, None
         
         print(f"DEBUG: Heatmap generated successfully, shape: {heatmap.shape}")
         
         # Create tissue mask to filter out background detections
-        img_array = np.array(original_image)
-        tissue_mask = create_tissue_mask(img_array, threshold=15)
-        
-        overlay_image = create_heatmap_overlay(original_image, heatmap, alpha=0.5)
-        print("DEBUG: Overlay created successfully")
-        
-        fig, ax = plt.subplots(figsize=(6, 6))
-        im = ax.imshow(heatmap, cmap='jet')
-        ax.axis('off')
-        ax.set_title('Activation Heatmap', fontsize=14, fontweight='bold', pad=10)
-        plt.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
-        plt.tight_layout()
-        
-        # Convert matplotlib figure to PIL Image using buffer
-        fig.canvas.draw()
-        buf = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8)
-        buf = buf.reshape(fig.canvas.get_width_height()[::-1] + (4,))
-        # Convert RGBA to RGB
-        heatmap_only_image = Image.fromarray(buf[:, :, :3])
-        plt.close(fig)
-        
-        # Generate bounding boxes for detected regions
-        # Use tissue mask to ensure boxes only on breast tissue
-        boxes = detect_bounding_boxes(heatmap, original_image.size, threshold=0.5, min_area=50, tissue_mask=tissue_mask)
-        
-        # Additional filter: remove boxes that are mostly on black background
-        filtered_boxes = []
-        img_h, img_w = img_array.shape[:2]
-        for (x1, y1, x2, y2, conf) in boxes:
-            # Ensure coordinates are within bounds
-            x1s, y1s = max(0, int(x1)), max(0, int(y1))
-            x2s, y2s = min(img_w-1, int(x2)), min(img_h-1, int(y2))
-            
-            if x2s <= x1s or y2s <= y1s:
-                continue
+        ctx = ImageContext.of(original_image, context)
+        with span("boxes"):
+            tissue_mask = ctx.tissue_mask(threshold=15)
             
-            # Check if box center is on tissue
-            cx, cy = (x1s + x2s) // 2, (y1s + y2s) // 2
-            if not tissue_mask[cy, cx]:
-                continue
+            # Generate bounding boxes for detected regions
+            # Use tissue mask to ensure boxes only on breast tissue
+            boxes = detect_bounding_boxes(heatmap, original_image.size, threshold=0.5, min_area=50, tissue_mask=tissue_mask)
             
-            # Check tissue percentage in box (must be >40%)
-            box_tissue = tissue_mask[y1s:y2s, x1s:x2s]
-            if box_tissue.size > 0 and np.mean(box_tissue) < 0.4:
-                continue
+            # Additional filter: remove boxes that are mostly on black background
+            filtered_boxes = []
+            img_h, img_w = tissue_mask.shape[:2]
+            for (x1, y1, x2, y2, conf) in boxes:
+                # Ensure coordinates are within bounds
+                x1s, y1s = max(0, int(x1)), max(0, int(y1))
+                x2s, y2s = min(img_w-1, int(x2)), min(img_h-1, int(y2))
+                
+                if x2s <= x1s or y2s <= y1s:
+                    continue
+                
+                # Check if box center is on tissue
+                cx, cy = (x1s + x2s) // 2, (y1s + y2s) // 2
+                if not tissue_mask[cy, cx]:
+                    continue
+                
+                # Check tissue percentage in box (must be >40%)
+                box_tissue = tissue_mask[y1s:y2s, x1s:x2s]
+                if box_tissue.size > 0 and np.mean(box_tissue) < 0.4:
+                    continue
+                
+                filtered_boxes.append((x1, y1, x2, y2, conf))
             
-            filtered_boxes.append((x1, y1, x2, y2, conf))
-        
-        # Sort by confidence and limit to 50 regions max
-        filtered_boxes = sorted(filtered_boxes, key=lambda b: b[4], reverse=True)[:50]
+            # Sort by confidence and limit to 50 regions max
+            filtered_boxes = sorted(filtered_boxes, key=lambda b: b[4], reverse=True)[:50]
         
         # Extract detailed findings FIRST (includes cancer type classification)
-        detailed_findings = extract_detailed_findings(heatmap, filtered_boxes, original_image.size, confidence)
+        with span("findings"):
+            detailed_findings = extract_detailed_findings(heatmap, filtered_boxes, original_image.size, confidence)
         print(f"DEBUG: Extracted findings: {detailed_findings['summary']}")
         
         # NEW: Perform comprehensive image analysis
-        comprehensive_analysis = perform_comprehensive_image_analysis(original_image, heatmap, tissue_mask)
+        with span("comprehensive_analysis"):
+            comprehensive_analysis = perform_comprehensive_image_analysis(original_image, heatmap, tissue_mask, context=ctx)
         detailed_findings["comprehensive_analysis"] = comprehensive_analysis
         print(f"DEBUG: Comprehensive analysis complete - Density: {comprehensive_analysis['breast_density']['category'] if comprehensive_analysis['breast_density'] else 'N/A'}")
         
-        # Now draw bounding boxes WITH cancer type labels attached
-        bbox_image = None
-        cancer_type_image = None
-        
-        if detailed_findings and detailed_findings['regions']:
-            # Region Detection tab: Simple red bounding boxes with "Region X: XX%" labels
-            bbox_image = draw_bounding_boxes(
-                original_image,
-                filtered_boxes,
-                box_color='red',
-                text_color='white',
-                line_width=3
-            )
-            
-            # Cancer type tab: Bounding boxes with cancer type labels
-            cancer_type_image = draw_bounding_boxes_with_cancer_type(
-                original_image,
-                detailed_findings['regions'],
-                line_width=4
-            )
-            
-            print(f"DEBUG: bbox_image uses simple Region labels, cancer_type_image uses cancer type labels - {len(detailed_findings['regions'])} regions")
-        else:
-            # Fallback: show original image if no regions detected
-            bbox_image = original_image.copy()
-            cancer_type_image = original_image.copy()
-            print("DEBUG: No distinct high-activation regions detected, showing original")
+        return heatmap, filtered_boxes, None, detailed_findings
         
+    except Exception as e:
+        error_msg = f"Error generating Grad-CAM: {str(e)}"
+        print(error_msg)
+        import traceback
+        traceback.print_exc()
+        return None, None, error_msg, None
+
+
+def render_heatmap_only(heatmap):
+    """Standalone heatmap with a colorbar"""
+    return render_heatmap_panel(heatmap, colormap='jet')
+
+
+# Image kinds render_gradcam_image can draw
+GRADCAM_IMAGE_KINDS = ("overlay_image", "heatmap_only", "bbox_image", "cancer_type_image")
+
+
+def render_gradcam_image(kind, original_image, heatmap, boxes, regions):
+    """
+    Draw one visualization from the output of compute_gradcam_findings
+    
+    Args:
+        kind: One of GRADCAM_IMAGE_KINDS
+        original_image: PIL Image (original upload)
+        heatmap: Normalized activation heatmap
+        boxes: Filtered region boxes
+        regions: detailed_findings['regions']
+    
+    Returns:
+        PIL Image
+    """
+    if kind == "overlay_image":
+        return create_heatmap_overlay(original_image, heatmap, alpha=0.5)
+    if kind == "heatmap_only":
+        return render_heatmap_only(heatmap)
+    if kind not in ("bbox_image", "cancer_type_image"):
+        raise ValueError(f"Unknown Grad-CAM image kind: {kind}")
+    
+    if not regions:
+        # Fallback: show original image if no regions detected
+        return original_image.copy()
+    if kind == "bbox_image":
+        # Region Detection tab: Simple red bounding boxes with "Region X: XX%" labels
+        return draw_bounding_boxes(
+            original_image,
+            boxes,
+            box_color='red',
+            text_color='white',
+            line_width=3
+        )
+    # Cancer type tab: Bounding boxes with cancer type labels
+    return draw_bounding_boxes_with_cancer_type(
+        original_image,
+        regions,
+        line_width=4
+    )
+
+
+def create_gradcam_visualization(original_image, preprocessed_img, model, confidence, heatmap=None):
+    """
+    Generate complete Grad-CAM visualization including heatmap, overlay, and bounding boxes.
+    
+    Args:
+        original_image: PIL Image (original upload)
+        preprocessed_img: Preprocessed numpy array for model input
+        model: Trained Keras model
+        confidence: Model prediction confidence
+        heatmap: Optional heatmap already computed by GradCAMExplainer (skips the gradient pass)
+    
+    Returns:
+        Tuple of (heatmap_array, overlay_image, heatmap_only_image, bbox_image, cancer_type_image, error_message, detailed_findings)
+        - heatmap_array: Normalized activation heatmap
+        - overlay_image: Heatmap overlaid on original image
+        - heatmap_only_image: Standalone heatmap visualization
+        - bbox_image: Original image with simple bounding boxes
+        - cancer_type_image: Image with cancer type labels attached to boxes
+        - error_message: Error string if generation failed, None otherwise
+        - detailed_findings: Dictionary with extracted findings from the image
+    """
+    heatmap, boxes, error_msg, detailed_findings = compute_gradcam_findings(
+        original_image, preprocessed_img, model, confidence, heatmap=heatmap
+    )
+    if error_msg:
+        return None, None, None, None, None, error_msg, None
+    
+    try:
+        regions = detailed_findings['regions']
+        rendered = [render_gradcam_image(kind, original_image, heatmap, boxes, regions) for kind in GRADCAM_IMAGE_KINDS]
         print("DEBUG: Heatmap visualization complete!")
-        return heatmap, overlay_image, heatmap_only_image, bbox_image, cancer_type_image, None, detailed_findings
+        return (heatmap, *rendered, None, detailed_findings)
         
     except Exception as e:
         error_msg = f"Error generating Grad-CAM: {str(e)}"
@@ -1037,7 +1133,8 @@ def create_gradcam_visualization(original_image, preprocessed_img, model, confid
 # NEW SECTION: COMPREHENSIVE MAMMOGRAM IMAGE ANALYSIS
 # ============================================================
 
-def analyze_breast_density(img_array, tissue_mask):
+@analysis_resolution(1024)
+def analyze_breast_density(img_array, tissue_mask, histogram=None):
     """
     Analyze breast density according to ACR BI-RADS categories.
     
@@ -1046,24 +1143,28 @@ def analyze_breast_density(img_array, tissue_mask):
     B - Scattered fibroglandular densities (25-50% glandular)
     C - Heterogeneously dense (51-75% glandular)
     D - Extremely dense (>75% glandular)
+    
+    histogram: IntensityHistogram of img_array[tissue_mask], if the caller already has it
+    (ImageContext.tissue_histogram); otherwise counted here
     """
     if tissue_mask is None or img_array is None:
         return None
     
     # Get tissue region only
-    tissue_pixels = img_array[tissue_mask]
+    if histogram is None:
+        histogram = IntensityHistogram.of_array(img_array, tissue_mask)
     
-    if len(tissue_pixels) == 0:
+    if histogram.count == 0:
         return None
     
     # Calculate density metrics
-    mean_intensity = np.mean(tissue_pixels)
-    std_intensity = np.std(tissue_pixels)
+    mean_intensity = histogram.mean
+    std_intensity = histogram.std
     
     # High intensity pixels indicate dense tissue
     high_density_threshold = mean_intensity + 0.5 * std_intensity
-    dense_pixels = np.sum(tissue_pixels > high_density_threshold)
-    total_tissue_pixels = len(tissue_pixels)
+    dense_pixels = histogram.count_above(high_density_threshold)
+    total_tissue_pixels = histogram.count
     
     density_percentage = (dense_pixels / total_tissue_pixels) * 100 if total_tissue_pixels > 0 else 0
     
@@ -1104,23 +1205,27 @@ def analyze_breast_density(img_array, tissue_mask):
     }
 
 
-def analyze_tissue_texture(img_array, tissue_mask):
+@analysis_resolution(1024)
+def analyze_tissue_texture(img_array, tissue_mask, histogram=None):
     """
     Analyze tissue texture patterns using statistical measures.
+    
+    histogram: IntensityHistogram of img_array[tissue_mask], as in analyze_breast_density
     """
     if tissue_mask is None or img_array is None:
         return None
     
-    tissue_pixels = img_array[tissue_mask]
+    if histogram is None:
+        histogram = IntensityHistogram.of_array(img_array, tissue_mask)
     
-    if len(tissue_pixels) == 0:
+    if histogram.count == 0:
         return None
     
     # Calculate texture metrics
-    mean_val = np.mean(tissue_pixels)
-    std_val = np.std(tissue_pixels)
-    skewness = float(np.mean(((tissue_pixels - mean_val) / (std_val + 1e-6)) ** 3))
-    kurtosis = float(np.mean(((tissue_pixels - mean_val) / (std_val + 1e-6)) ** 4) - 3)
+    mean_val = histogram.mean
+    std_val = histogram.std
+    skewness = histogram.standardized_moment(3, eps=1e-6)
+    kurtosis = histogram.standardized_moment(4, eps=1e-6) - 3
     
     # Coefficient of variation
     cv = (std_val / mean_val) * 100 if mean_val > 0 else 0
@@ -1163,6 +1268,7 @@ def analyze_tissue_texture(img_array, tissue_mask):
     }
 
 
+@analysis_resolution(1024)
 def analyze_breast_symmetry(img_array):
     """
     Analyze breast symmetry by comparing left and right halves.
@@ -1227,6 +1333,7 @@ def analyze_breast_symmetry(img_array):
     }
 
 
+@analysis_resolution(1024)
 def analyze_skin_and_nipple(img_array, tissue_mask):
     """
     Analyze skin thickness and nipple characteristics.
@@ -1295,6 +1402,7 @@ def analyze_skin_and_nipple(img_array, tissue_mask):
     }
 
 
+@analysis_resolution(1024)
 def analyze_vascular_patterns(img_array, tissue_mask):
     """
     Analyze vascular patterns in the breast tissue.
@@ -1350,6 +1458,7 @@ def analyze_vascular_patterns(img_array, tissue_mask):
     }
 
 
+@analysis_resolution(512)
 def analyze_pectoral_muscle(img_array):
     """
     Analyze pectoral muscle visibility and positioning.
@@ -1406,9 +1515,12 @@ def analyze_pectoral_muscle(img_array):
     }
 
 
+@analysis_resolution(None)
 def analyze_calcification_patterns(heatmap, img_array, tissue_mask):
     """
     Detailed analysis of calcification patterns if detected.
+    Runs at full resolution: microcalcifications are only a few pixels wide and
+    averaging them into a pyramid level removes the local maxima this looks for.
     """
     if img_array is None:
         return None
@@ -1495,23 +1607,40 @@ def analyze_calcification_patterns(heatmap, img_array, tissue_mask):
     }
 
 
-def perform_comprehensive_image_analysis(original_image, heatmap, tissue_mask):
+def perform_comprehensive_image_analysis(original_image, heatmap, tissue_mask, context=None):
     """
     Perform comprehensive analysis of the mammogram image.
     Returns detailed findings for all analysis categories.
+    
+    Each analyzer runs on the pyramid level it declares (analysis_resolution).
+    tissue_mask belongs to the full-resolution image; downscaled levels use their
+    own mask with the same threshold as compute_gradcam_findings.
     """
-    # Convert image to numpy array
-    img_array = np.array(original_image.convert('L'))  # Grayscale
+    ctx = ImageContext.of(original_image, context)
+    
+    def inputs(analyzer):
+        # Grayscale array and tissue mask at the analyzer's resolution, shared through the request's ImageContext
+        level = ctx.level(analyzer.max_dim)
+        if level is ctx or tissue_mask is None:
+            return level.gray, tissue_mask
+        return level.gray, level.tissue_mask(threshold=15)
+    
+    def histogram_inputs(analyzer):
+        # Plus the level's memoized tissue histogram, when the mask is the level's own
+        gray, mask = inputs(analyzer)
+        level = ctx.level(analyzer.max_dim)
+        shared = mask is not None and mask is level.tissue_mask(threshold=15)
+        return gray, mask, level.tissue_histogram(threshold=15) if shared else None
     
     # Perform all analyses
     analysis = {
-        "breast_density": analyze_breast_density(img_array, tissue_mask),
-        "tissue_texture": analyze_tissue_texture(img_array, tissue_mask),
-        "symmetry": analyze_breast_symmetry(img_array),
-        "skin_nipple": analyze_skin_and_nipple(img_array, tissue_mask),
-        "vascular_patterns": analyze_vascular_patterns(img_array, tissue_mask),
-        "pectoral_muscle": analyze_pectoral_muscle(img_array),
-        "calcification_analysis": analyze_calcification_patterns(heatmap, img_array, tissue_mask),
+        "breast_density": analyze_breast_density(*histogram_inputs(analyze_breast_density)),
+        "tissue_texture": analyze_tissue_texture(*histogram_inputs(analyze_tissue_texture)),
+        "symmetry": analyze_breast_symmetry(inputs(analyze_breast_symmetry)[0]),
+        "skin_nipple": analyze_skin_and_nipple(*inputs(analyze_skin_and_nipple)),
+        "vascular_patterns": analyze_vascular_patterns(*inputs(analyze_vascular_patterns)),
+        "pectoral_muscle": analyze_pectoral_muscle(inputs(analyze_pectoral_muscle)[0]),
+        "calcification_analysis": analyze_calcification_patterns(heatmap, *inputs(analyze_calcification_patterns)),
     }
     
     # Generate overall image quality score
@@ -1536,7 +1665,8 @@ def perform_comprehensive_image_analysis(original_image, heatmap, tissue_mask):
 # CC AND MLO VIEW MAMMOGRAM ANALYSIS
 # ============================================
 
-def analyze_cc_view(image, heatmap, model_confidence, detected_regions):
+@analysis_resolution(1024)
+def analyze_cc_view(image, heatmap, model_confidence, detected_regions, context=None):
     """
     Analyze Cranio-Caudal (CC) view mammogram.
     CC view shows the breast from top to bottom.
@@ -1546,21 +1676,26 @@ def analyze_cc_view(image, heatmap, model_confidence, detected_regions):
         heatmap: Grad-CAM heatmap array
         model_confidence: Model's malignancy confidence (0-1)
         detected_regions: List of detected region dictionaries
+        context: Optional ImageContext of image (the analysis runs on its 1024px pyramid level)
     
     Returns:
         Dictionary with structured CC view analysis
     """
-    img_array = np.array(image.convert('L'))
+    ctx = ImageContext.of(image, context).level(analyze_cc_view.max_dim)
+    img_array = ctx.gray
     height, width = img_array.shape
     
     # Create tissue mask
-    tissue_mask = create_tissue_mask(img_array)
+    tissue_mask = ctx.gray_tissue_mask()
     
     # ========== IMAGE QUALITY ==========
     # Assess positioning and technical quality
-    tissue_coverage = np.sum(tissue_mask) / tissue_mask.size * 100
-    mean_intensity = np.mean(img_array[tissue_mask]) if np.any(tissue_mask) else np.mean(img_array)
-    contrast = np.std(img_array[tissue_mask]) if np.any(tissue_mask) else np.std(img_array)
+    # gray_tissue_mask is gray > 15, so the tissue histogram is the gray histogram above 15
+    tissue_histogram = ctx.gray_histogram.above(15)
+    tissue_coverage = tissue_histogram.count / tissue_mask.size * 100
+    intensity_histogram = tissue_histogram if tissue_histogram.count else ctx.gray_histogram
+    mean_intensity = intensity_histogram.mean
+    contrast = intensity_histogram.std
     
     if tissue_coverage > 30 and contrast > 30:
         image_quality = "Good - Adequate tissue coverage and contrast"
@@ -1573,7 +1708,7 @@ def analyze_cc_view(image, heatmap, model_confidence, detected_regions):
         quality_score = 50
     
     # ========== BREAST DENSITY (ACR) ==========
-    density_analysis = analyze_breast_density(img_array, tissue_mask)
+    density_analysis = analyze_breast_density(img_array, tissue_mask, histogram=tissue_histogram)
     acr_category = density_analysis.get("acr_category", "B")
     density_description = density_analysis.get("description", "Scattered fibroglandular densities")
     
@@ -1696,7 +1831,8 @@ def analyze_cc_view(image, heatmap, model_confidence, detected_regions):
     }
 
 
-def analyze_mlo_view(image, heatmap, model_confidence, detected_regions):
+@analysis_resolution(1024)
+def analyze_mlo_view(image, heatmap, model_confidence, detected_regions, context=None):
     """
     Analyze Medio-Lateral Oblique (MLO) view mammogram.
     MLO view shows the breast from an angled side view, including pectoral muscle and axilla.
@@ -1706,20 +1842,25 @@ def analyze_mlo_view(image, heatmap, model_confidence, detected_regions):
         heatmap: Grad-CAM heatmap array
         model_confidence: Model's malignancy confidence (0-1)
         detected_regions: List of detected region dictionaries
+        context: Optional ImageContext of image (the analysis runs on its 1024px pyramid level)
     
     Returns:
         Dictionary with structured MLO view analysis
     """
-    img_array = np.array(image.convert('L'))
+    ctx = ImageContext.of(image, context).level(analyze_mlo_view.max_dim)
+    img_array = ctx.gray
     height, width = img_array.shape
     
     # Create tissue mask
-    tissue_mask = create_tissue_mask(img_array)
+    tissue_mask = ctx.gray_tissue_mask()
     
     # ========== IMAGE QUALITY ==========
-    tissue_coverage = np.sum(tissue_mask) / tissue_mask.size * 100
-    mean_intensity = np.mean(img_array[tissue_mask]) if np.any(tissue_mask) else np.mean(img_array)
-    contrast = np.std(img_array[tissue_mask]) if np.any(tissue_mask) else np.std(img_array)
+    # gray_tissue_mask is gray > 15, so the tissue histogram is the gray histogram above 15
+    tissue_histogram = ctx.gray_histogram.above(15)
+    tissue_coverage = tissue_histogram.count / tissue_mask.size * 100
+    intensity_histogram = tissue_histogram if tissue_histogram.count else ctx.gray_histogram
+    mean_intensity = intensity_histogram.mean
+    contrast = intensity_histogram.std
     
     if tissue_coverage > 35 and contrast > 30:
         image_quality = "Good - Adequate positioning with pectoral muscle visible"
@@ -1732,7 +1873,7 @@ def analyze_mlo_view(image, heatmap, model_confidence, detected_regions):
         quality_score = 50
     
     # ========== BREAST DENSITY (ACR) ==========
-    density_analysis = analyze_breast_density(img_array, tissue_mask)
+    density_analysis = analyze_breast_density(img_array, tissue_mask, histogram=tissue_histogram)
     acr_category = density_analysis.get("acr_category", "B")
     density_description = density_analysis.get("description", "Scattered fibroglandular densities")
     
@@ -1972,114 +2113,17 @@ def detect_text_label_in_image(img_array, original_image=None):
         laterality: "R" or "L" or None
         view_type: "MLO" or "CC" or None
     """
-    height, width = img_array.shape
-    
-    # Define regions to check for text labels (corners and edges)
-    regions_to_check = [
-        ("top_left", img_array[:height//5, :width//4]),
-        ("top_right", img_array[:height//5, -width//4:]),
-        ("bottom_left", img_array[-height//6:, :width//4]),
-        ("bottom_right", img_array[-height//6:, -width//4:]),
-        ("top_center", img_array[:height//6, width//4:-width//4]),
-    ]
-    
-    # Try OCR-based detection first (most accurate)
+    # Try OCR-based detection first (most accurate): one batched, time-bounded
+    # Tesseract call per image, memoized by the corner crops (label_ocr.py)
     if OCR_AVAILABLE:
-        for region_name, region in regions_to_check:
-            if region.size == 0 or region.shape[0] < 10 or region.shape[1] < 10:
-                continue
-            
-            try:
-                # Preprocess for better OCR
-                region_normalized = cv2.normalize(region, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-                
-                # Try multiple threshold values to catch different text colors
-                for thresh_val in [50, 80, 100, 120, 150]:
-                    _, binary = cv2.threshold(region_normalized, thresh_val, 255, cv2.THRESH_BINARY)
-                    binary_inv = cv2.bitwise_not(binary)
-                    
-                    for img_version in [binary, binary_inv]:
-                        try:
-                            text = pytesseract.image_to_string(img_version, config='--psm 7 -c tessedit_char_whitelist=RMLOC-0123456789').strip().upper()
-                            
-                            if not text:
-                                text = pytesseract.image_to_string(img_version, config='--psm 8 -c tessedit_char_whitelist=RMLOC-0123456789').strip().upper()
-                            
-                            if text:
-                                print(f"DEBUG OCR {region_name} (thresh={thresh_val}): '{text}'")
-                                laterality, view_type = parse_mammogram_label(text)
-                                if view_type:
-                                    print(f"DEBUG: OCR detected label '{text}' -> laterality={laterality}, view={view_type}")
-                                    return laterality, view_type
-                        except:
-                            continue
-                            
-            except Exception as e:
-                print(f"DEBUG OCR error in {region_name}: {e}")
-                continue
+        laterality, view_type = label_ocr.read_label(img_array)
+        if view_type:
+            return laterality, view_type
     
     # Fallback: Enhanced pattern-based detection
     return detect_text_label_pattern_based(img_array)
 
 
-def parse_mammogram_label(text):
-    """
-    Parse mammogram label text to extract laterality and view type.
-    
-    Handles formats like: R-MLO, RMLO, R MLO, L-CC, LCC, L CC, RCC, etc.
-    
-    Args:
-        text: Detected text string
-    
-    Returns:
-        Tuple of (laterality, view_type) or (None, None)
-    """
-    if not text:
-        return None, None
-    
-    # Clean up the text
-    text = text.upper().strip()
-    text = re.sub(r'[^A-Z0-9\-\s]', '', text)  # Keep only letters, numbers, dash, space
-    
-    laterality = None
-    view_type = None
-    
-    # Check for MLO patterns
-    mlo_patterns = ['MLO', 'M-LO', 'M L O', 'MLC', 'ML0', 'WLO', 'NLO']  # Common OCR misreads
-    for pattern in mlo_patterns:
-        if pattern in text:
-            view_type = "MLO"
-            break
-    
-    # Check for CC patterns
-    cc_patterns = ['CC', 'C-C', 'C C']
-    if not view_type:
-        for pattern in cc_patterns:
-            if pattern in text:
-                view_type = "CC"
-                break
-    
-    # Check for laterality
-    if text.startswith('R') or 'R-' in text or ' R ' in text or text.startswith('R '):
-        laterality = "R"
-    elif text.startswith('L') or 'L-' in text or ' L ' in text or text.startswith('L '):
-        laterality = "L"
-    
-    # Also check for full patterns
-    full_patterns = {
-        'RMLO': ('R', 'MLO'), 'R-MLO': ('R', 'MLO'), 'R MLO': ('R', 'MLO'),
-        'LMLO': ('L', 'MLO'), 'L-MLO': ('L', 'MLO'), 'L MLO': ('L', 'MLO'),
-        'RCC': ('R', 'CC'), 'R-CC': ('R', 'CC'), 'R CC': ('R', 'CC'),
-        'LCC': ('L', 'CC'), 'L-CC': ('L', 'CC'), 'L CC': ('L', 'CC'),
-    }
-    
-    for pattern, (lat, view) in full_patterns.items():
-        if pattern in text:
-            return lat, view
-    
-    return laterality, view_type
-
-
 def detect_text_label_pattern_based(img_array):
     """
     Fallback pattern-based text detection when OCR is not available.
@@ -2175,6 +2219,7 @@ def detect_text_label_pattern_based(img_array):
     return None, None
 
 
+@analysis_resolution(512)
 def detect_breast_laterality(img_array):
     """
     Detect whether the mammogram is of the Right or Left breast.
@@ -2227,7 +2272,8 @@ def detect_breast_laterality(img_array):
             return "L"
 
 
-def detect_mammogram_view_type(img_array):
+@analysis_resolution(1024)
+def detect_mammogram_view_type(img_array, check_text_label=True):
     """
     Detect whether the mammogram is CC (Cranio-Caudal) or MLO (Medio-Lateral Oblique).
     
@@ -2245,6 +2291,8 @@ def detect_mammogram_view_type(img_array):
     
     Args:
         img_array: Grayscale image as numpy array
+        check_text_label: Look for a view label first. Callers that already searched the
+            full-resolution image pass False (and may then pass a downscaled array).
     
     Returns:
         "MLO" or "CC"
@@ -2252,10 +2300,11 @@ def detect_mammogram_view_type(img_array):
     height, width = img_array.shape
     
     # First, try to detect from text label
-    _, text_view = detect_text_label_in_image(img_array)
-    if text_view:
-        print(f"DEBUG: View detected from text label: {text_view}")
-        return text_view
+    if check_text_label:
+        _, text_view = detect_text_label_in_image(img_array)
+        if text_view:
+            print(f"DEBUG: View detected from text label: {text_view}")
+            return text_view
     
     mlo_score = 0
     cc_score = 0
@@ -2474,7 +2523,7 @@ def detect_mammogram_view_type(img_array):
             return "CC"
 
 
-def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_regions, view_type="auto", filename=None):
+def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_regions, view_type="auto", filename=None, context=None):
     """
     Generate structured mammogram analysis based on view type.
     Detects: RCC (Right CC), LCC (Left CC), RMLO (Right MLO), LMLO (Left MLO)
@@ -2486,17 +2535,26 @@ def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_
         detected_regions: List of detected regions
         view_type: "rcc", "lcc", "rmlo", "lmlo", "cc", "mlo", or "auto" (auto-detect)
         filename: Optional filename for additional context in view detection
+        context: Optional ImageContext of image (shares its grayscale and RGB arrays)
     
     Returns:
         Dictionary with view-specific analysis including full view code
     """
-    img_array = np.array(image.convert('L'))
+    ctx = ImageContext.of(image, context)
+    img_array = ctx.gray
     height, width = img_array.shape
     
     print(f"DEBUG generate_mammogram_view_analysis: Image size = {width}x{height}, aspect ratio = {height/width:.3f}")
     
     # Also get RGB array for colored text detection
-    rgb_array = np.array(image.convert('RGB')) if image.mode != 'L' else None
+    rgb_array = ctx.rgb if image.mode != 'L' else None
+    
+    # Text labels are read at full resolution; the tissue heuristics run on their pyramid levels
+    def detect_view_from_tissue():
+        return detect_mammogram_view_type(ctx.level(detect_mammogram_view_type.max_dim).gray, check_text_label=False)
+    
+    def detect_laterality_from_tissue():
+        return detect_breast_laterality(ctx.level(detect_breast_laterality.max_dim).gray)
     
     # Auto-detect view type and laterality if not specified
     if view_type == "auto":
@@ -2516,7 +2574,7 @@ def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_
             print(f"DEBUG: View from text label: {detected_view}")
         else:
             # Fall back to image analysis
-            detected_view = detect_mammogram_view_type(img_array)
+            detected_view = detect_view_from_tissue()
             print(f"DEBUG: View from image analysis: {detected_view}")
         
         if text_laterality:
@@ -2525,7 +2583,7 @@ def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_
             print(f"DEBUG: Laterality from text label: {detected_laterality}")
         else:
             # Fall back to tissue analysis
-            detected_laterality = detect_breast_laterality(img_array)
+            detected_laterality = detect_laterality_from_tissue()
             print(f"DEBUG: Laterality from tissue analysis: {detected_laterality}")
         
         # Combine to get full view code
@@ -2539,7 +2597,7 @@ def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_
             view_type = "mlo" if "MLO" in view_type_upper else "cc"
         elif view_type_upper in ["CC", "MLO"]:
             # Only view type provided, detect laterality
-            detected_laterality = detect_breast_laterality(img_array)
+            detected_laterality = detect_laterality_from_tissue()
             view_code = f"{detected_laterality}{view_type_upper}"
             view_type = view_type_upper.lower()
         else:
@@ -2555,21 +2613,21 @@ def generate_mammogram_view_analysis(image, heatmap, model_confidence, detected_
             if text_view:
                 detected_view = text_view
             else:
-                detected_view = detect_mammogram_view_type(img_array)
+                detected_view = detect_view_from_tissue()
             
             if text_laterality:
                 detected_laterality = text_laterality
             else:
-                detected_laterality = detect_breast_laterality(img_array)
+                detected_laterality = detect_laterality_from_tissue()
             
             view_code = f"{detected_laterality}{detected_view}"
             view_type = detected_view.lower()
     
     # Get view-specific analysis
     if view_type == "mlo":
-        analysis = analyze_mlo_view(image, heatmap, model_confidence, detected_regions)
+        analysis = analyze_mlo_view(image, heatmap, model_confidence, detected_regions, context=ctx)
     else:
-        analysis = analyze_cc_view(image, heatmap, model_confidence, detected_regions)
+        analysis = analyze_cc_view(image, heatmap, model_confidence, detected_regions, context=ctx)
     
     # Add the full view code and laterality info
     laterality = view_code[0]  # "R" or "L"
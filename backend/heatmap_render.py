@@ -0,0 +1,167 @@
+"""
+Heatmap rendering without matplotlib
+Colormaps are precomputed 256-entry uint8 lookup tables, so colorizing a heatmap is a
+single table lookup. The standalone heatmap panel (title, heatmap, colorbar) is drawn
+with PIL, and its colorbar strip is rendered once and reused.
+"""
+
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Piecewise-linear colormaps as (x, value) control points per channel,
+# the same segment data matplotlib uses for these maps
+COLORMAP_SEGMENTS = {
+    "jet": (
+        ((0.0, 0.0), (0.35, 0.0), (0.66, 1.0), (0.89, 1.0), (1.0, 0.5)),
+        ((0.0, 0.0), (0.125, 0.0), (0.375, 1.0), (0.64, 1.0), (0.91, 0.0), (1.0, 0.0)),
+        ((0.0, 0.5), (0.11, 1.0), (0.34, 1.0), (0.65, 0.0), (1.0, 0.0)),
+    ),
+}
+
+LUT_SIZE = 256
+
+# Standalone heatmap panel layout (matches the previous 6x6 inch, 100 dpi figure)
+PANEL_SIZE = 600
+PANEL_TITLE = "Activation Heatmap"
+PANEL_MARGIN = 24
+PANEL_TOP = 52
+COLORBAR_WIDTH = 24
+COLORBAR_GAP = 16
+COLORBAR_TICKS = 6
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(name: str = "jet") -> np.ndarray:
+    """(256, 3) uint8 RGB lookup table for a colormap"""
+    segments = COLORMAP_SEGMENTS.get(name)
+    if segments is None:
+        raise ValueError(f"Unknown colormap '{name}'. Available: {', '.join(COLORMAP_SEGMENTS)}")
+    x = np.linspace(0.0, 1.0, LUT_SIZE)
+    channels = [np.interp(x, [p[0] for p in points], [p[1] for p in points]) for points in segments]
+    lut = (np.stack(channels, axis=-1) * 255).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+@lru_cache(maxsize=None)
+def _uint8_lut(name: str) -> np.ndarray:
+    """colormap_lut indexed directly by uint8 intensity (0-255 stands for 0.0-1.0)"""
+    # Same float32 index arithmetic matplotlib applies to value / 255, so colors match exactly
+    index = (np.arange(256, dtype=np.float32) / np.float32(255.0) * LUT_SIZE).astype(np.int32)
+    lut = colormap_lut(name)[np.minimum(index, LUT_SIZE - 1)]
+    lut.setflags(write=False)
+    return lut
+
+
+def heatmap_to_uint8(heatmap: np.ndarray, vmin: Optional[float] = None, vmax: Optional[float] = None) -> np.ndarray:
+    """Scale a float heatmap to uint8 intensities, by default over its own min/max"""
+    heatmap = np.asarray(heatmap, dtype=np.float32)
+    vmin = float(np.min(heatmap)) if vmin is None else vmin
+    vmax = float(np.max(heatmap)) if vmax is None else vmax
+    if vmax <= vmin:
+        return np.zeros(heatmap.shape, dtype=np.uint8)
+    scaled = (heatmap - vmin) * (255.0 / (vmax - vmin))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+
+def colorize(intensity: np.ndarray, colormap: str = "jet") -> np.ndarray:
+    """uint8 (H, W) intensities -> uint8 (H, W, 3) RGB through the colormap LUT"""
+    return _uint8_lut(colormap)[intensity]
+
+
+def blend_heatmap(
+    image: Image.Image,
+    intensity: np.ndarray,
+    alpha: float = 0.5,
+    mask: Optional[np.ndarray] = None,
+    colormap: str = "jet",
+) -> Image.Image:
+    """
+    Alpha-blend a colorized heatmap over an image
+
+    Args:
+        image: PIL image, converted to RGB
+        intensity: uint8 (H, W) heatmap at the image's size
+        alpha: Heatmap opacity (0-1)
+        mask: Optional boolean (H, W) mask; pixels outside it keep the original image
+        colormap: Name in COLORMAP_SEGMENTS
+
+    Returns:
+        RGB PIL image
+    """
+    base = image if image.mode == "RGB" else image.convert("RGB")
+    colored = Image.fromarray(colorize(intensity, colormap))
+    blended = Image.blend(base, colored, alpha)
+    if mask is None:
+        return blended
+    return Image.composite(blended, base, Image.fromarray(mask.astype(np.uint8) * 255))
+
+
+def _load_font(size: int, bold: bool = False):
+    names = ["arialbd.ttf", "DejaVuSans-Bold.ttf"] if bold else ["arial.ttf", "DejaVuSans.ttf"]
+    for name in names:
+        for folder in ("C:/Windows/Fonts/", "/usr/share/fonts/truetype/dejavu/", ""):
+            try:
+                return ImageFont.truetype(folder + name, size)
+            except OSError:
+                continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=8)
+def _colorbar_strip(height: int, colormap: str) -> Image.Image:
+    """Vertical gradient (max at the top) with a black border"""
+    rows = np.linspace(255, 0, height).astype(np.uint8)
+    strip = Image.fromarray(np.repeat(colorize(rows, colormap)[:, None, :], COLORBAR_WIDTH, axis=1))
+    ImageDraw.Draw(strip).rectangle([0, 0, COLORBAR_WIDTH - 1, height - 1], outline="black")
+    return strip
+
+
+@lru_cache(maxsize=16)
+def _panel_template(colormap: str, vmin: float, vmax: float) -> Tuple[Image.Image, int]:
+    """White panel with title, colorbar and tick labels; returns (panel, heatmap side)"""
+    label_font = _load_font(12)
+    label_width = max(
+        int(label_font.getlength(f"{v:.1f}")) for v in np.linspace(vmin, vmax, COLORBAR_TICKS)
+    )
+    side = min(
+        PANEL_SIZE - PANEL_TOP - PANEL_MARGIN,
+        PANEL_SIZE - 2 * PANEL_MARGIN - COLORBAR_GAP - COLORBAR_WIDTH - 8 - label_width,
+    )
+    panel = Image.new("RGB", (PANEL_SIZE, PANEL_SIZE), "white")
+    draw = ImageDraw.Draw(panel)
+
+    title_font = _load_font(19, bold=True)
+    title_width = title_font.getlength(PANEL_TITLE)
+    draw.text(((PANEL_MARGIN * 2 + side - title_width) / 2, 14), PANEL_TITLE, fill="black", font=title_font)
+
+    bar_x = PANEL_MARGIN + side + COLORBAR_GAP
+    panel.paste(_colorbar_strip(side, colormap), (bar_x, PANEL_TOP))
+    for i, value in enumerate(np.linspace(vmin, vmax, COLORBAR_TICKS)):
+        y = PANEL_TOP + side - 1 - round(i * (side - 1) / (COLORBAR_TICKS - 1))
+        draw.line([bar_x + COLORBAR_WIDTH, y, bar_x + COLORBAR_WIDTH + 4, y], fill="black")
+        draw.text((bar_x + COLORBAR_WIDTH + 8, y), f"{value:.1f}", fill="black", font=label_font, anchor="lm")
+    return panel, side
+
+
+def render_heatmap_panel(heatmap: np.ndarray, colormap: str = "jet") -> Image.Image:
+    """
+    Standalone heatmap with a colorbar, as a 600x600 RGB image
+
+    Colors span the heatmap's own min/max, like matplotlib's imshow.
+    """
+    heatmap = np.asarray(heatmap, dtype=np.float32)
+    vmin, vmax = round(float(np.min(heatmap)), 3), round(float(np.max(heatmap)), 3)
+    template, side = _panel_template(colormap, vmin, vmax)
+    # Nearest-neighbour upscaling keeps each activation cell visible, like imshow did
+    height, width = heatmap.shape[:2]
+    scale = side / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    intensity = Image.fromarray(heatmap_to_uint8(heatmap, vmin, vmax)).resize(size, Image.NEAREST)
+    panel = template.copy()
+    offset = (PANEL_MARGIN + (side - size[0]) // 2, PANEL_TOP + (side - size[1]) // 2)
+    panel.paste(Image.fromarray(colorize(np.asarray(intensity), colormap)), offset)
+    return panel
@@ -0,0 +1,205 @@
+"""
+Per-request image context
+One upload used to be converted to numpy again by every stage (validator, stats,
+Grad-CAM, view analysis, duplicate check). ImageContext is created once per request
+and computes each representation the first time a stage asks for it.
+It also holds a lazily built image pyramid, so analyzers that only need coarse
+statistics can run on a downscaled level (see level()).
+"""
+
+import hashlib
+from functools import cached_property
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from image_hashing import hash_thumbnail
+from intensity_histogram import IntensityHistogram
+
+MODEL_INPUT_SIZE = (224, 224)
+# Pyramid level the hash thumbnail is box-filtered from: 4-8x its size, so the
+# result is close to an area average of the full image at a fraction of the cost
+HASH_SOURCE_MAX_DIM = 256
+
+
+def preprocess_image(image: Image.Image) -> np.ndarray:
+    """Streamlit code se hi liya hai: resize 224x224, normalize, RGB fix."""
+    img = image.resize(MODEL_INPUT_SIZE, Image.LANCZOS)
+    img_array = np.array(img)
+
+    if img_array.ndim == 2:  # grayscale
+        img_array = np.stack([img_array] * 3, axis=-1)
+    elif img_array.shape[2] == 4:  # RGBA
+        img_array = img_array[:, :, :3]
+
+    img_array = img_array.astype("float32") / 255.0
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array
+
+
+def analysis_resolution(max_dim: Optional[int]):
+    """
+    Declare the pyramid level an analyzer needs: its longest side in pixels, or None for full
+    resolution. Callers run the analyzer on context.level(analyzer.max_dim).
+    """
+    def declare(func):
+        func.max_dim = max_dim
+        return func
+    return declare
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    # Shared between stages: a stage that modifies it in place would corrupt the others
+    array.setflags(write=False)
+    return array
+
+
+def _reducible(image: Image.Image) -> bool:
+    # Image.reduce has no palette, bilevel or 16-bit integer support: those stay at full resolution
+    return image.mode not in ("1", "P") and not image.mode.startswith("I;16")
+
+
+class ImageContext:
+    """
+    Lazily computed, memoized views of one uploaded image
+
+    Arrays are read-only; stages that need to modify one must copy it first.
+    Not thread-safe: a context belongs to one request.
+    """
+
+    def __init__(self, image: Image.Image, data: Optional[bytes] = None, scale: int = 1):
+        """
+        Args:
+            image: The decoded upload
+            data: Raw upload bytes, for file_hash
+            scale: Downscale factor relative to the upload (pyramid levels only)
+        """
+        self.image = image
+        self.data = data
+        self.scale = scale
+        self._tissue_masks: Dict[int, np.ndarray] = {}
+        self._gray_tissue_masks: Dict[int, np.ndarray] = {}
+        self._tissue_histograms: Dict[int, IntensityHistogram] = {}
+
+    @classmethod
+    def of(cls, image: Image.Image, context: Optional["ImageContext"] = None) -> "ImageContext":
+        """context if given (and built from image), otherwise a new one for image"""
+        if context is not None and (image is None or context.image is image):
+            return context
+        return cls(image)
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @cached_property
+    def _half(self) -> "ImageContext":
+        """Next pyramid level: 2x2 box average of this one"""
+        return ImageContext(self.image.reduce(2), scale=self.scale * 2)
+
+    def level(self, max_dim: Optional[int]) -> "ImageContext":
+        """
+        Pyramid level whose longest side is at most max_dim (this context if max_dim is None
+        or the image is already small enough). Levels halve the size, so the result's longest
+        side is between max_dim / 2 and max_dim. Each level is built once and keeps its own
+        memoized arrays and masks.
+        """
+        context = self
+        while max_dim and max(context.size) > max_dim and _reducible(context.image):
+            context = context._half
+        return context
+
+    @cached_property
+    def file_hash(self) -> Optional[str]:
+        """SHA-256 of the upload bytes (DuplicateDetector.get_file_hash)"""
+        return hashlib.sha256(self.data).hexdigest() if self.data is not None else None
+
+    @cached_property
+    def rgb_image(self) -> Image.Image:
+        return self.image if self.image.mode == "RGB" else self.image.convert("RGB")
+
+    @cached_property
+    def rgb(self) -> np.ndarray:
+        """(H, W, 3) uint8"""
+        return _read_only(np.asarray(self.rgb_image))
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        """(H, W) uint8 luma, as image.convert('L')"""
+        return _read_only(np.asarray(self.image.convert("L")))
+
+    @cached_property
+    def channel_sum(self) -> np.ndarray:
+        """(H, W) uint16 sum of the RGB channels: 3x the channel mean, without a float copy"""
+        rgb = self.rgb
+        # Adding the channel planes is ~10x faster than a reduction over the interleaved last axis
+        total = rgb[:, :, 0].astype(np.uint16)
+        total += rgb[:, :, 1]
+        total += rgb[:, :, 2]
+        return _read_only(total)
+
+    @cached_property
+    def is_grayscale(self) -> bool:
+        """True if all three channels are identical"""
+        rgb = self.rgb
+        return bool(np.array_equal(rgb[:, :, 0], rgb[:, :, 1]) and np.array_equal(rgb[:, :, 1], rgb[:, :, 2]))
+
+    def tissue_mask(self, threshold: int = 15) -> np.ndarray:
+        """Channel mean > threshold, as grad_cam.create_tissue_mask on the RGB array"""
+        mask = self._tissue_masks.get(threshold)
+        if mask is None:
+            # mean > t  <=>  sum > 3t, exact for the integer sums
+            mask = self._tissue_masks[threshold] = _read_only(self.channel_sum > 3 * threshold)
+        return mask
+
+    def gray_tissue_mask(self, threshold: int = 15) -> np.ndarray:
+        """Luma > threshold, as grad_cam.create_tissue_mask on the grayscale array"""
+        mask = self._gray_tissue_masks.get(threshold)
+        if mask is None:
+            if self.is_grayscale:
+                mask = self.tissue_mask(threshold)  # Luma equals the channel mean
+            else:
+                mask = _read_only(self.gray > threshold)
+            self._gray_tissue_masks[threshold] = mask
+        return mask
+
+    @cached_property
+    def rgb_histogram(self) -> IntensityHistogram:
+        """Histogram of all values of rgb (every channel of every pixel)"""
+        return IntensityHistogram.of_image(self.rgb_image)
+
+    @cached_property
+    def gray_histogram(self) -> IntensityHistogram:
+        return IntensityHistogram.of_array(self.gray)
+
+    @cached_property
+    def channel_sum_histogram(self) -> IntensityHistogram:
+        """Histogram of channel_sum (0..765)"""
+        if self.is_grayscale:
+            # Every sum is 3x the gray value: spread the gray histogram instead of counting again
+            counts = np.zeros(766, dtype=np.int64)
+            counts[::3] = self.gray_histogram.counts
+            return IntensityHistogram(counts)
+        return IntensityHistogram.of_array(self.channel_sum)
+
+    def tissue_histogram(self, threshold: int = 15) -> IntensityHistogram:
+        """Histogram of gray inside tissue_mask(threshold), as analyzers see gray[tissue_mask]"""
+        histogram = self._tissue_histograms.get(threshold)
+        if histogram is None:
+            if self.is_grayscale:
+                histogram = self.gray_histogram.above(threshold)  # Channel mean > t is gray > t
+            else:
+                histogram = IntensityHistogram.of_array(self.gray, self.tissue_mask(threshold))
+            self._tissue_histograms[threshold] = histogram
+        return histogram
+
+    @cached_property
+    def hash_thumbnail(self) -> np.ndarray:
+        """(32, 32) float32 grayscale thumbnail the perceptual hashes are computed from"""
+        return _read_only(hash_thumbnail(self.level(HASH_SOURCE_MAX_DIM).image))
+
+    @cached_property
+    def model_input(self) -> np.ndarray:
+        """(1, 224, 224, 3) float32 in [0, 1], as preprocess_image"""
+        return _read_only(preprocess_image(self.image))
@@ -0,0 +1,107 @@
+"""
+Perceptual image hashes
+64-bit aHash, dHash and DCT pHash computed with numpy from a 32x32 grayscale
+thumbnail. The thumbnail is cheap to build from ImageContext's pyramid (see
+ImageContext.hash_thumbnail), so a request never resamples the full upload for
+hashing. Every hash is computed on a stack of thumbnails at once, so indexing many
+stored images (duplicate_store.backfill_fingerprints) costs a few matrix products
+per batch.
+
+Bits are in row-major order, first bit most significant, so hashes of the same
+kind can be compared with phash_index.hamming.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+THUMBNAIL_SIZE = 32
+HASH_SIZE = 8  # 8x8 = 64 bits
+HASH_METHODS = ("ahash", "dhash", "dct")
+
+
+def hash_thumbnail(image: Image.Image) -> np.ndarray:
+    """(32, 32) float32 grayscale box-filtered thumbnail of an image"""
+    small = image.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX, reducing_gap=2.0)
+    return np.asarray(small.convert("L"), dtype=np.float32)
+
+
+@lru_cache(maxsize=None)
+def _box_matrix(out_size: int, in_size: int) -> np.ndarray:
+    """(out, in) matrix averaging equal-width input spans (area resampling)"""
+    edges = np.linspace(0, in_size, out_size + 1)
+    weights = np.zeros((out_size, in_size), dtype=np.float32)
+    for i in range(out_size):
+        for j in range(in_size):
+            weights[i, j] = max(0.0, min(edges[i + 1], j + 1) - max(edges[i], j))
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix: dct(x) = D @ x"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    d = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    d[0] /= np.sqrt(2.0)
+    return d.astype(np.float32)
+
+
+def _resample(thumbnails: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """(N, H, W) -> (N, rows, cols) box-filtered"""
+    _, height, width = thumbnails.shape
+    return _box_matrix(rows, height) @ thumbnails @ _box_matrix(cols, width).T
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """(N, 8, 8) bool -> (N,) uint64, first bit most significant"""
+    packed = np.packbits(bits.reshape(len(bits), -1), axis=1)
+    return packed.view(">u8").ravel().astype(np.uint64)
+
+
+def hash_thumbnails(thumbnails: np.ndarray, method: str = "dct") -> np.ndarray:
+    """
+    Hash a stack of thumbnails
+
+    Args:
+        thumbnails: (N, H, W) or (H, W) grayscale, usually from hash_thumbnail
+        method: "ahash" (8x8 block means above their mean), "dhash" (horizontal
+            gradient signs on 9x8 blocks) or "dct" (8x8 lowest DCT frequencies above
+            their median)
+
+    Returns:
+        (N,) uint64 hashes
+    """
+    thumbnails = np.asarray(thumbnails, dtype=np.float32)
+    if thumbnails.ndim == 2:
+        thumbnails = thumbnails[None]
+    if method == "ahash":
+        blocks = _resample(thumbnails, HASH_SIZE, HASH_SIZE)
+        bits = blocks > blocks.mean(axis=(1, 2), keepdims=True)
+    elif method == "dhash":
+        blocks = _resample(thumbnails, HASH_SIZE, HASH_SIZE + 1)
+        bits = blocks[:, :, 1:] > blocks[:, :, :-1]
+    elif method == "dct":
+        d = _dct_matrix(thumbnails.shape[1]), _dct_matrix(thumbnails.shape[2])
+        low = (d[0] @ thumbnails @ d[1].T)[:, :HASH_SIZE, :HASH_SIZE]
+        bits = low > np.median(low.reshape(len(low), -1), axis=1)[:, None, None]
+    else:
+        raise ValueError(f"Unknown hash method {method!r}, expected one of {HASH_METHODS}")
+    return _pack(bits)
+
+
+def average_hash(thumbnail: np.ndarray) -> int:
+    return int(hash_thumbnails(thumbnail, "ahash")[0])
+
+
+def difference_hash(thumbnail: np.ndarray) -> int:
+    return int(hash_thumbnails(thumbnail, "dhash")[0])
+
+
+def dct_hash(thumbnail: np.ndarray) -> int:
+    return int(hash_thumbnails(thumbnail, "dct")[0])
+
+
+def to_hex(h: int) -> str:
+    return format(h, "016x")
@@ -0,0 +1,143 @@
+"""
+Dynamic micro-batching for model inference
+Collects preprocessed tensors from concurrent requests and runs them through
+the model in a single forward pass, then hands each caller its own result
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+
+class InferenceBatcher:
+    """Batches single-sample inference calls made from concurrent requests"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[np.ndarray], Sequence[Any]],
+        max_batch_size: int = 8,
+        window_ms: float = 5.0,
+    ):
+        """
+        Args:
+            run_batch: Callable taking a (N, H, W, C) batch and returning N results
+            max_batch_size: Largest batch sent to the model in one forward pass
+            window_ms: How long to wait for more requests after the first one arrives
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+
+        # Metrics
+        self._max_queue_depth = 0
+        self._total_batches = 0
+        self._total_items = 0
+        self._batch_size_counts: Dict[int, int] = {}
+        self._total_wait_s = 0.0
+        self._max_wait_s = 0.0
+        self._total_run_s = 0.0
+        self._errors = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, tensor: np.ndarray) -> Future:
+        """
+        Queue one preprocessed sample for inference
+
+        Args:
+            tensor: Model input with a leading batch dimension of 1 (1, H, W, C)
+
+        Returns:
+            Future resolved with this sample's result
+        """
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((tensor, future, time.perf_counter()))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def predict(self, tensor: np.ndarray, timeout: Optional[float] = None) -> Any:
+        """Submit a sample and block until its result is ready"""
+        return self.submit(tensor).result(timeout=timeout)
+
+    def _collect_batch(self):
+        """Wait for the first item, then keep collecting until the window closes or the batch is full"""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            deadline = self._queue[0][2] + self.window_s
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            items = self._collect_batch()
+            started = time.perf_counter()
+
+            try:
+                batch = np.concatenate([tensor for tensor, _, _ in items], axis=0)
+                results = list(self.run_batch(batch))
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"Batch runner returned {len(results)} results for {len(items)} inputs"
+                    )
+            except Exception as e:
+                with self._cond:
+                    self._errors += 1
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            with self._cond:
+                self._total_batches += 1
+                self._total_items += len(items)
+                self._batch_size_counts[len(items)] = self._batch_size_counts.get(len(items), 0) + 1
+                self._total_run_s += finished - started
+                for _, _, enqueued in items:
+                    wait = started - enqueued
+                    self._total_wait_s += wait
+                    self._max_wait_s = max(self._max_wait_s, wait)
+
+            for (_, future, _), result in zip(items, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and batch size metrics for tuning the window against latency"""
+        with self._cond:
+            batches = self._total_batches
+            items = self._total_items
+            return {
+                "max_batch_size": self.max_batch_size,
+                "window_ms": self.window_s * 1000.0,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "total_batches": batches,
+                "total_items": items,
+                "avg_batch_size": (items / batches) if batches else 0.0,
+                "batch_size_counts": dict(sorted(self._batch_size_counts.items())),
+                "avg_queue_wait_ms": (self._total_wait_s / items * 1000.0) if items else 0.0,
+                "max_queue_wait_ms": self._max_wait_s * 1000.0,
+                "avg_batch_run_ms": (self._total_run_s / batches * 1000.0) if batches else 0.0,
+                "errors": self._errors,
+            }
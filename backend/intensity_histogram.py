@@ -0,0 +1,113 @@
+"""
+Exact pixel statistics from one histogram
+Mean, standard deviation, min, max, median, percentiles and higher moments of an
+integer image, derived from its histogram (one counting pass, no sort, no float
+copy). uint8 images are counted by PIL in C; other integer arrays with np.bincount.
+Used by get_image_statistics, the validator and the density/texture analyzers,
+through ImageContext.rgb_histogram, gray_histogram and tissue_histogram.
+"""
+
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+
+def _lerp(a: float, b: float, t: float) -> float:
+    # numpy's percentile interpolation, so results match np.percentile bit for bit
+    return b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+
+class IntensityHistogram:
+    """Counts of each pixel value 0..len(counts)-1, and the statistics they determine"""
+
+    def __init__(self, counts: np.ndarray):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.count = int(self.counts.sum())
+
+    @classmethod
+    def of_array(cls, array: np.ndarray, mask: Optional[np.ndarray] = None) -> "IntensityHistogram":
+        """Histogram of a non-negative integer array, of its pixels where mask is True if given"""
+        if array.dtype == np.uint8 and array.ndim == 2:
+            image = Image.fromarray(np.ascontiguousarray(array))
+            mask_image = Image.fromarray(np.ascontiguousarray(mask).view(np.uint8)) if mask is not None else None
+            return cls(image.histogram(mask=mask_image))
+        values = array[mask] if mask is not None else array.ravel()
+        return cls(np.bincount(values, minlength=256 if array.dtype == np.uint8 else 0))
+
+    @classmethod
+    def of_image(cls, image: Image.Image) -> "IntensityHistogram":
+        """Histogram of every 8-bit channel value of an image (all bands pooled, as np.asarray(image))"""
+        counts = np.asarray(image.histogram(), dtype=np.int64)
+        return cls(counts.reshape(-1, 256).sum(axis=0))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @cached_property
+    def _values(self) -> np.ndarray:
+        return np.arange(len(self.counts), dtype=np.int64)
+
+    @cached_property
+    def total(self) -> int:
+        """Sum of all pixel values"""
+        return int(self.counts @ self._values)
+
+    @cached_property
+    def _cumulative(self) -> np.ndarray:
+        return np.cumsum(self.counts)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+    @cached_property
+    def std(self) -> float:
+        """Population standard deviation (np.std), from the exact integer variance N*sum(x^2) - sum(x)^2"""
+        sum_squares = int(self.counts @ (self._values * self._values))
+        return float(np.sqrt(max(self.count * sum_squares - self.total * self.total, 0))) / self.count
+
+    @cached_property
+    def min(self) -> int:
+        return int(np.flatnonzero(self.counts)[0])
+
+    @cached_property
+    def max(self) -> int:
+        return int(np.flatnonzero(self.counts)[-1])
+
+    def value_at(self, rank: int) -> int:
+        """rank-th smallest pixel value (0-based)"""
+        return int(np.searchsorted(self._cumulative, rank, side="right"))
+
+    def percentile(self, q: float) -> float:
+        """As np.percentile(pixels, q) with linear interpolation"""
+        rank = q / 100 * (self.count - 1)
+        low = int(np.floor(rank))
+        high = min(low + 1, self.count - 1)
+        return float(_lerp(self.value_at(low), self.value_at(high), rank - low))
+
+    @property
+    def median(self) -> float:
+        return self.percentile(50)
+
+    def count_above(self, threshold: float) -> int:
+        """Pixels with a value > threshold"""
+        first = max(int(np.floor(threshold)) + 1, 0)
+        return int(self.counts[first:].sum())
+
+    def count_below(self, threshold: float) -> int:
+        """Pixels with a value < threshold"""
+        last = max(int(np.ceil(threshold)), 0)
+        return int(self.counts[:last].sum())
+
+    def standardized_moment(self, order: int, eps: float = 0.0) -> float:
+        """mean(((x - mean) / (std + eps)) ** order)"""
+        deviations = (self._values - self.mean) / (self.std + eps)
+        return float(self.counts @ deviations ** order) / self.count
+
+    def above(self, threshold: int) -> "IntensityHistogram":
+        """Histogram of the pixels with a value > threshold"""
+        counts = self.counts.copy()
+        counts[:max(threshold + 1, 0)] = 0
+        return IntensityHistogram(counts)
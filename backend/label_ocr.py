@@ -0,0 +1,284 @@
+"""
+OCR of mammogram view labels ('R-MLO', 'LCC', ...)
+detect_text_label_in_image used to run Tesseract on 5 corner crops x 5 thresholds x
+2 polarities, up to twice each: about 100 subprocess launches per image. LabelOCR
+binarizes the same candidates, stacks them into one sheet and reads it in a single
+Tesseract call (a second, sparse-text pass only if the first finds no label), under a
+per-image time budget. Results are memoized by a hash of the corner crops.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import pytesseract
+    OCR_AVAILABLE = True
+except ImportError:
+    pytesseract = None
+    OCR_AVAILABLE = False
+    print("WARNING: pytesseract not available. OCR-based text detection disabled.")
+
+LABEL_OCR_BUDGET_MS = float(os.environ.get("LABEL_OCR_BUDGET_MS", "1500"))
+LABEL_OCR_CACHE_SIZE = int(os.environ.get("LABEL_OCR_CACHE_SIZE", "256"))
+
+THRESHOLDS = (50, 80, 100, 120, 150)
+WHITELIST = "-c tessedit_char_whitelist=RMLOC-0123456789"
+# Sheet passes, in order: one line per candidate, then sparse text if that finds no label
+PASSES = (f"--psm 6 {WHITELIST}", f"--psm 11 {WHITELIST}")
+# pytesseract kills the subprocess and raises RuntimeError with this message on timeout
+TESSERACT_TIMEOUT = "Tesseract process timeout"
+MARGIN = 8  # White border kept around each candidate's text
+GAP = 24  # White rows between candidates, so Tesseract sees separate lines
+
+Label = Tuple[Optional[str], Optional[str]]
+
+
+def parse_mammogram_label(text):
+    """
+    Parse mammogram label text to extract laterality and view type.
+
+    Handles formats like: R-MLO, RMLO, R MLO, L-CC, LCC, L CC, RCC, etc.
+
+    Args:
+        text: Detected text string
+
+    Returns:
+        Tuple of (laterality, view_type) or (None, None)
+    """
+    if not text:
+        return None, None
+
+    # Clean up the text
+    text = text.upper().strip()
+    text = re.sub(r'[^A-Z0-9\-\s]', '', text)  # Keep only letters, numbers, dash, space
+
+    laterality = None
+    view_type = None
+
+    # Check for MLO patterns
+    mlo_patterns = ['MLO', 'M-LO', 'M L O', 'MLC', 'ML0', 'WLO', 'NLO']  # Common OCR misreads
+    for pattern in mlo_patterns:
+        if pattern in text:
+            view_type = "MLO"
+            break
+
+    # Check for CC patterns
+    cc_patterns = ['CC', 'C-C', 'C C']
+    if not view_type:
+        for pattern in cc_patterns:
+            if pattern in text:
+                view_type = "CC"
+                break
+
+    # Check for laterality
+    if text.startswith('R') or 'R-' in text or ' R ' in text or text.startswith('R '):
+        laterality = "R"
+    elif text.startswith('L') or 'L-' in text or ' L ' in text or text.startswith('L '):
+        laterality = "L"
+
+    # Also check for full patterns
+    full_patterns = {
+        'RMLO': ('R', 'MLO'), 'R-MLO': ('R', 'MLO'), 'R MLO': ('R', 'MLO'),
+        'LMLO': ('L', 'MLO'), 'L-MLO': ('L', 'MLO'), 'L MLO': ('L', 'MLO'),
+        'RCC': ('R', 'CC'), 'R-CC': ('R', 'CC'), 'R CC': ('R', 'CC'),
+        'LCC': ('L', 'CC'), 'L-CC': ('L', 'CC'), 'L CC': ('L', 'CC'),
+    }
+
+    for pattern, (lat, view) in full_patterns.items():
+        if pattern in text:
+            return lat, view
+
+    return laterality, view_type
+
+
+def label_regions(img_array: np.ndarray) -> List[np.ndarray]:
+    """Corner and edge crops where labels are printed, in the order they are searched"""
+    height, width = img_array.shape
+    return [
+        img_array[:height // 5, :width // 4],  # top left
+        img_array[:height // 5, -width // 4:],  # top right
+        img_array[-height // 6:, :width // 4],  # bottom left
+        img_array[-height // 6:, -width // 4:],  # bottom right
+        img_array[:height // 6, width // 4:-width // 4],  # top center
+    ]
+
+
+def label_candidates(regions: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Binarized crops, dark text on white, trimmed to their text
+
+    Each region is min-max normalized and thresholded at THRESHOLDS. The minority
+    color is taken as text, which covers both polarities the old loop tried.
+    Identical candidates (common across neighbouring thresholds) are kept once.
+    """
+    candidates, seen = [], set()
+    for region in regions:
+        if region.shape[0] < 10 or region.shape[1] < 10:
+            continue
+        low, high = int(region.min()), int(region.max())
+        if high == low:
+            continue  # Uniform crop: nothing to read
+        normalized = ((region.astype(np.float32) - low) * (255.0 / (high - low))).astype(np.uint8)
+        for threshold in THRESHOLDS:
+            bright = normalized > threshold
+            text = bright if np.count_nonzero(bright) * 2 < bright.size else ~bright
+            rows, cols = np.flatnonzero(text.any(axis=1)), np.flatnonzero(text.any(axis=0))
+            if rows.size == 0:
+                continue
+            text = text[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            key = (text.shape, np.packbits(text).tobytes())
+            if key in seen:
+                continue
+            seen.add(key)
+            candidates.append(np.pad(np.where(text, 0, 255).astype(np.uint8), MARGIN, constant_values=255))
+    return candidates
+
+
+def build_sheet(candidates: List[np.ndarray]) -> Image.Image:
+    """Stack candidates top to bottom on one white page, left-aligned"""
+    width = max(candidate.shape[1] for candidate in candidates)
+    height = sum(candidate.shape[0] for candidate in candidates) + GAP * (len(candidates) - 1)
+    sheet = np.full((height, width), 255, dtype=np.uint8)
+    y = 0
+    for candidate in candidates:
+        sheet[y:y + candidate.shape[0], :candidate.shape[1]] = candidate
+        y += candidate.shape[0] + GAP
+    return Image.fromarray(sheet)
+
+
+def regions_key(regions: List[np.ndarray]) -> str:
+    """SHA-256 of the crops' shapes and pixels"""
+    digest = hashlib.sha256()
+    for region in regions:
+        digest.update(repr(region.shape).encode())
+        digest.update(np.ascontiguousarray(region).tobytes())
+    return digest.hexdigest()
+
+
+class LabelOCR:
+    """
+    Reads the view label from an image's corners with at most len(PASSES) Tesseract calls
+
+    Thread-safe: analyses run in executor threads and share one instance.
+    """
+
+    def __init__(
+        self,
+        image_to_string: Optional[Callable[..., str]] = None,
+        budget_ms: float = LABEL_OCR_BUDGET_MS,
+        cache_size: int = LABEL_OCR_CACHE_SIZE,
+    ):
+        """
+        Args:
+            image_to_string: OCR function with pytesseract's signature (default: pytesseract's)
+            budget_ms: Wall-clock budget for one image; a pass that would exceed it is cut off
+            cache_size: Images whose label result is remembered (0 disables the cache)
+        """
+        if image_to_string is None and pytesseract is not None:
+            image_to_string = pytesseract.image_to_string
+        self.image_to_string = image_to_string
+        self.budget_ms = budget_ms
+        self.cache_size = max(0, int(cache_size))
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Label]" = OrderedDict()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._calls = 0
+        self._timeouts = 0
+
+    @property
+    def available(self) -> bool:
+        return self.image_to_string is not None
+
+    def read_label(self, img_array: np.ndarray) -> Label:
+        """
+        (laterality, view_type) read from the label, (None, None) if no label was found
+
+        Args:
+            img_array: Grayscale image as numpy array
+        """
+        if not self.available:
+            return None, None
+        regions = label_regions(img_array)
+        key = regions_key(regions)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return self._cache[key]
+            self._misses += 1
+
+        result, complete = self._ocr(regions)
+        if complete and self.cache_size:
+            # An image cut off by the budget is not cached: the next attempt may have more time
+            with self._lock:
+                self._cache[key] = result
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _ocr(self, regions: List[np.ndarray]) -> Tuple[Label, bool]:
+        """Label and whether every pass ran within the budget"""
+        candidates = label_candidates(regions)
+        if not candidates:
+            return (None, None), True
+        sheet = build_sheet(candidates)
+        deadline = time.monotonic() + self.budget_ms / 1000
+        for config in PASSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count_timeout()
+                return (None, None), False
+            with self._lock:
+                self._calls += 1
+            try:
+                text = self.image_to_string(sheet, config=config, timeout=remaining)
+            except RuntimeError as e:
+                if str(e) != TESSERACT_TIMEOUT:
+                    # pytesseract.TesseractError subclasses RuntimeError too: a failure, not the budget
+                    print(f"DEBUG OCR error: {e}")
+                    return (None, None), False
+                print(f"DEBUG OCR pass '{config}' stopped: {e}")
+                self._count_timeout()
+                return (None, None), False
+            except Exception as e:
+                print(f"DEBUG OCR error: {e}")
+                return (None, None), False
+            # Lines come back top to bottom, so the earliest region and threshold win as before
+            for line in text.upper().splitlines():
+                laterality, view_type = parse_mammogram_label(line.strip())
+                if view_type:
+                    print(f"DEBUG: OCR detected label '{line.strip()}' -> laterality={laterality}, view={view_type}")
+                    return (laterality, view_type), True
+        return (None, None), True
+
+    def _count_timeout(self):
+        with self._lock:
+            self._timeouts += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.cache_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "tesseract_calls": self._calls,
+                "timeouts": self._timeouts,
+            }
+
+
+# Global instance shared by all analyses
+label_ocr = LabelOCR()
@@ -8,17 +8,23 @@
 
 # main.py  -> FastAPI backend
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
-from typing import Dict, Any, Tuple, Optional, List
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, Callable, Tuple, Optional, List
 
 import base64
 import io
 import os
 import gc
 import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlencode
 
 import numpy as np
 from PIL import Image
@@ -26,10 +32,30 @@ from PIL import Image
 # Lazy import TensorFlow to save memory on startup
 # from tensorflow import keras  # Moved to function level
 
-from grad_cam import create_gradcam_visualization, generate_mammogram_view_analysis
-from report_generator import generate_report_pdf
+from grad_cam import (
+    compute_gradcam_findings,
+    create_gradcam_visualization,
+    generate_mammogram_view_analysis,
+    get_gradcam_explainer,
+    get_last_conv_layer_index,
+    GradCAMExplainer,
+)
+from report_generator import generate_report_pdf, generate_view_analysis
 from mammogram_validator import validate_mammogram_image
-from duplicate_detector import duplicate_detector
+from duplicate_detector import duplicate_detector, DuplicateDetector, index_bands
+from duplicate_store import DEFAULT_SCOPE, DatabaseFingerprintStore, analysis_scope
+from inference_batcher import InferenceBatcher
+from analysis_store import analysis_record_fields
+from analysis_executor import AnalysisExecutor, QueueFullError
+from analysis_stream import negotiate_stream_format, stream_analysis
+from analysis_images import AnalysisImages, IMAGE_NAMES, IMAGE_KEYS, image_url, verify_image_signature, image_media_type
+from image_encoding import ImageEncoding, encode_image, negotiate_encoding
+from image_context import ImageContext, preprocess_image
+from label_ocr import label_ocr
+from stage_timing import METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE, record, render_metrics, request_timings, span
+from analysis_cache import AnalysisCache
+from model_registry import LoadedModel, ModelRegistry
+from report_jobs import DatabaseJobStore, ReportJobQueue
 
 # Database imports
 auth_router = None
@@ -42,7 +68,7 @@ dashboard_router = None
 try:
     from database import create_tables, get_db, Analysis, Report, User
     from api_routes import auth_router, users_router, patients_router, analyses_router, reports_router, dashboard_router
-    from auth import get_optional_user
+    from auth import get_current_active_user, get_optional_user, SECRET_KEY
     from sqlalchemy.orm import Session
     DATABASE_AVAILABLE = True
     print("✅ Database module loaded successfully")
@@ -106,150 +132,6 @@ def convert_numpy_types(obj):
         return obj
 
 
-def generate_view_analysis(analysis, image):
-    """
-    Generate view-specific (CC or MLO) mammogram analysis based on detected view type.
-    Only returns the detected view, not both views.
-    """
-    findings = analysis.get("findings", {})
-    regions = findings.get("regions", [])
-    stats = analysis.get("stats", {})
-    malignant_prob = analysis.get("malignant_prob", 0)
-    
-    # Get the detected view type from the analysis
-    view_analysis_data = analysis.get("view_analysis", {})
-    view_type_full = view_analysis_data.get("view_type", "")
-    
-    # Determine if it's MLO or CC based on the view_type string
-    is_mlo = "MLO" in view_type_full or "Medio-Lateral" in view_type_full
-    is_cc = "CC" in view_type_full or "Cranio-Caudal" in view_type_full
-    
-    # Determine breast density based on image statistics
-    mean_intensity = stats.get("mean_intensity", 128)
-    if mean_intensity > 200:
-        breast_density = "Almost entirely fatty (ACR A)"
-    elif mean_intensity > 150:
-        breast_density = "Scattered fibroglandular densities (ACR B)"
-    elif mean_intensity > 100:
-        breast_density = "Heterogeneously dense (ACR C)"
-    else:
-        breast_density = "Extremely dense (ACR D)"
-    
-    # Count detected abnormalities by type
-    masses_count = sum(1 for r in regions if 'Mass' in r.get('cancer_type', ''))
-    calc_count = sum(1 for r in regions if 'Calcification' in r.get('cancer_type', ''))
-    distortion_count = sum(1 for r in regions if 'distortion' in r.get('cancer_type', '').lower())
-    asymmetry_count = sum(1 for r in regions if 'asymmetry' in r.get('cancer_type', '').lower())
-    
-    # Generate descriptions
-    masses_desc = f"{masses_count} suspicious mass(es) detected" if masses_count > 0 else "No suspicious masses identified"
-    calc_desc = f"{calc_count} calcification cluster(s) detected" if calc_count > 0 else "No suspicious calcifications"
-    distortion_desc = f"{distortion_count} area(s) of architectural distortion" if distortion_count > 0 else "No architectural distortion"
-    asymmetry_desc = f"{asymmetry_count} focal asymmetry detected" if asymmetry_count > 0 else "No significant asymmetry"
-    
-    # Determine image quality based on contrast
-    contrast = stats.get("contrast", 20)
-    if contrast > 25:
-        image_quality = "Excellent - High contrast, optimal visualization"
-    elif contrast > 15:
-        image_quality = "Good - Adequate for diagnostic evaluation"
-    elif contrast > 10:
-        image_quality = "Acceptable - Minor limitations"
-    else:
-        image_quality = "Limited - May require repeat imaging"
-    
-    # Generate impression based on findings
-    if malignant_prob >= 75:
-        impression = "Highly suspicious findings requiring immediate follow-up"
-    elif malignant_prob >= 50:
-        impression = "Suspicious findings - biopsy recommended"
-    elif malignant_prob >= 25:
-        impression = "Probably benign - short interval follow-up suggested"
-    else:
-        impression = "No significant abnormality detected"
-    
-    # Generate comparison text based on detected view
-    if is_mlo:
-        comparison = (
-            f"MLO view findings as described above. "
-            f"Breast density is {breast_density.split('(')[0].strip().lower()}. "
-            f"{'Suspicious findings warrant further evaluation.' if malignant_prob >= 50 else 'No additional suspicious findings detected.'}"
-        )
-    elif is_cc:
-        comparison = (
-            f"CC view findings as described above. "
-            f"Breast density is {breast_density.split('(')[0].strip().lower()}. "
-            f"{'Suspicious findings warrant further evaluation.' if malignant_prob >= 50 else 'No additional suspicious findings detected.'}"
-        )
-    else:
-        comparison = (
-            f"View type could not be determined from filename. "
-            f"Breast density is {breast_density.split('(')[0].strip().lower()}. "
-            f"{'Suspicious findings warrant further evaluation.' if malignant_prob >= 50 else 'Findings as described above.'}"
-        )
-    
-    # Create view-specific analysis structure
-    result = {"comparison": comparison}
-    
-    # Only add the detected view to the result
-    if is_mlo:
-        # MLO View Analysis
-        result["mlo"] = {
-            "image_quality": image_quality,
-            "positioning": "Properly positioned with pectoral muscle to nipple level",
-            "breast_density": breast_density,
-            "masses": masses_desc,
-            "calcifications": calc_desc,
-            "architectural_distortion": distortion_desc,
-            "pectoral_muscle": "Adequately visualized extending to nipple level",
-            "axillary_findings": "No suspicious axillary lymphadenopathy",
-            "inframammary_fold": "Inframammary fold included",
-            "impression": impression,
-        }
-    elif is_cc:
-        # CC View Analysis
-        result["cc"] = {
-            "image_quality": image_quality,
-            "positioning": "Properly positioned with adequate compression",
-            "breast_density": breast_density,
-            "masses": masses_desc,
-            "calcifications": calc_desc,
-            "asymmetry": asymmetry_desc,
-            "skin_nipple_changes": "No skin thickening or nipple retraction",
-            "medial_coverage": "Adequate medial tissue included",
-            "lateral_coverage": "Adequate lateral tissue included",
-            "impression": impression,
-        }
-    else:
-        # If view type cannot be determined, include both for compatibility
-        result["cc"] = {
-            "image_quality": image_quality,
-            "positioning": "Properly positioned with adequate compression",
-            "breast_density": breast_density,
-            "masses": masses_desc,
-            "calcifications": calc_desc,
-            "asymmetry": asymmetry_desc,
-            "skin_nipple_changes": "No skin thickening or nipple retraction",
-            "medial_coverage": "Adequate medial tissue included",
-            "lateral_coverage": "Adequate lateral tissue included",
-            "impression": impression,
-        }
-        result["mlo"] = {
-            "image_quality": image_quality,
-            "positioning": "Properly positioned with pectoral muscle to nipple level",
-            "breast_density": breast_density,
-            "masses": masses_desc,
-            "calcifications": calc_desc,
-            "architectural_distortion": distortion_desc,
-            "pectoral_muscle": "Adequately visualized extending to nipple level",
-            "axillary_findings": "No suspicious axillary lymphadenopathy",
-            "inframammary_fold": "Inframammary fold included",
-            "impression": impression,
-        }
-    
-    return result
-
-
 app = FastAPI(
     title="Breast Cancer Detection API",
     description=(
@@ -298,7 +180,67 @@ else:
         # Fallback for when backend is root directory in Render
         MODEL_PATH = Path("/opt/render/project/src/models/breast_cancer_model.keras")
         
-_model: Optional[Any] = None  # Lazy loaded, so using Any instead of keras.Model
+
+# Micro-batching: concurrent /analyze requests share one forward pass
+ENABLE_BATCHING = os.environ.get("ENABLE_BATCHING", "true").lower() in ("1", "true", "yes")
+# A batch only fills with analyses running at the same time, so it never exceeds ANALYSIS_CONCURRENCY
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "5"))
+
+# Compiled serving path: tf.function with a fixed [None, 224, 224, 3] signature
+# instead of model.predict, optionally XLA-compiled
+COMPILED_INFERENCE = os.environ.get("COMPILED_INFERENCE", "false").lower() in ("1", "true", "yes")
+XLA_JIT_COMPILE = os.environ.get("XLA_JIT_COMPILE", "false").lower() in ("1", "true", "yes")
+
+# Load and exercise the whole pipeline at startup so the first request is not cold
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Analysis executor: CPU-bound work runs on a bounded thread pool, not the event loop.
+# Requests beyond concurrency + queue limit are rejected with 503 + Retry-After.
+# Defaults to BATCH_MAX_SIZE with batching on: only concurrent analyses feed a batch
+ANALYSIS_CONCURRENCY = int(os.environ.get("ANALYSIS_CONCURRENCY", str(BATCH_MAX_SIZE if ENABLE_BATCHING else 2)))
+if ENABLE_BATCHING and ANALYSIS_CONCURRENCY < BATCH_MAX_SIZE:
+    print(f"⚠️ ANALYSIS_CONCURRENCY={ANALYSIS_CONCURRENCY} caps inference batches below BATCH_MAX_SIZE={BATCH_MAX_SIZE}")
+ANALYSIS_QUEUE_LIMIT = int(os.environ.get("ANALYSIS_QUEUE_LIMIT", "8"))
+ANALYSIS_RETRY_AFTER = int(os.environ.get("ANALYSIS_RETRY_AFTER", "5"))
+
+# Analysis result cache keyed by upload SHA-256 + model version:
+# /report after /analyze of the same file skips the model entirely
+ANALYSIS_CACHE_MAX_MB = int(os.environ.get("ANALYSIS_CACHE_MAX_MB", "256"))
+ANALYSIS_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR") or None
+ANALYSIS_CACHE_DISK_MAX_MB = int(os.environ.get("ANALYSIS_CACHE_DISK_MAX_MB", "2048"))
+
+# Duplicate uploads: fingerprints per user/session, shared by all workers through the database
+# ("memory" keeps them in each process, as without a database)
+DUPLICATE_STORE = os.environ.get("DUPLICATE_STORE", "database").lower()
+DUPLICATE_TTL_HOURS = float(os.environ.get("DUPLICATE_TTL_HOURS", "24"))
+DUPLICATE_MAX_PER_SCOPE = int(os.environ.get("DUPLICATE_MAX_PER_SCOPE", "10000"))
+DUPLICATE_CACHED_SCOPES = int(os.environ.get("DUPLICATE_CACHED_SCOPES", "256"))
+# Row ids below the highest seen that each lookup re-reads; covers inserts committing out of id order
+DUPLICATE_SYNC_OVERLAP = int(os.environ.get("DUPLICATE_SYNC_OVERLAP", "100"))
+
+# Background report jobs: POST /report/jobs returns immediately, workers render and save the PDF
+REPORT_JOB_WORKERS = int(os.environ.get("REPORT_JOB_WORKERS", "1"))
+REPORT_JOB_QUEUE_LIMIT = int(os.environ.get("REPORT_JOB_QUEUE_LIMIT", "16"))
+REPORT_JOB_TTL_SECONDS = float(os.environ.get("REPORT_JOB_TTL_SECONDS", "3600"))
+# Unfinished jobs older than this are reported failed: the worker running them has died
+REPORT_JOB_STALE_SECONDS = float(os.environ.get("REPORT_JOB_STALE_SECONDS", "900"))
+
+# /analyze images: "url" returns GET /analyses/{id}/images/{name} links rendered on first request,
+# "inline" embeds five base64 PNGs (always used when the database is unavailable)
+ANALYZE_IMAGES = os.environ.get("ANALYZE_IMAGES", "url").lower()
+# Recent analyses whose heatmap and original image stay in memory for those image requests
+ANALYSIS_IMAGES_RECENT = int(os.environ.get("ANALYSIS_IMAGES_RECENT", "32"))
+
+# Response image encoding (png, webp, jpeg), lossy quality and display downscaling.
+# Clients override per request with ?format=&quality=&max_dim= or the Accept header
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "png").lower()
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "0")) or None
+IMAGE_MAX_DIM = int(os.environ.get("IMAGE_MAX_DIM", "0")) or None
+PNG_COMPRESS_LEVEL = int(os.environ.get("PNG_COMPRESS_LEVEL", "1"))
+DEFAULT_IMAGE_ENCODING = ImageEncoding(IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_MAX_DIM, PNG_COMPRESS_LEVEL)
+# Images saved to the database (reports, repeat requests) stay full-resolution and lossless
+STORED_IMAGE_ENCODING = ImageEncoding("png", png_compress_level=PNG_COMPRESS_LEVEL)
 
 
 def check_model_exists():
@@ -329,35 +271,44 @@ def check_model_exists():
     return False
 
 
-def get_model():
-    """Load model from local file."""
+def load_keras_model(path: Path):
+    """Load a model file, rebuilding the architecture on a Keras version mismatch."""
     from tensorflow import keras
-    
-    global _model
-    if _model is None:
-        # Check if model exists
-        if not check_model_exists():
-            raise RuntimeError(
-                f"Model file not found at {MODEL_PATH}. "
-                "Please ensure the model file is placed in the backend/models/ directory."
-            )
-        
-        try:
-            # Try loading with safe_mode=False for compatibility
-            _model = keras.models.load_model(MODEL_PATH, compile=False, safe_mode=False)
-            _model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-            
-            # Free up memory after loading
-            gc.collect()
-        except TypeError as e:
-            if "batch_shape" in str(e) or "safe_mode" in str(e):
-                # Keras version mismatch - recreate the model architecture
-                print("Keras version mismatch detected, rebuilding model...")
-                _model = _create_compatible_model()
-                _load_weights_from_keras_file(_model, MODEL_PATH)
-            else:
-                raise e
-    return _model
+
+    try:
+        # Try loading with safe_mode=False for compatibility
+        model = keras.models.load_model(path, compile=False, safe_mode=False)
+        model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+
+        # Free up memory after loading
+        gc.collect()
+    except TypeError as e:
+        if "batch_shape" in str(e) or "safe_mode" in str(e):
+            # Keras version mismatch - recreate the model architecture
+            print("Keras version mismatch detected, rebuilding model...")
+            model = _create_compatible_model()
+            _load_weights_from_keras_file(model, path)
+        else:
+            raise e
+    return model
+
+
+# Loads the model once under a lock (concurrent first requests share one load)
+# and swaps in new versions without dropping requests in flight
+model_registry = ModelRegistry(MODEL_PATH, load_keras_model)
+
+# Set by serve.py in pre-fork workers: asks the parent to reload every other worker on a model file
+reload_other_workers: Optional[Callable[[Path], None]] = None
+
+
+def get_model():
+    """The serving model, loaded from MODEL_PATH on first use."""
+    return model_registry.get()
+
+
+def get_model_version() -> str:
+    """Short content hash of the serving model file, used to key cached analyses."""
+    return model_registry.version()
 
 
 def _create_compatible_model():
@@ -413,39 +364,181 @@ def _load_weights_from_keras_file(model, keras_path: Path):
         print(f"Could not load weights: {e}")
 
 
-# ----------------- HELPERS: preprocessing, stats, risk -----------------
+_compiled_predict: Optional[Tuple[Any, Any]] = None  # (model, tf.function)
+
+
+def build_compiled_predict(model, jit_compile: bool = False):
+    """Wrap the model forward pass in a tf.function with a fixed input signature."""
+    import tensorflow as tf
+
+    @tf.function(
+        input_signature=[tf.TensorSpec(shape=[None, 224, 224, 3], dtype=tf.float32)],
+        jit_compile=jit_compile,
+    )
+    def compiled_predict(batch):
+        return model(batch, training=False)
+
+    return compiled_predict
 
-def preprocess_image(image: Image.Image) -> np.ndarray:
-    """Streamlit code se hi liya hai: resize 224x224, normalize, RGB fix."""
-    img = image.resize((224, 224), Image.LANCZOS)
-    img_array = np.array(img)
 
-    if img_array.ndim == 2:  # grayscale
-        img_array = np.stack([img_array] * 3, axis=-1)
-    elif img_array.shape[2] == 4:  # RGBA
-        img_array = img_array[:, :, :3]
+def _predict_batch(batch: np.ndarray, model) -> List[float]:
+    """Run one forward pass over a stacked batch and return P(malignant) per sample."""
+    global _compiled_predict
 
-    img_array = img_array.astype("float32") / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
+    if COMPILED_INFERENCE:
+        if _compiled_predict is None or _compiled_predict[0] is not model:
+            _compiled_predict = (model, build_compiled_predict(model, jit_compile=XLA_JIT_COMPILE))
+        predictions = _compiled_predict[1](batch.astype(np.float32)).numpy()
+    else:
+        predictions = model.predict(batch, verbose=0)
+    return [float(p[0]) for p in predictions]
 
 
-def get_image_statistics(image: Image.Image) -> Dict[str, float]:
-    img_array = np.array(image)
+def _explain_batch(batch: np.ndarray) -> List[Tuple[float, Optional[np.ndarray], LoadedModel]]:
+    """
+    One taped forward pass over a stacked batch.
+    Returns (P(malignant), Grad-CAM heatmap, model used) per sample.
+    """
+    # One snapshot per batch: a reload mid-batch does not mix models
+    loaded = model_registry.current()
+    explainer = get_gradcam_explainer(loaded.model, compiled=COMPILED_INFERENCE, jit_compile=XLA_JIT_COMPILE)
+    if explainer is None:
+        # No conv layer to explain - plain prediction, Grad-CAM reports the error later
+        return [(p, None, loaded) for p in _predict_batch(batch, loaded.model)]
+
+    predictions, heatmaps = explainer.explain(batch)
+    return [(float(p), h, loaded) for p, h in zip(predictions, heatmaps)]
+
+
+inference_batcher = InferenceBatcher(
+    _explain_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    window_ms=BATCH_WINDOW_MS,
+)
+
+
+def explain_prediction(preprocessed: np.ndarray) -> Tuple[float, Optional[np.ndarray], LoadedModel]:
+    """
+    Sigmoid output and Grad-CAM heatmap for a single preprocessed image,
+    batched with concurrent requests if enabled, and the model that produced them.
+    """
+    if ENABLE_BATCHING:
+        return inference_batcher.predict(preprocessed)
+    return _explain_batch(preprocessed)[0]
+
+
+analysis_executor = AnalysisExecutor(
+    max_concurrency=ANALYSIS_CONCURRENCY,
+    max_queue=ANALYSIS_QUEUE_LIMIT,
+    retry_after=ANALYSIS_RETRY_AFTER,
+)
+
+
+analysis_cache = AnalysisCache(
+    max_memory_bytes=ANALYSIS_CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=ANALYSIS_CACHE_DIR,
+    max_disk_bytes=ANALYSIS_CACHE_DISK_MAX_MB * 1024 * 1024,
+)
+
+
+if DATABASE_AVAILABLE and DUPLICATE_STORE == "database":
+    from database import SessionLocal
+
+    duplicate_detector.store = DatabaseFingerprintStore(
+        SessionLocal,
+        bands=index_bands(duplicate_detector.max_distance),
+        ttl_seconds=DUPLICATE_TTL_HOURS * 3600,
+        max_per_scope=DUPLICATE_MAX_PER_SCOPE,
+        cached_scopes=DUPLICATE_CACHED_SCOPES,
+        sync_overlap=DUPLICATE_SYNC_OVERLAP,
+    )
+
+
+def duplicate_scope(authorization: Optional[str] = None, session_id: Optional[str] = None) -> str:
+    """Uploads are only duplicates of earlier uploads by the same user, or in the same browser session."""
+    if DATABASE_AVAILABLE and authorization and authorization.startswith("Bearer "):
+        from auth import decode_token
+
+        token_data = decode_token(authorization.split(" ")[1])
+        if token_data and token_data.user_id:
+            return analysis_scope(token_data.user_id)
+    if session_id:
+        return f"session:{session_id[:64]}"
+    return DEFAULT_SCOPE
+
+
+# analysis_id -> AnalysisImages, so image requests right after /analyze skip the database decode
+_recent_images: "OrderedDict[int, AnalysisImages]" = OrderedDict()
+_recent_images_lock = threading.Lock()
+
+
+def remember_analysis_images(analysis_id: int, images: AnalysisImages):
+    with _recent_images_lock:
+        _recent_images[analysis_id] = images
+        _recent_images.move_to_end(analysis_id)
+        while len(_recent_images) > ANALYSIS_IMAGES_RECENT:
+            _recent_images.popitem(last=False)
+
+
+def recent_analysis_images(analysis_id: int) -> Optional[AnalysisImages]:
+    with _recent_images_lock:
+        images = _recent_images.get(analysis_id)
+        if images is not None:
+            _recent_images.move_to_end(analysis_id)
+        return images
+
+
+if DATABASE_AVAILABLE:
+    from database import SessionLocal
+
+    # Job status in the report_jobs table, so polls landing on another worker find the job
+    report_job_store = DatabaseJobStore(SessionLocal)
+else:
+    report_job_store = None
+
+report_jobs = ReportJobQueue(
+    workers=REPORT_JOB_WORKERS,
+    max_queue=REPORT_JOB_QUEUE_LIMIT,
+    ttl_seconds=REPORT_JOB_TTL_SECONDS,
+    retry_after=ANALYSIS_RETRY_AFTER,
+    store=report_job_store,
+    stale_seconds=REPORT_JOB_STALE_SECONDS,
+)
 
-    if img_array.ndim == 2:
-        img_array = np.stack([img_array] * 3, axis=-1)
-    elif img_array.shape[2] == 4:
-        img_array = img_array[:, :, :3]
+
+async def run_in_analysis_executor(fn, *args, **kwargs) -> Tuple[Any, float]:
+    """
+    Run CPU-bound work on the analysis executor.
+    Returns (result, queue_wait_seconds); raises 503 with Retry-After when the queue is full.
+    """
+    try:
+        result, queue_wait = await analysis_executor.run(fn, *args, **kwargs)
+    except QueueFullError as e:
+        print(f"⚠️ Analysis queue full - rejecting request (retry after {e.retry_after}s)")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy analyzing other images. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    print(f"⏱️ Queue wait: {queue_wait * 1000:.1f} ms")
+    record("queue_wait", queue_wait)
+    return result, queue_wait
+
+
+# ----------------- HELPERS: preprocessing, stats, risk -----------------
+
+def get_image_statistics(image: Image.Image, context: Optional[ImageContext] = None) -> Dict[str, float]:
+    # Statistics of every RGB value, all derived from one histogram (no sort for the median)
+    histogram = ImageContext.of(image, context).rgb_histogram
 
     stats = {
-        "mean_intensity": float(np.mean(img_array)),
-        "std_intensity": float(np.std(img_array)),
-        "min_intensity": float(np.min(img_array)),
-        "max_intensity": float(np.max(img_array)),
-        "median_intensity": float(np.median(img_array)),
-        "brightness": float(np.mean(img_array) / 255.0 * 100),
-        "contrast": float(np.std(img_array) / 255.0 * 100),
+        "mean_intensity": float(histogram.mean),
+        "std_intensity": float(histogram.std),
+        "min_intensity": float(histogram.min),
+        "max_intensity": float(histogram.max),
+        "median_intensity": float(histogram.median),
+        "brightness": float(histogram.mean / 255.0 * 100),
+        "contrast": float(histogram.std / 255.0 * 100),
     }
     return stats
 
@@ -477,18 +570,42 @@ def get_risk_level(confidence: float) -> Tuple[str, str, str]:
             return "Moderate Risk", "🟡", "#cccc00"
 
 
-def pil_to_base64(image: Optional[Image.Image]) -> Optional[str]:
+def pil_to_base64(image: Optional[Image.Image], encoding: Optional[ImageEncoding] = None) -> Optional[str]:
     if image is None:
         return None
-    buf = io.BytesIO()
-    image.save(buf, format="PNG")
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode("utf-8")
+    return base64.b64encode(encode_image(image, encoding or STORED_IMAGE_ENCODING)).decode("utf-8")
+
+
+def encode_analysis_images(
+    images,
+    emit: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    encoding: Optional[ImageEncoding] = None,
+) -> Dict[str, Optional[str]]:
+    """Render (if lazy) and base64-encode every analysis image, emitting each as it is ready"""
+    encoding = encoding or STORED_IMAGE_ENCODING
+    images_b64 = {}
+    for key, img in images.items():
+        images_b64[key] = pil_to_base64(img, encoding)
+        if emit:
+            emit("image", {"name": IMAGE_NAMES.get(key, key), "data": images_b64[key], "media_type": encoding.media_type})
+    return images_b64
+
+
+def upload_image_b64(data: bytes, image: Image.Image) -> str:
+    """The upload itself when browsers can display it (no re-encode), otherwise a PNG"""
+    if image_media_type(data):
+        return base64.b64encode(data).decode("utf-8")
+    return pil_to_base64(image)
 
 
 # ----------------- CORE ANALYSIS LOGIC (Streamlit ka brain yahan) -----------------
 
-def run_full_analysis(image: Image.Image, filename: str = None) -> Tuple[Dict[str, Any], Dict[str, Image.Image]]:
+def run_full_analysis(
+    image: Image.Image,
+    filename: str = None,
+    emit: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    context: Optional[ImageContext] = None,
+) -> Tuple[Dict[str, Any], AnalysisImages]:
     """
     Yeh function tumhari Streamlit logic ka backend version hai:
     - model se prediction
@@ -496,29 +613,26 @@ def run_full_analysis(image: Image.Image, filename: str = None) -> Tuple[Dict[st
     - Grad-CAM heatmaps
     - risk level, probabilities
     - detailed findings from image analysis
+
+    emit(stage, payload), if given, is called as soon as each stage is ready:
+    "classification", then "findings", then "view_analysis" (used by streaming /analyze).
+    context: The request's ImageContext, shared with the validator and duplicate check.
     """
-    model = get_model()
-    preprocessed = preprocess_image(image)
+    context = ImageContext.of(image, context)
+    with span("preprocess"):
+        preprocessed = context.model_input
 
-    # model.predict -> sigmoid output
-    prediction = float(model.predict(preprocessed, verbose=0)[0][0])
-    confidence = prediction
+    # Sigmoid output + Grad-CAM heatmap from one taped forward pass
+    # (shared with concurrent requests when batching is enabled)
+    with span("predict"):
+        confidence, heatmap, loaded = explain_prediction(preprocessed)
 
-    stats = get_image_statistics(image)
+    with span("statistics"):
+        stats = get_image_statistics(image, context=context)
 
     benign_prob = (1 - confidence) * 100
     malignant_prob = confidence * 100
 
-    (
-        heatmap_array,
-        overlay_image,
-        heatmap_only,
-        bbox_image,
-        cancer_type_image,
-        heatmap_error,
-        detailed_findings,
-    ) = create_gradcam_visualization(image, preprocessed, model, confidence)
-
     if confidence > 0.5:
         result = "Malignant (Cancerous)"
         probability = malignant_prob
@@ -554,35 +668,184 @@ def run_full_analysis(image: Image.Image, filename: str = None) -> Tuple[Dict[st
         "risk_icon": risk_icon,
         "risk_color": risk_color,
         "stats": stats,
-        "heatmap_error": heatmap_error,
         "image_size": {"width": image.size[0], "height": image.size[1]},
         "file_format": image.format or "N/A",
-        "findings": detailed_findings,  # NEW: Detailed findings from the image
+        "model_version": loaded.version,
     }
+    if emit:
+        emit("classification", dict(analysis))
+
+    # Images are not drawn here: AnalysisImages renders each one when it is first read
+    heatmap_array, boxes, heatmap_error, detailed_findings = compute_gradcam_findings(
+        image, preprocessed, loaded.model, confidence, heatmap=heatmap, context=context
+    )
+
+    analysis["heatmap_error"] = heatmap_error
+    analysis["findings"] = detailed_findings  # NEW: Detailed findings from the image
+    if emit:
+        emit("findings", {"findings": detailed_findings, "heatmap_error": heatmap_error})
     
     # Add view-specific analysis (CC/MLO)
     detected_regions = detailed_findings.get('regions', []) if detailed_findings else []
-    view_analysis = generate_mammogram_view_analysis(
-        image, 
-        heatmap_array, 
-        confidence, 
-        detected_regions,
-        view_type="auto",
-        filename=filename
-    )
+    with span("view_analysis"):
+        view_analysis = generate_mammogram_view_analysis(
+            image, 
+            heatmap_array, 
+            confidence, 
+            detected_regions,
+            view_type="auto",
+            filename=filename,
+            context=context,
+        )
     analysis["view_analysis"] = view_analysis
-
-    images = {
-        "original": image,
-        "overlay_image": overlay_image,
-        "heatmap_only": heatmap_only,
-        "bbox_image": bbox_image,
-        "cancer_type_image": cancer_type_image,
-    }
+    if emit:
+        emit("view_analysis", {"view_analysis": view_analysis})
+
+    images = AnalysisImages(
+        image,
+        heatmap=heatmap_array,
+        boxes=boxes,
+        regions=detailed_findings.get("regions") if detailed_findings else None,
+    )
 
     return analysis, images
 
 
+def emit_cached_analysis(analysis: Dict[str, Any], emit: Callable[[str, Dict[str, Any]], None]):
+    """Replay the run_full_analysis stages for a cached result."""
+    classification_keys = (
+        "result", "probability", "confidence", "benign_prob", "malignant_prob",
+        "risk_level", "risk_icon", "risk_color", "stats", "image_size", "file_format", "model_version",
+    )
+    emit("classification", {k: analysis.get(k) for k in classification_keys})
+    emit("findings", {"findings": analysis.get("findings"), "heatmap_error": analysis.get("heatmap_error")})
+    emit("view_analysis", {"view_analysis": analysis.get("view_analysis")})
+
+
+# ----------------- WARM-UP (startup) -----------------
+
+_warmup_state: Dict[str, Any] = {
+    "status": "pending" if WARMUP_ON_STARTUP else "skipped",
+    "started_at": None,
+    "completed_at": None,
+    "timings_ms": {},
+    "error": None,
+}
+
+
+def _make_warmup_image(size: int = 512) -> Image.Image:
+    """Synthetic grayscale image with a bright blob - enough to exercise every stage."""
+    yy, xx = np.mgrid[0:size, 0:size]
+    radius = ((xx - size * 0.3) ** 2 + (yy - size * 0.5) ** 2) / (size * 0.45) ** 2
+    img = np.where(radius < 1, 90 + 110 * (1 - radius), 0)
+    img[(xx - size * 0.35) ** 2 + (yy - size * 0.5) ** 2 < (size * 0.04) ** 2] = 235
+    return Image.fromarray(img.astype(np.uint8)).convert("RGB")
+
+
+def run_warmup() -> Dict[str, Any]:
+    """
+    Load the model and push a dummy image through prediction, Grad-CAM,
+    overlay rendering, image encoding and the PDF path, timing each stage.
+    """
+    timings = _warmup_state["timings_ms"]
+    _warmup_state.update(status="running", started_at=datetime.utcnow().isoformat(), error=None)
+
+    def timed(stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    try:
+        model = timed("model_load", get_model)
+        image = _make_warmup_image()
+        preprocessed = timed("preprocess", preprocess_image, image)
+        confidence, heatmap, _ = timed("prediction", explain_prediction, preprocessed)
+
+        (
+            heatmap_array,
+            overlay_image,
+            heatmap_only,
+            bbox_image,
+            cancer_type_image,
+            heatmap_error,
+            detailed_findings,
+        ) = timed("gradcam", create_gradcam_visualization, image, preprocessed, model, confidence, heatmap=heatmap)
+        if heatmap_error:
+            raise RuntimeError(heatmap_error)
+
+        timed("encoding", pil_to_base64, overlay_image)
+
+        stats = get_image_statistics(image)
+        timed(
+            "pdf",
+            generate_report_pdf,
+            result="Benign (Non-Cancerous)",
+            probability=(1 - confidence) * 100,
+            risk_level="Very Low Risk",
+            benign_prob=(1 - confidence) * 100,
+            malignant_prob=confidence * 100,
+            stats=stats,
+            image_size=image.size,
+            file_format="PNG",
+            original_image=image,
+            overlay_image=overlay_image,
+            heatmap_only=heatmap_only,
+            bbox_image=bbox_image,
+            cancer_type_image=cancer_type_image,
+            confidence=confidence,
+            findings=detailed_findings,
+        )
+
+        _warmup_state["status"] = "ready"
+        print(f"✅ Warm-up complete: {timings}")
+    except Exception as e:
+        _warmup_state["status"] = "failed"
+        _warmup_state["error"] = str(e)
+        print(f"⚠️ Warm-up failed: {e}")
+    finally:
+        _warmup_state["completed_at"] = datetime.utcnow().isoformat()
+        gc.collect()
+
+    return _warmup_state
+
+
+@app.on_event("startup")
+async def warmup_event():
+    """Warm up in a background thread so /health answers while the model loads."""
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=run_warmup, name="model-warmup", daemon=True).start()
+
+
+# ----------------- MODEL RELOAD -----------------
+
+def _check_model(model):
+    """Reject a model that cannot run prediction + Grad-CAM on the warm-up image."""
+    preprocessed = preprocess_image(_make_warmup_image())
+    confidence = _predict_batch(preprocessed, model)[0]
+    if not 0.0 <= confidence <= 1.0:
+        raise RuntimeError(f"Model output {confidence} is not a probability")
+    # Built outside the explainer cache: the serving model's explainer stays cached until the swap
+    last_conv_layer_index = get_last_conv_layer_index(model)
+    if last_conv_layer_index is None:
+        raise RuntimeError("Model has no convolutional layer for Grad-CAM")
+    GradCAMExplainer(model, last_conv_layer_index).explain(preprocessed)
+
+
+def reload_model(path: Optional[Path] = None) -> LoadedModel:
+    """
+    Load a model file, check it and swap it in for new requests.
+    Requests already running finish on the model they started with. If the new model
+    fails to load or to predict, the current one keeps serving and the error is raised.
+    """
+    started = time.perf_counter()
+    loaded = model_registry.reload(path, check=_check_model)
+    # Compile the new model's cached explainer before traffic does
+    explain_prediction(preprocess_image(_make_warmup_image()))
+    print(f"✅ Model {loaded.version} serving after {time.perf_counter() - started:.1f}s reload")
+    return loaded
+
+
 # ----------------- CORS (React ke liye) -----------------
 # Allow all origins for development
 ALLOWED_ORIGINS = ["*"]
@@ -608,8 +871,14 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "analyze": "/analyze (POST - upload image)",
             "report": "/report (POST - get PDF report)",
+            "report_jobs": "/report/jobs (POST - queue PDF report, then GET /report/jobs/{job_id})",
+            "inference_stats": "/inference/stats",
+            "cache_stats": "/cache/stats",
+            "metrics": "/metrics (Prometheus stage latency histograms)",
+            "model": "/admin/model (admin: serving model version), POST /admin/model/reload (hot swap)",
             "docs": "/docs (API documentation)"
         }
     }
@@ -617,42 +886,132 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Simple health check - returns ok if server is running."""
-    model_status = "not_loaded"
-    model_error = None
-    
-    # Check if model file exists
-    if MODEL_PATH.exists():
-        try:
-            _ = get_model()
-            model_status = "loaded"
-        except Exception as exc:
-            model_status = "error"
-            model_error = str(exc)
-    else:
+    """Liveness check - returns ok if the server is running. Never loads the model."""
+    if model_registry.loaded:
+        model_status = "loaded"
+        model_error = None
+    elif not MODEL_PATH.exists():
         model_status = "missing"
         model_error = f"Model file not found at {MODEL_PATH}"
+    elif _warmup_state["status"] == "failed":
+        model_status = "error"
+        model_error = _warmup_state["error"]
+    else:
+        model_status = "not_loaded"
+        model_error = None
     
     # Health check passes as long as server is running
     return {
         "status": "ok",
         "model_status": model_status,
         "model_error": model_error,
-        "model_path": str(MODEL_PATH)
+        "model_path": str(model_registry.path),
+        "model_version": model_registry.version() if model_registry.loaded else None,
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check for the load balancer.
+    Returns 200 only once the startup warm-up has finished successfully.
+    """
+    ready = _warmup_state["status"] in ("ready", "skipped")
+    body = {
+        "ready": ready,
+        "warmup": _warmup_state,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """Micro-batching and analysis executor queue metrics."""
+    return {
+        "batching_enabled": ENABLE_BATCHING,
+        "compiled_inference": COMPILED_INFERENCE,
+        "xla_jit_compile": XLA_JIT_COMPILE,
+        **inference_batcher.stats(),
+        "analysis_executor": analysis_executor.stats(),
     }
 
 
+# Sync handler: the model version may hash the model file before the first load, and the
+# duplicate store's stats wait for its lock, so this runs in the threadpool
+@app.get("/cache/stats")
+def cache_stats():
+    """Analysis result cache hit/miss/eviction counters."""
+    return {
+        "model_version": get_model_version(),
+        **analysis_cache.stats(),
+        "label_ocr": label_ocr.stats(),
+        "duplicates": duplicate_detector.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage latency histograms in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+if DATABASE_AVAILABLE:
+    def _require_admin(current_user: User = Depends(get_current_active_user)) -> User:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        return current_user
+
+    @app.get("/admin/model")
+    def model_info(_admin: User = Depends(_require_admin)):
+        """Serving model version, checksum and load/reload counters."""
+        return model_registry.stats()
+
+    @app.post("/admin/model/reload")
+    def reload_model_endpoint(path: Optional[str] = None, _admin: User = Depends(_require_admin)):
+        """
+        Hot-swap the model without a restart.
+        path: Model file inside the models directory (default: reload the current file).
+        Runs in the threadpool, so requests keep being served while the new model loads.
+        The returned version is this process's. Under serve.py the other workers are then
+        reloaded in the background on the same file ("reloaded": "all_workers"); under
+        uvicorn --workers only this worker is ("reloaded": "this_process").
+        """
+        model_path = None
+        if path:
+            models_dir = MODEL_PATH.parent.resolve()
+            model_path = (models_dir / path).resolve()
+            if model_path.parent != models_dir:
+                raise HTTPException(status_code=400, detail="Model path must be inside the models directory")
+            if not model_path.exists():
+                raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
+        previous = model_registry.version()
+        try:
+            reload_model(model_path)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Reload failed, still serving {previous}: {e}")
+        reloaded = "this_process"
+        if reload_other_workers is not None:
+            # Loaded and checked here first, so a bad file never reaches the other workers
+            reload_other_workers(model_registry.path)
+            reloaded = "all_workers"
+        return {"previous_version": previous, "reloaded": reloaded, **model_registry.stats()}
+
+
 @app.post("/clear-duplicates")
-async def clear_duplicates():
+def clear_duplicates(authorization: Optional[str] = None, x_session_id: Optional[str] = Header(None)):
     """
-    Clear the duplicate detection cache.
+    Clear the duplicate detection cache of the caller's scope (user, or X-Session-Id session).
     Call this when starting a new analysis session to reset duplicate tracking.
     """
     try:
-        duplicate_detector.clear()
+        scope = duplicate_scope(authorization, x_session_id)
+        duplicate_detector.clear(scope)
         return {
             "status": "success",
-            "message": "Duplicate detection cache cleared. Ready for new analysis session."
+            "message": "Duplicate detection cache cleared. Ready for new analysis session.",
+            "scope": scope,
         }
     except Exception as e:
         print(f"⚠️ Error clearing duplicates: {e}")
@@ -662,31 +1021,45 @@ async def clear_duplicates():
         }
 
 
-@app.post("/analyze")
-async def analyze_image(
-    file: UploadFile = File(...),
-    authorization: Optional[str] = None
-):
+def _analyze_upload(
+    data: bytes,
+    filename: str,
+    content_type: str,
+    authorization: Optional[str] = None,
+    emit: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    image_mode: str = "inline",
+    encoding: Optional[ImageEncoding] = None,
+    url_query: str = "",
+    session_id: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    React se:
-    - FormData banake
-    - field name 'file'
-    ke saath POST karo.
+    CPU-bound part of /analyze: decode, duplicate check, validation,
+    model inference, database save and image encoding.
+    Runs on the analysis executor, never on the event loop.
+
+    emit(event, payload), if given, receives each analysis stage and every
+    image as soon as it is ready (streaming /analyze).
+    image_mode "url" returns image URLs instead of base64 PNGs; nothing is rendered here.
+    encoding applies to inline images; url_query is appended to image URLs.
+    session_id (X-Session-Id) scopes the duplicate check for anonymous uploads.
     """
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Please upload an image file.")
-
-    data = await file.read()
     file_size = len(data)
     
     try:
-        image = Image.open(io.BytesIO(data)).convert("RGB")
+        with span("decode"):
+            image = Image.open(io.BytesIO(data)).convert("RGB")
     except Exception:
         raise HTTPException(status_code=400, detail="Unable to read image file.")
+    # Arrays, masks and hashes derived from the upload, computed once for all stages below
+    context = ImageContext(image, data)
     
     # ⚠️ CHECK FOR DUPLICATES: Prevent analyzing the same image twice
+    scope = duplicate_scope(authorization, session_id)
     try:
-        is_duplicate, duplicate_message = duplicate_detector.check_duplicate(data, image, file.filename)
+        with span("duplicate_check"):
+            is_duplicate, duplicate_message = duplicate_detector.check_duplicate(
+                data, image, filename, context=context, scope=scope
+            )
         if is_duplicate:
             print(f"❌ DUPLICATE IMAGE REJECTED: {duplicate_message}")
             raise HTTPException(
@@ -701,116 +1074,143 @@ async def analyze_image(
         # Fail-safe: allow image through if duplicate check fails
         print("⚠️ Duplicate check failed, proceeding anyway...")
     
-    # ⚠️ CRITICAL: Validate that the image is actually a mammogram
-    # This prevents analyzing photos of people and other non-medical images
-    try:
-        is_valid, error_message = validate_mammogram_image(image, file.content_type)
-        if not is_valid:
-            print(f"❌ REJECTED IMAGE: {error_message}")
-            raise HTTPException(
-                status_code=400, 
-                detail=error_message
-            )
-        
-        print(f"✅ Image validated as mammogram - proceeding with analysis")
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"⚠️ Validation error: {e}")
-        # If validation fails, allow the image through (fail-safe)
-        print("⚠️ Validation failed, proceeding anyway...")
+    # Same bytes analyzed before with the same model: reuse the result
+    file_hash = context.file_hash
+    model_version = get_model_version()
+    cached = analysis_cache.get(file_hash, model_version)
+
+    if cached is not None:
+        print(f"⚡ Cache hit for {filename} - skipping validation and model")
+        analysis, images = cached
+        if emit:
+            emit_cached_analysis(analysis, emit)
+    else:
+        # ⚠️ CRITICAL: Validate that the image is actually a mammogram
+        # This prevents analyzing photos of people and other non-medical images
+        try:
+            with span("validation"):
+                is_valid, error_message = validate_mammogram_image(image, content_type, context=context)
+            if not is_valid:
+                print(f"❌ REJECTED IMAGE: {error_message}")
+                raise HTTPException(
+                    status_code=400, 
+                    detail=error_message
+                )
+            
+            print(f"✅ Image validated as mammogram - proceeding with analysis")
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"⚠️ Validation error: {e}")
+            # If validation fails, allow the image through (fail-safe)
+            print("⚠️ Validation failed, proceeding anyway...")
 
+        try:
+            print(f"🔍 Starting analysis for {filename}...")
+            analysis, images = run_full_analysis(image, filename=filename, emit=emit, context=context)
+            print(f"✅ Analysis completed successfully")
+        except Exception as exc:
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {exc}")
+
+        # Keyed by the model that actually ran, in case it was swapped meanwhile
+        analysis_cache.put(file_hash, analysis.get("model_version", model_version), analysis, images)
+
+    # Only uploads that got an analysis count as earlier uploads: rejected or failed ones can be retried
     try:
-        print(f"🔍 Starting analysis for {file.filename}...")
-        analysis, images = run_full_analysis(image, filename=file.filename)
-        print(f"✅ Analysis completed successfully")
-    except Exception as exc:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {exc}")
+        duplicate_detector.remember(*duplicate_detector.fingerprint(data, image, context), filename, scope=scope)
+    except Exception as e:
+        print(f"⚠️ Could not record upload fingerprint: {e}")
 
     # Convert numpy types to Python native types for JSON serialization
     analysis = convert_numpy_types(analysis)
+
+    # URL mode needs a database row to point at
+    encoding = encoding or STORED_IMAGE_ENCODING
+    inline_images = image_mode == "inline" or not DATABASE_AVAILABLE
+    if inline_images and encoding == STORED_IMAGE_ENCODING:
+        # Encoded once: returned to the client and persisted for model-free report generation
+        images_b64 = encode_analysis_images(images, emit)
+        response_b64 = images_b64
+    elif inline_images:
+        # Display encoding differs from the stored one: store the original only, render the rest on demand
+        response_b64 = encode_analysis_images(images, emit, encoding)
+        images_b64 = {"original": upload_image_b64(data, images["original"])}
+    else:
+        # Only the original is stored now; the other images are rendered
+        # by GET /analyses/{id}/images/{name} when first requested
+        images_b64 = {"original": upload_image_b64(data, images["original"])}
+    render_state = images.render_state() if isinstance(images, AnalysisImages) else None
     
     # Save to database if available
     analysis_id = None
     if DATABASE_AVAILABLE:
         try:
-            from database import SessionLocal, Analysis, UploadHistory
-            from auth import decode_token
-            import json
+            with span("db_write"):
+                from database import SessionLocal, Analysis, UploadHistory
+                from auth import decode_token
             
-            db = SessionLocal()
-            user_id = None
+                db = SessionLocal()
+                user_id = None
             
-            # Try to get user from token if provided
-            if authorization and authorization.startswith("Bearer "):
-                token = authorization.split(" ")[1]
-                token_data = decode_token(token)
-                if token_data:
-                    user_id = token_data.user_id
+                # Try to get user from token if provided
+                if authorization and authorization.startswith("Bearer "):
+                    token = authorization.split(" ")[1]
+                    token_data = decode_token(token)
+                    if token_data:
+                        user_id = token_data.user_id
             
-            # Save upload history
-            upload_record = UploadHistory(
-                user_id=user_id,
-                filename=file.filename,
-                file_size=file_size
-            )
-            db.add(upload_record)
-            db.flush()
+                # Save upload history
+                upload_record = UploadHistory(
+                    user_id=user_id,
+                    filename=filename,
+                    file_size=file_size
+                )
+                db.add(upload_record)
+                db.flush()
             
-            # Save analysis
-            view_analysis = analysis.get("view_analysis", {})
-            stats = analysis.get("stats", {})
+                # Save analysis
+                analysis_record = Analysis(
+                    user_id=user_id,
+                    filename=filename,
+                    **analysis_record_fields(analysis, images_b64, render_state),
+                )
+                db.add(analysis_record)
+                db.flush()
             
-            analysis_record = Analysis(
-                user_id=user_id,
-                filename=file.filename,
-                file_format=analysis.get("file_format"),
-                image_width=analysis.get("image_size", {}).get("width"),
-                image_height=analysis.get("image_size", {}).get("height"),
-                result=analysis.get("result"),
-                confidence=analysis.get("confidence"),
-                benign_prob=analysis.get("benign_prob"),
-                malignant_prob=analysis.get("malignant_prob"),
-                risk_level=analysis.get("risk_level"),
-                risk_icon=analysis.get("risk_icon"),
-                risk_color=analysis.get("risk_color"),
-                view_type=view_analysis.get("view_type"),
-                laterality=view_analysis.get("laterality"),
-                mean_intensity=stats.get("mean_intensity"),
-                std_intensity=stats.get("std_intensity"),
-                min_intensity=stats.get("min_intensity"),
-                max_intensity=stats.get("max_intensity"),
-                brightness=stats.get("brightness"),
-                contrast=stats.get("contrast"),
-                findings_json=json.dumps(analysis.get("findings", {}))
-            )
-            db.add(analysis_record)
-            db.flush()
+                # Update upload history with analysis_id
+                upload_record.analysis_id = analysis_record.id
+                analysis_id = analysis_record.id
             
-            # Update upload history with analysis_id
-            upload_record.analysis_id = analysis_record.id
-            analysis_id = analysis_record.id
-            
-            db.commit()
-            db.close()
-            print(f"✅ Saved analysis {analysis_id} to database")
+                db.commit()
+                db.close()
+                print(f"✅ Saved analysis {analysis_id} to database")
         except Exception as e:
             print(f"⚠️ Failed to save to database: {e}")
     
+    if inline_images:
+        response_images = {IMAGE_NAMES[key]: response_b64[key] for key in IMAGE_NAMES}
+    elif analysis_id is None:
+        # Saving failed, so there is nothing to serve the URLs from
+        response_b64 = encode_analysis_images(images, emit, encoding)
+        response_images = {IMAGE_NAMES[key]: b64 for key, b64 in response_b64.items()}
+        inline_images = True
+    else:
+        remember_analysis_images(analysis_id, images)
+        response_images = {name: image_url(analysis_id, name, SECRET_KEY, url_query) for name in IMAGE_NAMES.values()}
+        if emit:
+            for name, url in response_images.items():
+                emit("image", {"name": name, "url": url})
+
     result = {
         **analysis,
         "analysis_id": analysis_id,
         "stats": {k: float(v) for k, v in analysis["stats"].items()},
-        "images": {
-            "original": pil_to_base64(images["original"]),
-            "overlay": pil_to_base64(images["overlay_image"]),
-            "heatmap_only": pil_to_base64(images["heatmap_only"]),
-            "bbox": pil_to_base64(images["bbox_image"]),
-            "cancer_type": pil_to_base64(images["cancer_type_image"]),
-        },
+        "images": response_images,
     }
+    if inline_images:
+        result["image_media_type"] = encoding.media_type
     
     # Free memory after processing
     gc.collect()
@@ -818,59 +1218,211 @@ async def analyze_image(
     return result
 
 
-@app.post("/report")
-async def generate_report(
+
+
+@app.post("/analyze")
+async def analyze_image(
+    response: Response,
     file: UploadFile = File(...),
-    patient_name: Optional[str] = Form(None),
-    patient_age: Optional[str] = Form(None),
-    patient_sex: Optional[str] = Form(None),
-    patient_hn: Optional[str] = Form(None),
-    department: Optional[str] = Form(None),
-    request_doctor: Optional[str] = Form(None),
-    report_by: Optional[str] = Form(None),
+    authorization: Optional[str] = None,
+    stream: Optional[str] = None,
+    images: Optional[str] = None,
+    format: Optional[str] = None,
+    quality: Optional[int] = None,
+    max_dim: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+    x_session_id: Optional[str] = Header(None),
 ):
     """
-    Generate PDF mammogram report with optional patient information.
-    
-    Parameters:
-    - file: Image file (required)
-    - patient_name: Patient's full name
-    - patient_age: Patient's age (e.g., "45 Years")
-    - patient_sex: Patient's sex
-    - patient_hn: Hospital Number or Patient ID
-    - department: Department name
-    - request_doctor: Name of requesting physician
-    - report_by: Name of reporting radiologist
+    React se:
+    - FormData banake
+    - field name 'file'
+    ke saath POST karo.
+
+    Progressive mode: ?stream=ndjson|sse (or Accept: application/x-ndjson /
+    text/event-stream) streams classification, findings and images as they are ready.
+    ?images=url|inline overrides ANALYZE_IMAGES: image URLs rendered on demand, or base64 PNGs.
+    ?format=png|webp|jpeg, ?quality= and ?max_dim= pick the image encoding
+    (applied to inline images, and carried over into image URLs).
+    X-Session-Id: duplicates are checked per user, or per session for anonymous uploads.
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Please upload an image file.")
 
+    image_mode = (images or ANALYZE_IMAGES).lower()
+    if image_mode not in ("url", "inline"):
+        raise HTTPException(status_code=400, detail="images must be 'url' or 'inline'.")
+    encoding = negotiate_encoding(DEFAULT_IMAGE_ENCODING, format, quality, max_dim)
+    url_query = urlencode({
+        name: value for name, value in (("format", format), ("quality", quality), ("max_dim", max_dim))
+        if value is not None
+    })
+
+    stream_format = negotiate_stream_format(stream, accept)
     data = await file.read()
-    file_size = len(data)
-    
-    try:
-        image = Image.open(io.BytesIO(data)).convert("RGB")
-    except Exception:
-        raise HTTPException(status_code=400, detail="Unable to read image file.")
-    
-    # ⚠️ CRITICAL: Validate that the image is actually a mammogram
-    # This prevents analyzing photos of people and other non-medical images
-    is_valid, error_message = validate_mammogram_image(image, file.content_type)
-    if not is_valid:
-        print(f"❌ REJECTED IMAGE: {error_message}")
-        raise HTTPException(
-            status_code=400, 
-            detail=error_message
+    if stream_format:
+        def produce(emit):
+            result = _analyze_upload(
+                data, file.filename, file.content_type, authorization,
+                emit=emit, image_mode=image_mode, encoding=encoding, url_query=url_query, session_id=x_session_id,
+            )
+            result.pop("images", None)  # Already sent as image events
+            return result
+
+        return await stream_analysis(analysis_executor, produce, stream_format, prepare=convert_numpy_types)
+
+    with request_timings() as timings:
+        result, queue_wait = await run_in_analysis_executor(
+            _analyze_upload, data, file.filename, file.content_type, authorization,
+            image_mode=image_mode, encoding=encoding, url_query=url_query, session_id=x_session_id,
         )
-    
-    print(f"✅ Image validated as mammogram - proceeding with report generation")
+    response.headers["X-Queue-Wait-Ms"] = f"{queue_wait * 1000:.1f}"
+    if METRICS_ENABLED:
+        response.headers["Server-Timing"] = timings.server_timing()
+    return result
+
+
+def _load_analysis_image(analysis_id: int, key: str, encoding: ImageEncoding) -> Optional[bytes]:
+    """
+    One analysis image encoded with encoding. The stored (full-resolution PNG) image is
+    returned as-is; a missing one is rendered from the heatmap and saved to the row, so it
+    renders only once. Other encodings are kept in memory per recent analysis.
+    Runs on the analysis executor.
+    """
+    from database import SessionLocal, Analysis
+    from analysis_store import IMAGE_COLUMNS, analysis_from_record
 
+    column = IMAGE_COLUMNS[key]
+    db = SessionLocal()
     try:
-        analysis, images = run_full_analysis(image, filename=file.filename)
-    except Exception as exc:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {exc}")
+        record = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+        if record is None:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        stored = getattr(record, column)
+        if stored and encoding == STORED_IMAGE_ENCODING:
+            return base64.b64decode(stored)
+
+        images = recent_analysis_images(analysis_id)
+        if images is None:
+            _, images = analysis_from_record(record)
+            remember_analysis_images(analysis_id, images)
+        rendered = images.is_rendered(key)
+        started = time.perf_counter()
+        if encoding == STORED_IMAGE_ENCODING:
+            # Kept in the row instead of in memory
+            content = images.encoded(key, encoding, keep=False)
+            if content is not None:
+                setattr(record, column, base64.b64encode(content).decode("utf-8"))
+                db.commit()
+        else:
+            content = images.encoded(key, encoding)
+        if content is not None and not rendered:
+            print(f"🖼️ Rendered {key} for analysis {analysis_id} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return content
+    finally:
+        db.close()
+
+
+@app.get("/analyses/{analysis_id}/images/{name}")
+async def get_analysis_image(
+    analysis_id: int,
+    name: str,
+    sig: Optional[str] = None,
+    format: Optional[str] = None,
+    quality: Optional[int] = None,
+    max_dim: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    One analysis image (original, overlay, heatmap_only, bbox, cancer_type), as linked from /analyze.
+    Rendered on the first request and kept; the signed URL works directly in <img src>.
+    Encoding: ?format=png|webp|jpeg, ?quality=1-100, ?max_dim=<px>, else the Accept header
+    (browsers advertise image/webp, which is served lossless), else IMAGE_FORMAT.
+    """
+    if not DATABASE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Database not available")
+    key = IMAGE_KEYS.get(name)
+    if key is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image '{name}'")
+    if not verify_image_signature(analysis_id, sig, SECRET_KEY):
+        raise HTTPException(status_code=403, detail="Invalid image signature")
+    encoding = negotiate_encoding(DEFAULT_IMAGE_ENCODING, format, quality, max_dim, accept)
+
+    content, _ = await run_in_analysis_executor(_load_analysis_image, analysis_id, key, encoding)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Image '{name}' is not available for this analysis")
+    headers = {"Cache-Control": "private, max-age=86400, immutable"}  # An analysis never changes its images
+    if format is None:
+        headers["Vary"] = "Accept"
+    return Response(
+        content=content,
+        media_type=image_media_type(content) or "application/octet-stream",
+        headers=headers,
+    )
+
+
+def _generate_report_upload(
+    data: bytes,
+    filename: str,
+    content_type: str,
+    patient_info: Dict[str, Optional[str]],
+) -> Tuple[bytes, Optional[int]]:
+    """
+    CPU-bound part of /report: decode, validation, model inference,
+    PDF generation and database save. Runs on the analysis executor
+    or a report job worker.
+
+    Returns:
+        Tuple of (pdf_bytes, report_id); report_id is None if the report was not saved
+    """
+    file_size = len(data)
+    patient_name = patient_info.get("patient_name")
+    patient_age = patient_info.get("patient_age")
+    patient_sex = patient_info.get("patient_sex")
+    patient_hn = patient_info.get("patient_hn")
+    department = patient_info.get("department")
+    request_doctor = patient_info.get("request_doctor")
+    report_by = patient_info.get("report_by")
+
+    # Usually the frontend has just called /analyze with the same file
+    file_hash = DuplicateDetector.get_file_hash(data)
+    model_version = get_model_version()
+    cached = analysis_cache.get(file_hash, model_version)
+
+    if cached is not None:
+        print(f"⚡ Cache hit for {filename} - building report from cached analysis")
+        analysis, images = cached
+        image = images["original"]
+    else:
+        try:
+            with span("decode"):
+                image = Image.open(io.BytesIO(data)).convert("RGB")
+        except Exception:
+            raise HTTPException(status_code=400, detail="Unable to read image file.")
+        context = ImageContext(image, data)
+
+        # ⚠️ CRITICAL: Validate that the image is actually a mammogram
+        # This prevents analyzing photos of people and other non-medical images
+        with span("validation"):
+            is_valid, error_message = validate_mammogram_image(image, content_type, context=context)
+        if not is_valid:
+            print(f"❌ REJECTED IMAGE: {error_message}")
+            raise HTTPException(
+                status_code=400, 
+                detail=error_message
+            )
+
+        print(f"✅ Image validated as mammogram - proceeding with report generation")
+
+        try:
+            analysis, images = run_full_analysis(image, filename=filename, context=context)
+        except Exception as exc:
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {exc}")
+
+        # Keyed by the model that actually ran, in case it was swapped meanwhile
+        analysis_cache.put(file_hash, analysis.get("model_version", model_version), analysis, images)
 
     # Generate CC/MLO view analysis based on the findings
     view_analysis = generate_view_analysis(analysis, image)
@@ -910,76 +1462,239 @@ async def generate_report(
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {exc}")
 
     # Save to database if available
+    report_id = None
     if DATABASE_AVAILABLE:
         try:
-            from database import SessionLocal, Analysis, Report, UploadHistory
-            import json
-            from datetime import datetime
+            with span("db_write"):
+                from database import SessionLocal, Analysis, Report, UploadHistory
             
-            db = SessionLocal()
+                db = SessionLocal()
             
-            # First save the analysis
-            analysis_data = convert_numpy_types(analysis)
-            stats = analysis_data.get("stats", {})
-            view_data = analysis_data.get("view_analysis", {})
+                # First save the analysis, with its images so later reports need no upload
+                analysis_data = convert_numpy_types(analysis)
+                images_b64 = encode_analysis_images(images)
+                render_state = images.render_state() if isinstance(images, AnalysisImages) else None
             
-            analysis_record = Analysis(
-                filename=file.filename,
-                file_format=analysis_data.get("file_format"),
-                image_width=analysis_data.get("image_size", {}).get("width"),
-                image_height=analysis_data.get("image_size", {}).get("height"),
-                result=analysis_data.get("result"),
-                confidence=analysis_data.get("confidence"),
-                benign_prob=analysis_data.get("benign_prob"),
-                malignant_prob=analysis_data.get("malignant_prob"),
-                risk_level=analysis_data.get("risk_level"),
-                risk_icon=analysis_data.get("risk_icon"),
-                risk_color=analysis_data.get("risk_color"),
-                view_type=view_data.get("view_type"),
-                laterality=view_data.get("laterality"),
-                mean_intensity=stats.get("mean_intensity"),
-                std_intensity=stats.get("std_intensity"),
-                min_intensity=stats.get("min_intensity"),
-                max_intensity=stats.get("max_intensity"),
-                brightness=stats.get("brightness"),
-                contrast=stats.get("contrast"),
-                findings_json=json.dumps(analysis_data.get("findings", {}))
-            )
-            db.add(analysis_record)
-            db.flush()
+                analysis_record = Analysis(
+                    filename=filename,
+                    **analysis_record_fields(analysis_data, images_b64, render_state),
+                )
+                db.add(analysis_record)
+                db.flush()
             
-            # Generate report number
-            report_number = f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}-{analysis_record.id}"
+                # Generate report number
+                report_number = f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}-{analysis_record.id}"
             
-            # Save report
-            report_record = Report(
-                analysis_id=analysis_record.id,
-                report_number=report_number,
-                department=department or "Radiology",
-                request_doctor=request_doctor or "Dr. [Name]",
-                report_by=report_by or "Dr. [Radiologist Name]",
-                pdf_data=pdf_bytes
-            )
-            db.add(report_record)
+                # Save report
+                report_record = Report(
+                    analysis_id=analysis_record.id,
+                    report_number=report_number,
+                    department=department or "Radiology",
+                    request_doctor=request_doctor or "Dr. [Name]",
+                    report_by=report_by or "Dr. [Radiologist Name]",
+                    pdf_data=pdf_bytes
+                )
+                db.add(report_record)
             
-            # Save upload history
-            upload_record = UploadHistory(
-                filename=file.filename,
-                file_size=file_size,
-                analysis_id=analysis_record.id
-            )
-            db.add(upload_record)
+                # Save upload history
+                upload_record = UploadHistory(
+                    filename=filename,
+                    file_size=file_size,
+                    analysis_id=analysis_record.id
+                )
+                db.add(upload_record)
             
-            db.commit()
-            db.close()
-            print(f"✅ Saved report {report_number} to database")
+                db.commit()
+                report_id = report_record.id
+                db.close()
+                print(f"✅ Saved report {report_number} to database")
         except Exception as e:
             print(f"⚠️ Failed to save report to database: {e}")
 
+    return pdf_bytes, report_id
+
+
+@app.post("/report")
+async def generate_report(
+    file: UploadFile = File(...),
+    patient_name: Optional[str] = Form(None),
+    patient_age: Optional[str] = Form(None),
+    patient_sex: Optional[str] = Form(None),
+    patient_hn: Optional[str] = Form(None),
+    department: Optional[str] = Form(None),
+    request_doctor: Optional[str] = Form(None),
+    report_by: Optional[str] = Form(None),
+):
+    """
+    Generate PDF mammogram report with optional patient information.
+    
+    Parameters:
+    - file: Image file (required)
+    - patient_name: Patient's full name
+    - patient_age: Patient's age (e.g., "45 Years")
+    - patient_sex: Patient's sex
+    - patient_hn: Hospital Number or Patient ID
+    - department: Department name
+    - request_doctor: Name of requesting physician
+    - report_by: Name of reporting radiologist
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Please upload an image file.")
+
+    data = await file.read()
+    patient_info = {
+        "patient_name": patient_name,
+        "patient_age": patient_age,
+        "patient_sex": patient_sex,
+        "patient_hn": patient_hn,
+        "department": department,
+        "request_doctor": request_doctor,
+        "report_by": report_by,
+    }
+    with request_timings() as timings:
+        (pdf_bytes, _), queue_wait = await run_in_analysis_executor(
+            _generate_report_upload, data, file.filename, file.content_type, patient_info
+        )
+
+    headers = {
+        "Content-Disposition": 'attachment; filename="mammogram_report.pdf"',
+        "X-Queue-Wait-Ms": f"{queue_wait * 1000:.1f}",
+    }
+    if METRICS_ENABLED:
+        headers["Server-Timing"] = timings.server_timing()
+    return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers=headers)
+
+def _run_report_job(
+    data: bytes,
+    filename: str,
+    content_type: str,
+    patient_info: Dict[str, Optional[str]],
+) -> Dict[str, Any]:
+    """
+    Report job body: same pipeline as /report, the PDF is served from the Report table.
+    Runs on the analysis executor, so jobs share ANALYSIS_CONCURRENCY with /analyze and /report.
+    """
+    while True:
+        try:
+            future = analysis_executor.submit(_generate_report_upload, data, filename, content_type, patient_info)
+            break
+        except QueueFullError:
+            # Requests get a 503 when the executor is full; a background job waits for room instead
+            time.sleep(0.5)
+    (_, report_id), _ = future.result()
+    if report_id is None:
+        raise RuntimeError("Report was generated but could not be saved to the database")
+    return {"report_id": report_id}
+
+
+def _report_job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    def iso(ts):
+        return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+    result = job.get("result") or {}
+    report_id = result.get("report_id")
+    body = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "created_at": iso(job["created_at"]),
+        "started_at": iso(job["started_at"]),
+        "finished_at": iso(job["finished_at"]),
+        "error": job["error"],
+        "report_id": report_id,
+        "pdf_url": f"/report/jobs/{job['job_id']}/pdf" if job["status"] == "done" else None,
+    }
+    if "queue_position" in job:
+        body["queue_position"] = job["queue_position"]
+    return body
+
+
+@app.post("/report/jobs", status_code=202)
+async def create_report_job(
+    file: UploadFile = File(...),
+    patient_name: Optional[str] = Form(None),
+    patient_age: Optional[str] = Form(None),
+    patient_sex: Optional[str] = Form(None),
+    patient_hn: Optional[str] = Form(None),
+    department: Optional[str] = Form(None),
+    request_doctor: Optional[str] = Form(None),
+    report_by: Optional[str] = Form(None),
+):
+    """
+    Queue PDF report generation and return a job id immediately.
+    Same parameters as /report. Poll GET /report/jobs/{job_id}; when the status is
+    "done", download the PDF from pdf_url.
+    """
+    if not DATABASE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Report jobs need the database, which is not available.")
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Please upload an image file.")
+
+    data = await file.read()
+    patient_info = {
+        "patient_name": patient_name,
+        "patient_age": patient_age,
+        "patient_sex": patient_sex,
+        "patient_hn": patient_hn,
+        "department": department,
+        "request_doctor": request_doctor,
+        "report_by": report_by,
+    }
+    try:
+        # submit() writes the queued status to the database: keep that off the event loop
+        job = await run_in_threadpool(
+            report_jobs.submit, _run_report_job, data, file.filename, file.content_type, patient_info
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many reports are being generated. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    print(f"📝 Queued report job {job['job_id']} for {file.filename}")
+    return _report_job_response(job)
+
+
+# Sync handlers: job lookups and cleanup query the database, so they run in the threadpool
+@app.get("/report/jobs/stats")
+def report_job_stats():
+    """Report job queue depth and outcome counters."""
+    return report_jobs.stats()
+
+
+@app.get("/report/jobs/{job_id}")
+def get_report_job(job_id: str):
+    """Status of a report job: queued, running, done or failed."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found or expired")
+    return _report_job_response(job)
+
+
+@app.get("/report/jobs/{job_id}/pdf")
+def get_report_job_pdf(job_id: str):
+    """Download the PDF of a finished report job from the Report table."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found or expired")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Report job is {job['status']}")
+
+    from database import SessionLocal, Report
+
+    db = SessionLocal()
+    try:
+        report = db.query(Report).filter(Report.id == job["result"]["report_id"]).first()
+        if report is None or not report.pdf_data:
+            raise HTTPException(status_code=404, detail="Report not found")
+        pdf_bytes = report.pdf_data
+        report_number = report.report_number
+    finally:
+        db.close()
+
     return StreamingResponse(
         io.BytesIO(pdf_bytes),
         media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="mammogram_report.pdf"'},
+        headers={"Content-Disposition": f'attachment; filename="report_{report_number}.pdf"'},
     )
 
 # Run command:
@@ -2,13 +2,31 @@
 Mammogram Image Validator - STRICT VERSION
 Validates that uploaded images are actually mammograms before analysis
 Rejects photos, screenshots, and other non-medical images
+
+Checks run from cheapest to most expensive and stop at the first rejection:
+image metadata, then color statistics from one channel-spread array, then every
+intensity statistic from one histogram. Pixel checks read a bounded pyramid level.
 """
 
+import time
 import numpy as np
 from PIL import Image
-from typing import Tuple
+from typing import Dict, NamedTuple, Optional, Tuple
 import io
 
+from image_context import ImageContext
+from intensity_histogram import IntensityHistogram
+from stage_timing import record
+
+
+class ValidationResult(NamedTuple):
+    """Outcome of MammogramValidator.check"""
+    
+    is_valid: bool
+    message: str  # Rejection reason, "" if valid
+    check: str  # Check that rejected the image, "" if valid
+    timings: Dict[str, float]  # Seconds per check that ran, in order
+
 
 class MammogramValidator:
     """Validates if an image is a mammogram - STRICT validation for medical images only"""
@@ -22,27 +40,76 @@ class MammogramValidator:
     # Color characteristics - STRICT: Mammograms must be grayscale
     MAX_COLOR_VARIANCE = 30  # Strict - reject colorful images
     
-    # Edge detection threshold - Moderate
-    MAX_EDGE_DENSITY = 0.7  # Reject images with too many sharp edges
+    # Pixel checks (color, brightness, histogram) only use image-wide means and
+    # fractions, so they run on the request's pyramid level with this longest side
+    ANALYSIS_MAX_DIM = 1024
     
     def __init__(self):
         pass
     
-    def validate(self, image: Image.Image) -> Tuple[bool, str]:
+    def validate(self, image: Image.Image, context: Optional[ImageContext] = None) -> Tuple[bool, str]:
         """
         Validate if image is a mammogram - STRICT validation
         
         Args:
             image: PIL Image object
+            context: ImageContext of image, shared with the other analysis stages
             
         Returns:
             Tuple of (is_valid, error_message)
             If valid: (True, "")
             If invalid: (False, "reason for rejection")
         """
+        result = self.check(image, context)
+        for name, seconds in result.timings.items():
+            record(f"validation.{name}", seconds)
+        return result.is_valid, result.message
+    
+    def check(self, image: Image.Image, context: Optional[ImageContext] = None) -> ValidationResult:
+        """validate, also reporting which check rejected the image and how long each check took"""
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        
+        def lap(name: str):
+            nonlocal started
+            now = time.perf_counter()
+            timings[name] = now - started
+            started = now
+        
+        message = self._check_metadata(image)
+        lap("metadata")
+        if message:
+            return ValidationResult(False, message, "metadata", timings)
+        
+        ctx = ImageContext.of(image, context).level(self.ANALYSIS_MAX_DIM)
+        lap("thumbnail")  # Free when the request's pyramid already has this level
+        # If image has color channels, check if it's actually grayscale
+        has_color = image.mode != 'L'
+        if has_color:
+            message = self._check_color(ctx.rgb)
+            lap("color")
+            if message:
+                return ValidationResult(False, message, "color", timings)
+        
+        # The channel mean is kept as the integer channel sum (gray_scale x the mean), so
+        # thresholds below are scaled instead of building a float grayscale copy
+        if has_color:
+            histogram, gray_scale = ctx.channel_sum_histogram, 3
+        else:
+            histogram, gray_scale = ctx.gray_histogram, 1
+        message = self._check_intensity(histogram, gray_scale)
+        lap("intensity")
+        if message:
+            return ValidationResult(False, message, "intensity", timings)
+        
+        # All checks passed
+        return ValidationResult(True, "", "", timings)
+    
+    def _check_metadata(self, image: Image.Image) -> Optional[str]:
+        """Mode, size and aspect ratio: no pixels read"""
         # Check 0: Reject images with transparency (PNG with alpha channel)
         if image.mode in ('RGBA', 'LA', 'PA'):
-            return False, (
+            return (
                 "❌ This image has transparency (PNG with alpha channel). "
                 "Mammograms are medical X-ray images without transparency. "
                 "This appears to be a graphic, logo, or photo cutout. "
@@ -53,7 +120,7 @@ class MammogramValidator:
         width, height = image.size
         
         if width < self.MIN_WIDTH or height < self.MIN_HEIGHT:
-            return False, (
+            return (
                 f"❌ Image resolution too low ({width}x{height}). "
                 f"Mammograms require minimum {self.MIN_WIDTH}x{self.MIN_HEIGHT} pixels. "
                 "Please upload a higher resolution mammogram image."
@@ -63,83 +130,84 @@ class MammogramValidator:
         aspect_ratio = width / height if height > 0 else 0
         
         if aspect_ratio > self.MAX_ASPECT_RATIO or aspect_ratio < self.MIN_ASPECT_RATIO:
-            return False, (
+            return (
                 f"❌ Invalid image aspect ratio ({aspect_ratio:.2f}). "
                 "This does not match mammogram dimensions. "
                 "Please upload a proper mammogram image, not a regular photo."
             )
+        return None
+    
+    def _check_color(self, rgb: np.ndarray) -> Optional[str]:
+        """Check 3: Color characteristics - VERY STRICT (mammograms must be pure grayscale)"""
+        r_channel = rgb[:, :, 0]
+        g_channel = rgb[:, :, 1]
+        b_channel = rgb[:, :, 2]
         
-        # Check 3: Color characteristics - VERY STRICT (mammograms must be pure grayscale)
-        img_array = np.array(image)
+        # Per pixel |r-g| + |r-b| + |g-b| = 2 (max - min), so the mean channel difference
+        # and the saturation both come from the channel spread (uint8, no overflow)
+        spread = np.maximum(np.maximum(r_channel, g_channel), b_channel)
+        spread -= np.minimum(np.minimum(r_channel, g_channel), b_channel)
+        spread_sum = int(spread.sum(dtype=np.int64))
+        pixels = spread.size
         
-        # If image has 3 channels, check if it's actually grayscale
-        if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-            # Calculate variance between RGB channels
-            r_channel = img_array[:, :, 0]
-            g_channel = img_array[:, :, 1]
-            b_channel = img_array[:, :, 2]
-            
-            # Calculate differences between channels
-            rg_diff = np.abs(r_channel.astype(float) - g_channel.astype(float)).mean()
-            rb_diff = np.abs(r_channel.astype(float) - b_channel.astype(float)).mean()
-            gb_diff = np.abs(g_channel.astype(float) - b_channel.astype(float)).mean()
-            
-            avg_color_diff = (rg_diff + rb_diff + gb_diff) / 3
-            
-            if avg_color_diff > self.MAX_COLOR_VARIANCE:
-                return False, (
-                    "❌ This is a COLOR PHOTOGRAPH, not a mammogram! "
-                    "Mammograms are pure grayscale X-ray medical images. "
-                    "Please upload an actual mammogram image from a medical imaging device, "
-                    "not a photo of a person or object."
-                )
-            
-            # Check for colorful images (like flowers, objects)
-            # Calculate color saturation
-            max_channel = np.maximum(np.maximum(r_channel, g_channel), b_channel)
-            min_channel = np.minimum(np.minimum(r_channel, g_channel), b_channel)
-            saturation = (max_channel - min_channel).astype(float)
-            avg_saturation = saturation.mean()
-            
-            if avg_saturation > 25:  # Strict - reject colorful images like chairs, flowers
-                return False, (
-                    "❌ This is a COLORFUL IMAGE (not a mammogram)! "
-                    "Mammograms are grayscale medical X-ray images with no color. "
-                    "Please upload only medical mammogram images."
-                )
-            
-            # Additional check: Look for skin tones (common in photos of people)
-            # Skin tones typically have R > G > B with specific ranges
-            skin_tone_pixels = np.sum((r_channel > g_channel) & (g_channel > b_channel) & 
-                                     (r_channel > 100) & (r_channel < 255))
-            skin_tone_percentage = (skin_tone_pixels / (width * height)) * 100
-            
-            if skin_tone_percentage > 15:  # Strict - reject photos of people
-                return False, (
-                    "❌ This appears to be a PHOTOGRAPH of a person, not a mammogram! "
-                    "Detected skin tones in the image. "
-                    "Please upload a medical mammogram X-ray image only."
-                )
+        # Mean channel difference (2/3 of the mean spread) > MAX_COLOR_VARIANCE, in integers
+        if 2 * spread_sum > 3 * self.MAX_COLOR_VARIANCE * pixels:
+            return (
+                "❌ This is a COLOR PHOTOGRAPH, not a mammogram! "
+                "Mammograms are pure grayscale X-ray medical images. "
+                "Please upload an actual mammogram image from a medical imaging device, "
+                "not a photo of a person or object."
+            )
         
-        # Check 4: Brightness distribution (mammograms have specific intensity patterns)
-        if len(img_array.shape) == 3:
-            gray = np.mean(img_array, axis=2)
-        else:
-            gray = img_array
+        # Check for colorful images (like flowers, objects): mean saturation (spread)
+        if spread_sum > 25 * pixels:  # Strict - reject colorful images like chairs, flowers
+            return (
+                "❌ This is a COLORFUL IMAGE (not a mammogram)! "
+                "Mammograms are grayscale medical X-ray images with no color. "
+                "Please upload only medical mammogram images."
+            )
         
+        # Additional check: Look for skin tones (common in photos of people)
+        # Skin tones typically have R > G > B with specific ranges. Such pixels have a
+        # spread of at least 2, so more than 15% of them need a spread sum above 0.3 per
+        # pixel: grayscale images (spread 0) skip the mask
+        if spread_sum <= 0.3 * pixels:
+            return None
+        skin_tone_pixels = np.count_nonzero((r_channel > g_channel) & (g_channel > b_channel) &
+                                            (r_channel > 100) & (r_channel < 255))
+        skin_tone_percentage = (skin_tone_pixels / pixels) * 100
+        
+        if skin_tone_percentage > 15:  # Strict - reject photos of people
+            return (
+                "❌ This appears to be a PHOTOGRAPH of a person, not a mammogram! "
+                "Detected skin tones in the image. "
+                "Please upload a medical mammogram X-ray image only."
+            )
+        return None
+    
+    def _check_intensity(self, histogram: IntensityHistogram, gray_scale: int) -> Optional[str]:
+        """
+        Checks 4-8 on one histogram of gray_scale x the channel mean
+
+        Edge density used to be measured here with np.gradient, but it never rejected
+        an image (only logged), so it is no longer computed.
+        """
+        pixels = histogram.count
+        
+        # Check 4: Brightness distribution (mammograms have specific intensity patterns)
         # Check if image is mostly black or mostly white (likely not a mammogram)
-        mean_intensity = gray.mean()
-        std_intensity = gray.std()
+        mean_intensity = histogram.mean / gray_scale
+        std_intensity = histogram.std / gray_scale
         
         if mean_intensity < 3:  # Very permissive
-            return False, (
+            return (
                 "❌ Image is too dark to be a mammogram. "
                 "This looks like a regular photo or screenshot. "
                 "Please upload a proper mammogram X-ray image with visible tissue."
             )
         
         if mean_intensity > 252:  # Very permissive
-            return False, (
+            return (
                 "❌ Image is too bright to be a mammogram. "
                 "This looks like a regular photo or screenshot. "
                 "Please upload a proper mammogram X-ray image with visible tissue."
@@ -148,37 +216,19 @@ class MammogramValidator:
         # Check 5: Contrast and texture (photos have different characteristics)
         # Mammograms typically have moderate contrast
         if std_intensity < 2:  # Extremely permissive
-            return False, (
+            return (
                 "❌ Image has too little contrast to be a mammogram. "
                 "This appears to be a uniform image or screenshot. "
                 "Please upload a medical mammogram image."
             )
         
-        # Check 6: Edge density (photos have more defined edges than mammograms)
-        # Simple edge detection using gradient
-        if len(img_array.shape) == 3:
-            gray_for_edges = gray
-        else:
-            gray_for_edges = img_array
-            
-        # Calculate gradients
-        gy, gx = np.gradient(gray_for_edges.astype(float))
-        edge_magnitude = np.sqrt(gx**2 + gy**2)
-        strong_edges = edge_magnitude > 30
-        edge_density = strong_edges.sum() / gray_for_edges.size
-        
-        if edge_density > self.MAX_EDGE_DENSITY:
-            print(f"⚠️ Edge density check: {edge_density:.3f} > {self.MAX_EDGE_DENSITY} - but allowing anyway")
-            # Don't reject - just log
-            pass
-        
         # Check 7: Tissue presence (mammograms should have significant non-background area)
         # Background is typically very dark (< 20) or very bright (> 235)
-        tissue_mask = (gray > 20) & (gray < 235)
-        tissue_percentage = (tissue_mask.sum() / gray.size) * 100
+        tissue_pixels = pixels - histogram.count_below(20 * gray_scale + 1) - histogram.count_above(235 * gray_scale - 1)
+        tissue_percentage = (tissue_pixels / pixels) * 100
         
         if tissue_percentage < 0.1:  # Extremely permissive
-            return False, (
+            return (
                 "❌ Image does not contain sufficient tissue area. "
                 "This does not appear to be a mammogram. "
                 "Mammograms must show breast tissue. "
@@ -186,20 +236,16 @@ class MammogramValidator:
             )
         
         # Check 8: Histogram analysis (mammograms have specific intensity distributions)
-        hist, _ = np.histogram(gray.flatten(), bins=256, range=(0, 256))
-        hist = hist / hist.sum()  # Normalize
-        
-        # Mammograms typically have most pixels in mid-range, not at extremes
-        extreme_pixels = hist[0:10].sum() + hist[246:256].sum()
+        # Mammograms typically have most pixels in mid-range, not at extremes:
+        # fraction of pixels in histogram bins 0-9 and 246-255
+        extreme_pixels = (histogram.count_below(10 * gray_scale) + histogram.count_above(246 * gray_scale - 1)) / pixels
         if extreme_pixels > 0.95:  # Very permissive - only reject completely extreme images
-            return False, (
+            return (
                 "❌ Invalid intensity distribution for a mammogram. "
                 "This appears to be a regular photo or graphic. "
                 "Please upload a medical mammogram X-ray image."
             )
-        
-        # All checks passed
-        return True, ""
+        return None
     
     def validate_file_type(self, content_type: str) -> Tuple[bool, str]:
         """
@@ -238,13 +284,16 @@ class MammogramValidator:
 validator = MammogramValidator()
 
 
-def validate_mammogram_image(image: Image.Image, content_type: str = None) -> Tuple[bool, str]:
+def validate_mammogram_image(
+    image: Image.Image, content_type: str = None, context: Optional[ImageContext] = None
+) -> Tuple[bool, str]:
     """
     Convenience function to validate mammogram image
     
     Args:
         image: PIL Image object
         content_type: Optional MIME type
+        context: ImageContext of image, shared with the other analysis stages
         
     Returns:
         Tuple of (is_valid, error_message)
@@ -257,7 +306,7 @@ def validate_mammogram_image(image: Image.Image, content_type: str = None) -> Tu
                 return is_valid, error
         
         # Validate image characteristics
-        return validator.validate(image)
+        return validator.validate(image, context)
     except Exception as e:
         # If validation fails for any reason, log it and allow the image
         print(f"⚠️ Validation exception: {e}")
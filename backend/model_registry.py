@@ -0,0 +1,175 @@
+"""
+Model registry
+Loads the model once, behind a lock, and knows which version is serving. The version
+is a content hash of the model file, so it can key cached analyses and be stored with
+each Analysis row.
+
+reload() loads and checks a new model off to the side, then swaps it in with a
+single reference assignment. Requests take one LoadedModel at the start of their
+inference and keep using it, so requests in flight during a swap finish on the old
+model and are not dropped.
+"""
+
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+class LoadedModel(NamedTuple):
+    """A model together with the version it was loaded as"""
+
+    model: Any
+    version: str
+    checksum: Optional[str]  # SHA-256 of the model file, None for models installed from memory
+    path: Optional[str]
+    loaded_at: float  # time.time()
+    load_seconds: float
+
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def version_name(path: Path, checksum: str) -> str:
+    """'breast_cancer_model-1a2b3c4d5e6f'"""
+    return f"{path.stem}-{checksum[:12]}"
+
+
+class ModelRegistry:
+    """The serving model, loaded lazily and replaceable at runtime. Thread-safe."""
+
+    def __init__(self, path: Path, loader: Callable[[Path], Any]):
+        """
+        Args:
+            path: Model file loaded on first use
+            loader: Callable loading a model from a path (raises if it cannot)
+        """
+        self.path = Path(path)
+        self.loader = loader
+        self._current: Optional[LoadedModel] = None
+        # One load at a time: concurrent first requests wait for a single load_model
+        self._load_lock = threading.Lock()
+        self._file_version: Optional[Tuple[Tuple[str, int, int], str]] = None
+
+        # Metrics
+        self._loads = 0
+        self._reloads = 0
+        self._failed_reloads = 0
+        self._last_error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    def current(self) -> LoadedModel:
+        """The serving model, loading it on first use"""
+        loaded = self._current
+        if loaded is not None:
+            return loaded
+        with self._load_lock:
+            if self._current is None:
+                self._current = self._load(self.path)
+            return self._current
+
+    def get(self) -> Any:
+        return self.current().model
+
+    def version(self) -> str:
+        """
+        Version of the serving model. Before the first load, the version of the file
+        that will be loaded (without loading it), or 'unknown' if there is no file.
+        """
+        loaded = self._current
+        if loaded is not None:
+            return loaded.version
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return "unknown"
+        key = (str(self.path), stat.st_mtime_ns, stat.st_size)
+        cached = self._file_version
+        if cached is None or cached[0] != key:
+            cached = self._file_version = (key, version_name(self.path, file_checksum(self.path)))
+        return cached[1]
+
+    def reload(self, path: Optional[Path] = None, check: Optional[Callable[[Any], None]] = None) -> LoadedModel:
+        """
+        Load a model and make it the serving one
+
+        The serving model keeps answering while the new one loads. If loading or
+        check raises, the exception propagates and nothing is swapped.
+
+        Args:
+            path: Model file (default: the current path)
+            check: Called with the new model before the swap, e.g. to run a test prediction
+        """
+        path = Path(path) if path is not None else self.path
+        with self._load_lock:
+            try:
+                loaded = self._load(path)
+                if check is not None:
+                    check(loaded.model)
+            except Exception as e:
+                self._failed_reloads += 1
+                self._last_error = f"{path}: {e}"
+                raise
+            self._current = loaded
+            self.path = path
+            self._reloads += 1
+            self._last_error = None
+        return loaded
+
+    def install(self, model: Any, version: Optional[str] = None) -> LoadedModel:
+        """Serve a model built in memory (random weights for benchmarks, a custom factory)"""
+        loaded = LoadedModel(
+            model=model,
+            version=version or f"{getattr(model, 'name', 'model')}-{id(model):x}",
+            checksum=None,
+            path=None,
+            loaded_at=time.time(),
+            load_seconds=0.0,
+        )
+        with self._load_lock:
+            self._current = loaded
+        return loaded
+
+    def _load(self, path: Path) -> LoadedModel:
+        if not path.exists():
+            raise RuntimeError(
+                f"Model file not found at {path}. "
+                "Please ensure the model file is placed in the backend/models/ directory."
+            )
+        started = time.perf_counter()
+        checksum = file_checksum(path)
+        model = self.loader(path)
+        self._loads += 1
+        return LoadedModel(
+            model=model,
+            version=version_name(path, checksum),
+            checksum=checksum,
+            path=str(path),
+            loaded_at=time.time(),
+            load_seconds=round(time.perf_counter() - started, 3),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        loaded = self._current
+        return {
+            "loaded": loaded is not None,
+            "version": self.version(),
+            "checksum": loaded.checksum if loaded else None,
+            "path": loaded.path if loaded else str(self.path),
+            "loaded_at": loaded.loaded_at if loaded else None,
+            "load_seconds": loaded.load_seconds if loaded else None,
+            "loads": self._loads,
+            "reloads": self._reloads,
+            "failed_reloads": self._failed_reloads,
+            "last_error": self._last_error,
+        }
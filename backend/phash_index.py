@@ -0,0 +1,110 @@
+"""
+Near-duplicate index for 64-bit perceptual hashes
+Multi-index hashing: each hash is split into bands of 16 bits, and every band value
+points at the hashes that contain it. Two hashes within Hamming distance d < bands
+share at least one band exactly (pigeonhole), so a lookup only compares the hashes
+in the query's buckets instead of every stored hash.
+"""
+
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+HASH_BITS = 64
+HASH_LIMIT = 1 << HASH_BITS
+
+
+def _check_hash(h: int):
+    """Hashes are unsigned: a negative or wider int would index wrong bands and give wrong distances"""
+    if not 0 <= h < HASH_LIMIT:
+        raise ValueError(f"hash must be an unsigned {HASH_BITS}-bit integer, got {h}")
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two integer hashes"""
+    return (a ^ b).bit_count()
+
+
+class HammingIndex(Generic[V]):
+    """Maps 64-bit hashes to values and finds the nearest one within a small distance"""
+
+    def __init__(self, bands: int = 4):
+        """
+        Args:
+            bands: Number of equal bands the 64 bits are split into. Searches are exact
+                for distances below this; 4 x 16-bit bands cover the duplicate threshold of 3.
+        """
+        if HASH_BITS % bands:
+            raise ValueError(f"bands must divide {HASH_BITS}, got {bands}")
+        self.bands = bands
+        self.band_bits = HASH_BITS // bands
+        self._band_mask = (1 << self.band_bits) - 1
+        self._values: Dict[int, V] = {}
+        # _buckets[band][band value] -> hashes with that value in that band
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, h: int) -> bool:
+        return h in self._values
+
+    def __iter__(self) -> Iterator[Tuple[int, V]]:
+        return iter(self._values.items())
+
+    def _band_keys(self, h: int) -> Iterator[Tuple[Dict[int, List[int]], int]]:
+        for band, buckets in enumerate(self._buckets):
+            yield buckets, (h >> (band * self.band_bits)) & self._band_mask
+
+    def get(self, h: int) -> Optional[V]:
+        return self._values.get(h)
+
+    def add(self, h: int, value: V):
+        """Store a hash; storing a known hash again replaces its value"""
+        if h not in self._values:
+            _check_hash(h)
+            for buckets, key in self._band_keys(h):
+                buckets.setdefault(key, []).append(h)
+        self._values[h] = value
+
+    def remove(self, h: int) -> Optional[V]:
+        """Forget a hash, returning its value (None if it was not stored)"""
+        if h not in self._values:
+            return None
+        value = self._values.pop(h)
+        for buckets, key in self._band_keys(h):
+            bucket = buckets[key]
+            bucket.remove(h)
+            if not bucket:
+                del buckets[key]
+        return value
+
+    def nearest(self, h: int, max_distance: int) -> Optional[Tuple[V, int]]:
+        """
+        Closest stored hash within max_distance
+
+        Returns:
+            Tuple of (value, distance), or None if nothing is that close
+        """
+        if max_distance >= self.bands:
+            raise ValueError(f"max_distance must be below the band count ({self.bands}) to be exact")
+        _check_hash(h)
+        if h in self._values:
+            return self._values[h], 0
+
+        best: Optional[int] = None
+        best_distance = max_distance + 1
+        for buckets, key in self._band_keys(h):
+            # A hash sharing several bands is checked more than once; cheaper than deduplicating
+            for candidate in buckets.get(key, ()):
+                distance = (h ^ candidate).bit_count()
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        if best is None:
+            return None
+        return self._values[best], best_distance
+
+    def clear(self):
+        self._values.clear()
+        for buckets in self._buckets:
+            buckets.clear()
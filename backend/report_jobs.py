@@ -0,0 +1,310 @@
+"""
+In-process background job queue for PDF report generation
+POST returns a job id immediately; worker threads render the report and save it
+to the Report table, and clients poll the job status. No external broker needed.
+
+Jobs run in the process that accepted them. With a DatabaseJobStore every status
+change is also written to the report_jobs table, so under several workers (serve.py
+--workers, uvicorn --workers) a poll or PDF download that lands on another worker
+still finds the job. A job whose worker died never finishes: once it is older than
+stale_seconds, polls report it as failed and the stored row is marked failed.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from analysis_executor import QueueFullError
+
+LOST_JOB_ERROR = "Report job was lost: the worker running it stopped before it finished. Please submit it again."
+
+
+def _to_datetime(ts: Optional[float]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(ts) if ts else None
+
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+class DatabaseJobStore:
+    """Job snapshots in the report_jobs table, shared by every worker"""
+
+    def __init__(self, session_factory: Callable[[], Any]):
+        """
+        Args:
+            session_factory: SQLAlchemy sessionmaker (database.SessionLocal)
+        """
+        self.session_factory = session_factory
+
+    def save(self, job: Dict[str, Any]):
+        from database import ReportJob
+
+        db = self.session_factory()
+        try:
+            db.merge(ReportJob(
+                job_id=job["job_id"],
+                status=job["status"],
+                report_id=(job["result"] or {}).get("report_id"),
+                error=job["error"],
+                created_at=_to_datetime(job["created_at"]),
+                started_at=_to_datetime(job["started_at"]),
+                finished_at=_to_datetime(job["finished_at"]),
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        from database import ReportJob
+
+        db = self.session_factory()
+        try:
+            row = db.get(ReportJob, job_id)
+            if row is None:
+                return None
+            return {
+                "job_id": row.job_id,
+                "status": row.status,
+                "created_at": _to_timestamp(row.created_at),
+                "started_at": _to_timestamp(row.started_at),
+                "finished_at": _to_timestamp(row.finished_at),
+                "result": {"report_id": row.report_id} if row.report_id is not None else None,
+                "error": row.error,
+            }
+        finally:
+            db.close()
+
+    def fail_unfinished_before(self, cutoff: float, error: str) -> int:
+        """Mark queued/running jobs created before cutoff as failed"""
+        from database import ReportJob
+
+        db = self.session_factory()
+        try:
+            failed = db.query(ReportJob).filter(
+                ReportJob.finished_at.is_(None),
+                ReportJob.created_at < _to_datetime(cutoff),
+            ).update({"status": "failed", "error": error, "finished_at": datetime.utcnow()})
+            db.commit()
+            return failed
+        finally:
+            db.close()
+
+    def delete_finished_before(self, cutoff: float) -> int:
+        from database import ReportJob
+
+        db = self.session_factory()
+        try:
+            deleted = db.query(ReportJob).filter(ReportJob.finished_at < _to_datetime(cutoff)).delete()
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+class ReportJobQueue:
+    """Bounded job queue with worker threads and TTL cleanup of finished jobs"""
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_queue: int = 16,
+        ttl_seconds: float = 3600,
+        retry_after: int = 5,
+        store: Optional[DatabaseJobStore] = None,
+        stale_seconds: float = 900,
+    ):
+        """
+        Args:
+            workers: Worker threads rendering reports
+            max_queue: Jobs allowed to wait before new submissions are rejected
+            ttl_seconds: How long finished jobs stay queryable
+            retry_after: Seconds suggested to rejected clients (Retry-After header)
+            store: Where jobs are also written for other workers (None = this process only)
+            stale_seconds: Age after which an unfinished stored job counts as lost with its worker
+        """
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.ttl_seconds = float(ttl_seconds)
+        self.retry_after = int(retry_after)
+        self.store = store
+        self.stale_seconds = float(stale_seconds)
+        self._last_store_cleanup = 0.0
+
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=self.max_queue)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._expired = 0
+
+    def _ensure_workers(self):
+        """Started lazily so a pre-fork parent never owns worker threads (caller holds the lock)"""
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"report-job-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Dict[str, Any]:
+        """
+        Queue fn(*args, **kwargs) as a job
+
+        Returns:
+            Snapshot of the new job
+
+        Raises:
+            QueueFullError: If max_queue jobs are already waiting
+        """
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._ensure_workers()
+            self._jobs[job_id] = job
+            self._tasks[job_id] = lambda: fn(*args, **kwargs)
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                del self._jobs[job_id]
+                del self._tasks[job_id]
+                self._rejected += 1
+                raise QueueFullError(self.retry_after)
+            self._submitted += 1
+            snapshot = dict(job)
+            # Saved under the lock: a worker cannot mark the job running (and save that) first
+            self._save(snapshot)
+        return snapshot
+
+    def _save(self, job: Dict[str, Any]):
+        """Write a job snapshot to the store; a failed write only costs other workers' visibility"""
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except Exception as e:
+            print(f"⚠️ Could not save report job {job['job_id']}: {e}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job, or None if unknown or expired"""
+        self.cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._load(job_id)
+            snapshot = dict(job)
+            if job["status"] == "queued":
+                # Position among waiting jobs (0 = next to run)
+                waiting = [j for j in self._jobs.values() if j["status"] == "queued"]
+                snapshot["queue_position"] = sorted(waiting, key=lambda j: j["created_at"]).index(job)
+            return snapshot
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job submitted to another worker, from the store"""
+        if self.store is None:
+            return None
+        try:
+            job = self.store.load(job_id)
+        except Exception as e:
+            print(f"⚠️ Could not load report job {job_id}: {e}")
+            return None
+        now = time.time()
+        if job is None or (job["finished_at"] is not None and job["finished_at"] < now - self.ttl_seconds):
+            return None
+        if job["finished_at"] is None and job["created_at"] < now - self.stale_seconds:
+            # The worker that accepted it died (or is far behind); the row is marked on the next purge
+            job.update(status="failed", error=LOST_JOB_ERROR, finished_at=now)
+        return job
+
+    def cleanup(self):
+        """Forget finished jobs older than the TTL, and fail stored jobs older than stale_seconds"""
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            self._expired += len(expired)
+            # Stored rows are purged at most once a minute (or once per TTL, if shorter)
+            purge_store = self.store is not None and now - self._last_store_cleanup >= min(self.ttl_seconds, 60)
+            if purge_store:
+                self._last_store_cleanup = now
+        if purge_store:
+            try:
+                self.store.fail_unfinished_before(now - self.stale_seconds, LOST_JOB_ERROR)
+                self.store.delete_finished_before(cutoff)
+            except Exception as e:
+                print(f"⚠️ Could not purge expired report jobs: {e}")
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                task = self._tasks.pop(job_id, None)
+                if job is None or task is None:
+                    continue
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                snapshot = dict(job)
+            self._save(snapshot)
+
+            try:
+                result = task()
+                status, error = "done", None
+            except Exception as e:
+                result = None
+                status = "failed"
+                # HTTPException carries the user-facing message in .detail
+                error = str(getattr(e, "detail", None) or e)
+                print(f"⚠️ Report job {job_id} failed: {error}")
+
+            with self._lock:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error
+                job["finished_at"] = time.time()
+                if status == "done":
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                snapshot = dict(job)
+            self._save(snapshot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "ttl_seconds": self.ttl_seconds,
+                "queue_depth": self._queue.qsize(),
+                "jobs_by_status": counts,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "expired": self._expired,
+            }
@@ -87,6 +87,7 @@ class AnalysisResponse(BaseModel):
     risk_level: str
     view_type: Optional[str]
     laterality: Optional[str]
+    model_version: Optional[str] = None
     analyzed_at: datetime
 
     class Config:
@@ -116,6 +117,17 @@ class ReportCreate(BaseModel):
     report_by: Optional[str] = None
 
 
+class ReportFromAnalysisRequest(BaseModel):
+    """Patient/doctor fields for a report built from a stored analysis"""
+    patient_name: Optional[str] = None
+    patient_age: Optional[str] = None
+    patient_sex: Optional[str] = None
+    patient_hn: Optional[str] = None
+    department: Optional[str] = None
+    request_doctor: Optional[str] = None
+    report_by: Optional[str] = None
+
+
 class ReportResponse(BaseModel):
     id: int
     report_number: str
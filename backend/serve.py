@@ -0,0 +1,257 @@
+"""
+Pre-fork multi-process server
+The parent imports TensorFlow, Keras and the application once, then forks the
+workers, so they share the imported code and library pages copy-on-write instead of
+each spawning a fresh interpreter (`uvicorn --workers N`).
+
+TensorFlow's runtime thread pools do not survive fork(): a child that runs ops
+created by an already-initialized parent hangs. The parent therefore stops right
+before the TF runtime starts; each worker sets its own intra/inter-op thread
+counts, loads the model (the .keras file is served from the shared page cache)
+and runs the warm-up before it accepts its first connection.
+
+SIGHUP to the parent reloads the model file in every worker (see main.reload_model);
+each worker keeps serving on its old model until its new one has loaded and passed
+a test prediction. POST /admin/model/reload reloads the worker that handles it, then
+writes the model path to a file shared by the workers and sends SIGUSR1 to the
+parent, which SIGHUPs the others. Workers started later read the same file, so the
+whole fleet stays on one model.
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 8001
+    kill -HUP <parent pid>   # after replacing models/breast_cancer_model.keras
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+def default_intra_op_threads(workers: int) -> int:
+    """Split the available cores evenly between workers"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def configure_tf_threads(intra_op: int, inter_op: int):
+    """Must run before the first TensorFlow op in the process"""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket shared by all workers; the kernel spreads accepts between them"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def read_model_request(path_file: str) -> Dict[str, Any]:
+    """{"path": model file the workers should serve, "origin_pid": worker that already loaded it}"""
+    try:
+        with open(path_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_model_request(path_file: str, path: Optional[str], origin_pid: Optional[int] = None):
+    tmp_path = f"{path_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"path": path, "origin_pid": origin_pid}, f)
+    os.replace(tmp_path, path_file)
+
+
+def _run_worker(
+    sock: socket.socket,
+    worker_id: int,
+    intra_op: int,
+    inter_op: int,
+    load_model: Optional[Callable[[], Any]],
+    log_level: str,
+    path_file: str,
+):
+    import uvicorn
+    import main
+
+    configure_tf_threads(intra_op, inter_op)
+    fleet_path = read_model_request(path_file).get("path")
+    if load_model is not None:
+        main.model_registry.install(load_model())
+    elif fleet_path:
+        # Restarted after a reload: serve the fleet's model, not the one main was started with
+        main.model_registry.path = Path(fleet_path)
+
+    # Warm up before accepting connections, so every worker behind the socket is ready
+    main.WARMUP_ON_STARTUP = False
+    warmup = main.run_warmup()
+    print(f"✅ Worker {worker_id} (pid {os.getpid()}) warm-up {warmup['status']}: {warmup['timings_ms']}")
+
+    def reload():
+        request = read_model_request(path_file)
+        if request.get("origin_pid") == os.getpid():
+            return  # This worker handled the reload request and already swapped
+        try:
+            main.reload_model(Path(request["path"]) if request.get("path") else None)
+        except Exception as e:
+            print(f"⚠️ Worker {worker_id} model reload failed, still serving {main.get_model_version()}: {e}")
+
+    def reload_other_workers(path: Path):
+        write_model_request(path_file, str(path), os.getpid())
+        os.kill(os.getppid(), signal.SIGUSR1)
+
+    main.reload_other_workers = reload_other_workers
+
+    # Reload off the event loop; the signal handler only starts the thread
+    signal.signal(signal.SIGHUP, lambda signum, _frame: threading.Thread(
+        target=reload, name="model-reload", daemon=True).start())
+
+    config = uvicorn.Config(main.app, log_level=log_level, timeout_graceful_shutdown=30)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def run_prefork(
+    host: str = "0.0.0.0",
+    port: int = 8001,
+    workers: int = 2,
+    intra_op: Optional[int] = None,
+    inter_op: int = 1,
+    load_model: Optional[Callable[[], Any]] = None,
+    log_level: str = "info",
+):
+    """
+    Serve the app from `workers` processes forked from one pre-imported parent
+
+    Args:
+        host: Bind address
+        port: Bind port
+        workers: Number of worker processes
+        intra_op: TF intra-op threads per worker (default: cores / workers)
+        inter_op: TF inter-op threads per worker
+        load_model: Optional model factory run in each worker (default: main.get_model via warm-up)
+        log_level: uvicorn log level
+    """
+    if intra_op is None:
+        intra_op = default_intra_op_threads(workers)
+
+    started = time.perf_counter()
+    import main  # noqa: F401 - heavy imports happen once, in the parent
+    print(f"✅ Application imported in {time.perf_counter() - started:.1f}s, forking {workers} workers "
+          f"(intra_op={intra_op}, inter_op={inter_op})")
+
+    sock = bind_socket(host, port)
+    # Model path the workers serve after a reload, see read_model_request
+    fd, path_file = tempfile.mkstemp(prefix="serve-model-", suffix=".json")
+    os.close(fd)
+    write_model_request(path_file, None)
+
+    # Keep imported objects out of the GC's reach so workers do not dirty the shared pages
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    shutting_down = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)  # Until the worker has a model to reload
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            code = 0
+            try:
+                _run_worker(sock, worker_id, intra_op, inter_op, load_model, log_level, path_file)
+            except Exception as e:
+                print(f"❌ Worker {worker_id} crashed: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        children[pid] = worker_id
+
+    def shutdown(signum, _frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload_workers(signum, _frame):
+        if signum == signal.SIGHUP:
+            # Operator reload: every worker reloads the fleet's model file, none is skipped
+            write_model_request(path_file, read_model_request(path_file).get("path"))
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, reload_workers)
+    signal.signal(signal.SIGUSR1, reload_workers)  # From a worker that handled POST /admin/model/reload
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers: {sorted(children)}")
+
+    # Supervise: replace workers that die, exit once all are gone after a shutdown signal
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_id = children.pop(pid, None)
+        if worker_id is None or shutting_down:
+            continue
+        print(f"⚠️ Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+        time.sleep(1)
+        spawn(worker_id)
+
+    sock.close()
+    os.unlink(path_file)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-process server")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVE_WORKERS", "2")))
+    parser.add_argument("--intra-op", type=int,
+                        default=int(os.environ["TF_INTRA_OP_THREADS"]) if os.environ.get("TF_INTRA_OP_THREADS") else None,
+                        help="TF intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--inter-op", type=int, default=int(os.environ.get("TF_INTER_OP_THREADS", "1")),
+                        help="TF inter-op threads per worker")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    run_prefork(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        intra_op=args.intra_op,
+        inter_op=args.inter_op,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+"""
+Stage timing for the analysis pipeline
+span("predict") times one stage. Each duration is added to a per-stage latency
+histogram, which GET /metrics exports in the Prometheus text format. It is also added
+to the current request's StageTimings, which /analyze and /report return as a
+Server-Timing header.
+
+With METRICS_ENABLED=false, span() returns one shared no-op context manager and
+timed() leaves functions undecorated, so instrumentation costs almost nothing.
+"""
+
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Upper bounds in seconds: stages range from sub-millisecond hashing to multi-second PDFs
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_NAME = "analysis_stage_duration_seconds"
+METRIC_HELP = "Time spent in each analysis stage"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Latency histogram per stage, safe to observe from any thread"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # stage -> count per bucket (not cumulative, +Inf last) and sum of seconds
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            counts = self._counts.get(stage)
+            if counts is None:
+                counts = self._counts[stage] = [0] * (len(self.buckets) + 1)
+                self._sums[stage] = 0.0
+            counts[bisect.bisect_left(self.buckets, seconds)] += 1  # First bucket with seconds <= le
+            self._sums[stage] += seconds
+
+    def snapshot(self) -> Dict[str, Tuple[List[int], float]]:
+        """stage -> (cumulative counts per bucket then +Inf, sum of seconds)"""
+        with self._lock:
+            result = {}
+            for stage, counts in self._counts.items():
+                cumulative, total = [], 0
+                for count in counts:
+                    total += count
+                    cumulative.append(total)
+                result[stage] = (cumulative, self._sums[stage])
+            return result
+
+    def render(self, name: str = METRIC_NAME, help_text: str = METRIC_HELP) -> str:
+        """Prometheus text exposition format"""
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for stage, (cumulative, total) in sorted(self.snapshot().items()):
+            for bound, count in zip(bounds, cumulative):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative[-1]}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+
+class StageTimings:
+    """Stage durations of one request, in the order the stages first ran"""
+
+    def __init__(self):
+        self._durations: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        # A stage that runs several times (e.g. encoding five images) is summed
+        self._durations[stage] = self._durations.get(stage, 0.0) + seconds
+
+    def as_ms(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self._durations.items()}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. 'decode;dur=12.3, predict;dur=80.1'"""
+        return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in self.as_ms().items())
+
+
+# Global histogram shared by all requests
+stage_histogram = Histogram()
+
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+
+def record(stage: str, seconds: float):
+    """Add an externally measured duration (e.g. queue wait) to the histogram and the current request"""
+    if not METRICS_ENABLED:
+        return
+    stage_histogram.observe(stage, seconds)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+_NOOP_SPAN = contextlib.nullcontext()
+
+
+def span(stage: str):
+    """Context manager timing one stage"""
+    return _Span(stage) if METRICS_ENABLED else _NOOP_SPAN
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function as one stage"""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def request_timings() -> Iterator[StageTimings]:
+    """
+    Collect the stages run inside this block into a new StageTimings
+
+    Set it before handing work to the analysis executor: submitted tasks run in a
+    copy of the caller's context, so their spans reach the same object.
+    """
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def render_metrics() -> str:
+    """Body of GET /metrics"""
+    return stage_histogram.render()
@@ -0,0 +1,112 @@
+"""
+Test the content-addressed analysis cache
+Hits must be keyed by bytes + model version, bounded in memory, and survive via the disk tier
+"""
+
+import base64
+import tempfile
+
+from PIL import Image
+
+from analysis_cache import AnalysisCache, estimate_entry_bytes
+from analysis_images import AnalysisImages
+from image_encoding import ImageEncoding, encode_image
+
+
+def make_entry(value, size=(64, 64)):
+    analysis = {"result": "Benign (Non-Cancerous)", "confidence": value}
+    images = {"original": Image.new("RGB", size, (value, value, value))}
+    return analysis, images
+
+
+def test_hit_requires_same_model_version():
+    """A new model version must not reuse results of the old one"""
+    cache = AnalysisCache()
+    analysis, images = make_entry(10)
+    cache.put("abc", "model-v1", analysis, images)
+
+    cached = cache.get("abc", "model-v1")
+    assert cached is not None and cached[0]["confidence"] == 10
+    assert cache.get("abc", "model-v2") is None
+    assert cache.get("other", "model-v1") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    print("✅ Cache keyed by file hash + model version")
+
+
+def test_lru_eviction_respects_memory_bound():
+    """Oldest entries are evicted once the byte bound is exceeded"""
+    entry_bytes = estimate_entry_bytes(*make_entry(0))
+    cache = AnalysisCache(max_memory_bytes=entry_bytes * 2 + entry_bytes // 2)
+
+    for i in range(3):
+        cache.put(f"hash{i}", "v1", *make_entry(i))
+        if i == 1:
+            cache.get("hash0", "v1")  # hash0 becomes most recently used
+
+    assert cache.get("hash0", "v1") is not None
+    assert cache.get("hash1", "v1") is None, "Least recently used entry should have been evicted"
+    assert cache.get("hash2", "v1") is not None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_bytes"] <= stats["max_memory_bytes"]
+    print(f"✅ LRU evicted {stats['evictions']} entry within {stats['max_memory_bytes']} bytes")
+
+
+def test_disk_tier_survives_restart():
+    """A fresh cache pointed at the same directory should serve earlier results"""
+    with tempfile.TemporaryDirectory() as disk_dir:
+        first = AnalysisCache(disk_dir=disk_dir)
+        first.put("abc", "v1", *make_entry(42))
+
+        second = AnalysisCache(disk_dir=disk_dir)
+        cached = second.get("abc", "v1")
+        assert cached is not None
+        analysis, images = cached
+        assert analysis["confidence"] == 42
+        assert images["original"].getpixel((0, 0)) == (42, 42, 42)
+
+        stats = second.stats()
+        assert stats["disk_hits"] == 1 and stats["entries"] == 1
+    print("✅ Disk tier served the entry after a restart")
+
+
+def test_lazy_images_are_resized_as_they_render():
+    """Images decoded or encoded after put() count against the bound and evict older entries"""
+    def lazy_entry(value):
+        original = Image.new("RGB", (200, 200), (value, value, value))
+        b64 = base64.b64encode(encode_image(original, ImageEncoding("png"))).decode("utf-8")
+        stored = {key: b64 for key in ("overlay_image", "heatmap_only", "bbox_image")}
+        return {"confidence": value}, AnalysisImages(original, stored_b64=stored)
+
+    def render(images):
+        for key in ("overlay_image", "heatmap_only", "bbox_image"):
+            images[key]
+        images.encoded("overlay_image", ImageEncoding("png"))
+
+    rendered = lazy_entry(1)
+    render(rendered[1])
+    old, (analysis, images) = lazy_entry(2), lazy_entry(1)
+    put_bytes = estimate_entry_bytes(*old) + estimate_entry_bytes(analysis, images)
+    # Fits both entries as put, or the new one once rendered
+    cache = AnalysisCache(max_memory_bytes=estimate_entry_bytes(*rendered) + estimate_entry_bytes(*old) // 2)
+    cache.put("old", "v1", *old)
+    cache.put("new", "v1", analysis, images)
+    assert cache.stats()["memory_bytes"] == put_bytes
+
+    render(images)
+    stats = cache.stats()
+    assert stats["memory_bytes"] == estimate_entry_bytes(analysis, images) <= stats["max_memory_bytes"]
+    assert stats["entries"] == 1 and stats["evictions"] == 1
+    assert cache.get("old", "v1") is None and cache.get("new", "v1") is not None
+    print("✅ Rendered images are counted against the cache bound")
+
+
+if __name__ == "__main__":
+    test_hit_requires_same_model_version()
+    test_lru_eviction_respects_memory_bound()
+    test_lazy_images_are_resized_as_they_render()
+    test_disk_tier_survives_restart()
+    print("\n✅ ALL CACHE TESTS PASSED")
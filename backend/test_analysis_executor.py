@@ -0,0 +1,83 @@
+"""
+Test the bounded analysis executor
+CPU-bound work must run off the event loop and overflow must be rejected, not queued forever
+"""
+
+import asyncio
+import threading
+import time
+
+from analysis_executor import AnalysisExecutor, QueueFullError
+
+
+def test_event_loop_stays_responsive():
+    """A slow analysis should not block other coroutines on the loop"""
+    executor = AnalysisExecutor(max_concurrency=1, max_queue=1)
+
+    async def scenario():
+        slow = asyncio.ensure_future(executor.run(time.sleep, 0.3))
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)  # stands in for a /health request
+        light_latency = time.perf_counter() - started
+        await slow
+        return light_latency
+
+    light_latency = asyncio.run(scenario())
+    assert light_latency < 0.1, f"Event loop was blocked for {light_latency:.3f}s"
+    print(f"✅ Event loop answered in {light_latency * 1000:.1f} ms during a slow analysis")
+
+
+def test_rejects_when_queue_full():
+    """With 1 running + 1 waiting, a third request must be rejected with a retry hint"""
+    executor = AnalysisExecutor(max_concurrency=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        waiting = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        try:
+            await executor.run(lambda: "rejected")
+            assert False, "Expected QueueFullError"
+        except QueueFullError as e:
+            assert e.retry_after == 7
+        release.set()
+        _, queued_wait = await waiting
+        await running
+        return queued_wait
+
+    queued_wait = asyncio.run(scenario())
+    assert queued_wait > 0.04, "Queued request should report the time it waited for a slot"
+
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["running"] == 0 and stats["waiting"] == 0
+    print(f"✅ Overflow rejected, queued request waited {queued_wait * 1000:.1f} ms")
+
+
+def test_errors_release_the_slot():
+    """A failing analysis must propagate its error and free its slot"""
+    executor = AnalysisExecutor(max_concurrency=1, max_queue=0)
+
+    def broken():
+        raise ValueError("bad image")
+
+    async def scenario():
+        try:
+            await executor.run(broken)
+            assert False, "Expected the analysis error to be raised"
+        except ValueError as e:
+            assert "bad image" in str(e)
+        result, _ = await executor.run(lambda: "ok")
+        return result
+
+    assert asyncio.run(scenario()) == "ok"
+    print("✅ Errors propagate and free the slot")
+
+
+if __name__ == "__main__":
+    test_event_loop_stays_responsive()
+    test_rejects_when_queue_full()
+    test_errors_release_the_slot()
+    print("\n✅ ALL EXECUTOR TESTS PASSED")
@@ -0,0 +1,103 @@
+"""
+Test lazily rendered analysis images
+Nothing is drawn until an image is read, each image is drawn once, and the
+render state survives pickling and the trip through the database row
+"""
+
+import pickle
+
+import numpy as np
+from PIL import Image
+
+from analysis_images import AnalysisImages, image_url, verify_image_signature, image_media_type
+
+
+def make_images(regions=None):
+    original = Image.new("RGB", (120, 160), (90, 90, 90))
+    heatmap = np.zeros((12, 12), dtype=np.float32)
+    heatmap[4:8, 4:8] = 1.0
+    boxes = [(40.0, 50.0, 80.0, 100.0, 0.9)]
+    return AnalysisImages(original, heatmap=heatmap, boxes=boxes, regions=regions)
+
+
+def test_images_render_on_first_access():
+    """Only the original exists until an image is read; later reads reuse the render"""
+    images = make_images()
+    assert images.is_rendered("original")
+    assert not any(images.is_rendered(key) for key in ("overlay_image", "heatmap_only", "bbox_image"))
+
+    overlay = images["overlay_image"]
+    assert overlay.size == (120, 160)
+    assert images.is_rendered("overlay_image") and not images.is_rendered("heatmap_only")
+    assert images["overlay_image"] is overlay
+
+    # No regions: the box tabs show the original
+    assert images["bbox_image"].getpixel((0, 0)) == (90, 90, 90)
+    assert list(images) == ["original", "overlay_image", "heatmap_only", "bbox_image", "cancer_type_image"]
+    print("✅ Images rendered lazily and kept")
+
+
+def test_missing_heatmap_gives_no_images():
+    """If Grad-CAM failed only the original is available"""
+    images = AnalysisImages(Image.new("RGB", (32, 32)))
+    assert images["overlay_image"] is None
+    assert images.render_state() is None
+    print("✅ No heatmap, no rendered images")
+
+
+def test_render_state_round_trip():
+    """Pickled or rebuilt from render_state(), the images render the same"""
+    images = make_images()
+    expected = np.array(images["overlay_image"])
+
+    restored = pickle.loads(pickle.dumps(make_images()))
+    assert np.array_equal(np.array(restored["overlay_image"]), expected)
+
+    rebuilt = AnalysisImages.from_render_state(images["original"], images.render_state())
+    assert np.array_equal(np.array(rebuilt["overlay_image"]), expected)
+    print("✅ Render state round-trips")
+
+
+def test_stored_images_decode_lazily_and_encodings_are_kept():
+    """Stored base64 images are decoded on first read; encoded variants are reused"""
+    import base64
+    import io
+
+    from image_encoding import ImageEncoding
+
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 30), (10, 200, 10)).save(buf, format="PNG")
+    stored = {"original": base64.b64encode(buf.getvalue()).decode("utf-8")}
+    images = AnalysisImages(None, stored_b64=stored)
+
+    assert not images.is_rendered("original")
+    assert images["original"].getpixel((0, 0)) == (10, 200, 10)
+
+    webp = ImageEncoding("webp", quality=80)
+    first = images.encoded("original", webp)
+    assert images.encoded("original", webp) is first
+    assert images.encoded("overlay_image", webp) is None
+    print("✅ Stored images decoded lazily, encodings kept")
+
+
+def test_signed_urls():
+    """Image URLs carry a signature bound to the analysis id"""
+    url = image_url(7, "overlay", "secret")
+    sig = url.split("sig=")[1]
+    assert url.startswith("/analyses/7/images/overlay?")
+    assert verify_image_signature(7, sig, "secret")
+    assert not verify_image_signature(8, sig, "secret")
+    assert not verify_image_signature(7, sig, "other-secret")
+    assert not verify_image_signature(7, None, "secret")
+    assert image_media_type(b"\x89PNG\r\n\x1a\n....") == "image/png"
+    assert image_media_type(b"II*\x00") is None
+    print("✅ Signed image URLs verified")
+
+
+if __name__ == "__main__":
+    test_images_render_on_first_access()
+    test_missing_heatmap_gives_no_images()
+    test_render_state_round_trip()
+    test_stored_images_decode_lazily_and_encodings_are_kept()
+    test_signed_urls()
+    print("\n✅ ALL LAZY IMAGE TESTS PASSED")
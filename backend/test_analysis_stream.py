@@ -0,0 +1,100 @@
+"""
+Test progressive /analyze streaming
+Stages must arrive in order as NDJSON or SSE, and early failures must keep their HTTP status
+"""
+
+import json
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from analysis_executor import AnalysisExecutor
+from analysis_stream import negotiate_stream_format, stream_analysis
+
+
+def make_app(produce, executor=None):
+    app = FastAPI()
+    executor = executor or AnalysisExecutor(max_concurrency=1, max_queue=1)
+
+    @app.post("/analyze")
+    async def analyze(stream: str = None):
+        return await stream_analysis(executor, produce, negotiate_stream_format(stream, None))
+
+    return app
+
+
+def staged_analysis(emit):
+    emit("classification", {"result": "Benign (Non-Cancerous)"})
+    emit("findings", {"findings": {"num_regions": 0}})
+    emit("image", {"name": "overlay", "data": "abc"})
+    return {"result": "Benign (Non-Cancerous)", "analysis_id": 3}
+
+
+def test_negotiation():
+    """Query parameter wins over Accept; no streaming by default"""
+    assert negotiate_stream_format(None, None) is None
+    assert negotiate_stream_format(None, "application/json") is None
+    assert negotiate_stream_format(None, "application/x-ndjson") == "ndjson"
+    assert negotiate_stream_format(None, "text/event-stream") == "sse"
+    assert negotiate_stream_format("SSE", "application/x-ndjson") == "sse"
+    try:
+        negotiate_stream_format("xml", None)
+        assert False, "Expected HTTPException"
+    except HTTPException as e:
+        assert e.status_code == 400
+    print("✅ Stream format negotiated from query and Accept")
+
+
+def test_ndjson_stages_in_order():
+    """Each emitted stage is one line, ending with the complete event"""
+    client = TestClient(make_app(staged_analysis))
+    response = client.post("/analyze", params={"stream": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "x-queue-wait-ms" in response.headers
+
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [e["event"] for e in events] == ["classification", "findings", "image", "complete"]
+    assert events[-1]["data"]["analysis_id"] == 3
+    print("✅ NDJSON stages streamed in order")
+
+
+def test_sse_format():
+    """SSE messages carry the event name and a JSON data line"""
+    client = TestClient(make_app(staged_analysis))
+    response = client.post("/analyze", params={"stream": "sse"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    messages = [m for m in response.text.split("\n\n") if m]
+    assert messages[0].splitlines()[0] == "event: classification"
+    assert json.loads(messages[2].splitlines()[1][len("data: "):]) == {"name": "overlay", "data": "abc"}
+    assert messages[-1].startswith("event: complete")
+    print("✅ SSE messages well formed")
+
+
+def test_errors():
+    """A rejection before any stage keeps its status; a later failure ends the stream with an error event"""
+    def rejected(emit):
+        raise HTTPException(status_code=400, detail="not a mammogram")
+
+    def fails_midway(emit):
+        emit("classification", {"result": "Benign (Non-Cancerous)"})
+        raise RuntimeError("heatmap exploded")
+
+    response = TestClient(make_app(rejected)).post("/analyze", params={"stream": "ndjson"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "not a mammogram"
+
+    response = TestClient(make_app(fails_midway)).post("/analyze", params={"stream": "ndjson"})
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [e["event"] for e in events] == ["classification", "error"]
+    assert events[-1]["data"]["status_code"] == 500
+    print("✅ Early and late failures reported correctly")
+
+
+if __name__ == "__main__":
+    test_negotiation()
+    test_ndjson_stages_in_order()
+    test_sse_format()
+    test_errors()
+    print("\n✅ ALL STREAMING TESTS PASSED")
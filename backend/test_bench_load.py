@@ -0,0 +1,71 @@
+"""
+Test the end-to-end load test harness
+The end-to-end run uses a fresh process, so the app gets its own temporary SQLite database
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_load import compare_to_baseline, parse_mix, summarize
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_parse_mix():
+    assert parse_mix("analyze=3,report") == {"analyze": 3.0, "report": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("analyse=1")
+    with pytest.raises(ValueError):
+        parse_mix("analyze=0")
+
+
+def test_summary_and_baseline_comparison():
+    records = [("analyze", "200", 1.0), ("analyze", "200", 2.0), ("analyze", "503", 0.01), ("dashboard", "200", 0.1)]
+    summary = summarize(records, elapsed=4.0)
+    overall = summary["overall"]
+    assert overall["requests"] == 4 and overall["ok"] == 3 and overall["error_rate"] == 0.25
+    assert overall["status_counts"] == {"200": 3, "503": 1}
+    assert overall["throughput_rps"] == 0.75
+    assert summary["operations"]["analyze"]["p50_ms"] == 1500.0  # Failed requests do not count toward latency
+
+    baseline = {**summary, "peak_rss_mb": 500.0}
+    assert compare_to_baseline(baseline, baseline) == []
+
+    slower = json.loads(json.dumps(baseline))
+    slower["operations"]["analyze"]["p95_ms"] *= 2
+    slower["overall"]["throughput_rps"] /= 2
+    slower["peak_rss_mb"] = 800.0
+    regressions = compare_to_baseline(slower, baseline)
+    assert len(regressions) == 3
+    assert any(message.startswith("analyze p95") for message in regressions)
+    print("✅ Regressions detected against the baseline")
+
+
+def test_end_to_end_run(tmp_path):
+    output = tmp_path / "load.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_load", "--requests", "8", "--concurrency", "2",
+         "--size", "300x400", "--json", str(output)],
+        cwd=BACKEND_DIR, check=True, capture_output=True, timeout=600,
+    )
+    results = json.loads(output.read_text())
+    assert results["config"]["mode"] == "asgi"
+    assert results["overall"]["requests"] == 8
+    assert results["overall"]["error_rate"] == 0.0, results["overall"]["status_counts"]
+    assert results["peak_rss_mb"] > 0
+    print("✅ Load test ran against the in-process app")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_parse_mix()
+    test_summary_and_baseline_comparison()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_end_to_end_run(Path(tmp))
+    print("\n✅ ALL LOAD TEST HARNESS TESTS PASSED")
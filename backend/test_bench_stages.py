@@ -0,0 +1,69 @@
+"""
+Test the per-stage benchmark suite and its synthetic mammograms
+"""
+
+import contextlib
+import io
+
+import numpy as np
+
+from benchmarks.bench_stages import compare, run
+from benchmarks.synthetic import SIZES, benchmark_mammogram, synthetic_mammogram
+from grad_cam import analyze_pectoral_muscle, detect_breast_laterality
+from mammogram_validator import validate_mammogram_image
+
+
+def test_benchmark_images_deterministic():
+    for size, (width, height) in SIZES.items():
+        if size == "4k":
+            continue  # Same code path, only slower
+        image = benchmark_mammogram(size, seed=2)
+        assert image.size == (width, height) and image.mode == "RGB"
+        assert np.array_equal(np.asarray(image), np.asarray(benchmark_mammogram(size, seed=2)))
+    # The optional features never change the base image of a seed
+    plain = np.asarray(synthetic_mammogram(5, 300, 400))
+    assert np.array_equal(plain, np.asarray(synthetic_mammogram(5, 300, 400, label=None)))
+    print("✅ Benchmark mammograms are deterministic")
+
+
+def test_benchmark_image_features():
+    """The pectoral wedge, bright spots and label side are what the analyzers see"""
+    for seed in range(4):
+        mlo = benchmark_mammogram("512", seed=seed, view="MLO")
+        cc = benchmark_mammogram("512", seed=seed, view="CC")
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert validate_mammogram_image(mlo, "image/png")[0]
+            mlo_gray, cc_gray = np.asarray(mlo.convert("L")), np.asarray(cc.convert("L"))
+            assert analyze_pectoral_muscle(mlo_gray)["visibility"] == "Well Visualized"
+            assert analyze_pectoral_muscle(cc_gray)["visibility"] != "Well Visualized"
+            laterality = detect_breast_laterality(cc_gray)
+        # The label is printed away from the chest wall: top right for a right breast
+        _, width = cc_gray.shape
+        label_right = cc_gray[:40, width // 2:].max() > cc_gray[:40, :width // 2].max()
+        assert label_right == (laterality == "R")
+        assert np.count_nonzero(cc_gray >= 235) > 25  # Calcification-like spots
+    print("✅ Synthetic features reach the analyzers")
+
+
+def test_suite_runs_and_compares():
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run(["512"], repeat=2, max_seconds=5, only="duplicate_detector|validate_mammogram_image")
+    stages = results["results"]["512"]
+    assert "duplicate_detector.DuplicateDetector.get_perceptual_hash" in stages
+    assert "mammogram_validator.validate_mammogram_image" in stages
+    assert not any(key.startswith("grad_cam.") for key in stages)
+    for r in stages.values():
+        assert "error" not in r and r["runs"] >= 1 and r["p50_ms"] >= 0
+    assert results["environment"]["numpy"] == np.__version__
+
+    slower = {"results": {"512": {key: {"p50_ms": r["p50_ms"] * 2 + 1} for key, r in stages.items()}}}
+    ratios = compare(slower, results)
+    assert len(ratios) == len(stages) and all(ratio > 1 for _, _, ratio in ratios)
+    print("✅ Benchmark suite writes comparable results")
+
+
+if __name__ == "__main__":
+    test_benchmark_images_deterministic()
+    test_benchmark_image_features()
+    test_suite_runs_and_compares()
+    print("\n✅ ALL BENCHMARK SUITE TESTS PASSED")
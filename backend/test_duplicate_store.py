@@ -0,0 +1,146 @@
+"""
+Test the database-backed duplicate fingerprint store
+Two stores on one database stand in for two workers: each must see the other's uploads
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, UploadFingerprint
+from duplicate_detector import DuplicateDetector
+from duplicate_store import DatabaseFingerprintStore, from_signed64, to_signed64
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fingerprints.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[UploadFingerprint.__table__])
+    return sessionmaker(bind=engine)
+
+
+def picture(seed):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (32, 32), dtype=np.uint8))
+
+
+def test_signed_round_trip():
+    for h in (0, 1, 2 ** 63 - 1, 2 ** 63, 2 ** 64 - 1):
+        assert from_signed64(to_signed64(h)) == h
+        assert -2 ** 63 <= to_signed64(h) < 2 ** 63
+
+
+def test_workers_share_fingerprints(session_factory):
+    worker_a = DuplicateDetector(store=DatabaseFingerprintStore(session_factory))
+    worker_b = DuplicateDetector(store=DatabaseFingerprintStore(session_factory))
+    image = picture(1)
+
+    assert worker_a.check_duplicate(b"one", image, "one.png", scope="session:a") == (False, "")
+    worker_a.remember(*worker_a.fingerprint(b"one", image), "one.png", scope="session:a")
+    is_dup, message = worker_b.check_duplicate(b"one", image, "again.png", scope="session:a")
+    assert is_dup and "Exact duplicate" in message and "one.png" in message
+    is_dup, message = worker_b.check_duplicate(b"re-encoded", image.copy(), "copy.png", scope="session:a")
+    assert is_dup and "very similar to 'one.png'" in message
+
+    # Another session never sees session a's uploads
+    assert worker_b.check_duplicate(b"one", image, "one.png", scope="session:b") == (False, "")
+    worker_b.remember(*worker_b.fingerprint(b"one", image), "one.png", scope="session:b")
+
+    # Clearing on one worker is honoured by the other, whose index still holds the entry
+    worker_b.clear("session:a")
+    assert worker_a.check_duplicate(b"one", image, "one.png", scope="session:a") == (False, "")
+    assert worker_b.count("session:b") == 1
+    assert worker_a.stats()["stale_matches"] == 1
+    print("✅ Workers share fingerprints per scope")
+
+
+def test_same_file_stored_by_two_workers(session_factory):
+    """A worker whose index missed the other's insert still reports the exact duplicate"""
+    store_a = DatabaseFingerprintStore(session_factory)
+    store_b = DatabaseFingerprintStore(session_factory)
+    assert store_a.add("anonymous", "f" * 64, 123, "first.png") is None
+    assert store_b.add("anonymous", "f" * 64, 123, "second.png") == "first.png"
+
+
+def test_row_committed_after_a_higher_id(session_factory):
+    """On Postgres ids are taken before commit: a row that shows up below the synced high-water mark is still found"""
+    store = DatabaseFingerprintStore(session_factory)
+    db = session_factory()
+    db.add(UploadFingerprint(id=10, scope="user:1", file_hash="a" * 64, phash=1, filename="later_id.png"))
+    db.commit()
+    assert store.find("user:1", "c" * 64, 2 ** 64 - 2, 3) is None  # Synced up to id 10
+
+    db.add(UploadFingerprint(id=7, scope="user:1", file_hash="b" * 64, phash=to_signed64(2 ** 63 + 5),
+                             filename="earlier_id.png"))
+    db.commit()
+    db.close()
+    match = store.find("user:1", "d" * 64, 2 ** 63 + 4, 3)
+    assert match is not None and match.filename == "earlier_id.png"
+    assert store.stats()["rows_synced"] == 2
+
+
+def test_database_round_trips_outside_the_lock(session_factory):
+    """A lookup waiting on the database does not block other analyses in the same worker"""
+    waiting, release = threading.Event(), threading.Event()
+
+    def slow_session():
+        waiting.set()
+        release.wait(5)
+        return session_factory()
+
+    store = DatabaseFingerprintStore(slow_session)
+    lookup = threading.Thread(target=store.find, args=("user:1", "a" * 64, 1, 3))
+    lookup.start()
+    assert waiting.wait(5)
+    stats = []
+    reader = threading.Thread(target=lambda: stats.append(store.stats()))
+    reader.start()
+    reader.join(2)
+    answered = list(stats)
+    release.set()
+    lookup.join(5)
+    assert answered and answered[0]["lookups"] == 1, "The store lock was held across the database call"
+
+
+def test_ttl_and_scope_limit(session_factory):
+    store = DatabaseFingerprintStore(session_factory, ttl_seconds=3600, max_per_scope=3, purge_interval=0)
+    phashes = [int(h) for h in np.random.default_rng(0).integers(0, 2 ** 63, 5)]
+    for i, phash in enumerate(phashes):
+        store.add("user:1", f"{i:064x}", phash, f"{i}.png")
+    # Least recently seen entries beyond the limit are evicted
+    assert store.count("user:1") == 3
+    assert store.find("user:1", f"{0:064x}", phashes[0], 3) is None
+    assert store.find("user:1", f"{4:064x}", phashes[4], 3).filename == "4.png"
+
+    # Entries not seen within the TTL expire, and are purged on the next write
+    db = session_factory()
+    db.query(UploadFingerprint).filter(UploadFingerprint.filename == "2.png").update(
+        {"last_seen_at": datetime.utcnow() - timedelta(hours=2)}
+    )
+    db.commit()
+    db.close()
+    assert store.find("user:1", f"{2:064x}", phashes[2], 3) is None
+    store.add("user:2", "e" * 64, 7, "other.png")
+    assert store.count("user:1") == 2
+    assert store.stats()["purged"] == 1 and store.stats()["evicted"] == 2
+    print("✅ Fingerprints expire and each scope is bounded")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_signed_round_trip()
+    for test in (test_workers_share_fingerprints, test_same_file_stored_by_two_workers,
+                 test_row_committed_after_a_higher_id, test_database_round_trips_outside_the_lock,
+                 test_ttl_and_scope_limit):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'fingerprints.db'}")
+            Base.metadata.create_all(engine, tables=[UploadFingerprint.__table__])
+            test(sessionmaker(bind=engine))
+    print("\n✅ ALL DUPLICATE STORE TESTS PASSED")
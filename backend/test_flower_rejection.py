@@ -7,6 +7,55 @@ import numpy as np
 from mammogram_validator import validate_mammogram_image
 
 
+def flower_photo():
+    """A pink flower on a light background (like in your screenshot)"""
+    width, height = 1920, 1080
+    
+    # Background (white/transparent-like)
+    img_array = np.full((height, width, 3), 240, dtype=np.uint8)
+    
+    # Add "flower" area with pink/red colors
+    flower_center_y, flower_center_x = height // 2, width // 2
+    y, x = np.mgrid[0:height, 0:width]
+    dist = np.sqrt((x - flower_center_x)**2 + (y - flower_center_y)**2)
+    flower = dist < 300
+    img_array[flower, 0] = 255  # Red channel (high)
+    img_array[flower, 1] = (150 - dist[flower]/3).astype(np.uint8)  # Green channel (medium)
+    img_array[flower, 2] = (180 - dist[flower]/3).astype(np.uint8)  # Blue channel (medium)
+    
+    return Image.fromarray(img_array, mode='RGB')
+
+
+def transparent_png():
+    """Pink square on a semi-transparent background (RGBA)"""
+    width, height = 1920, 1080
+    img_array = np.zeros((height, width, 4), dtype=np.uint8)
+    
+    # Semi-transparent background
+    img_array[:, :, 3] = 128  # Alpha channel
+    
+    # Pink flower
+    img_array[400:700, 800:1100, 0] = 255
+    img_array[400:700, 800:1100, 1] = 150
+    img_array[400:700, 800:1100, 2] = 180
+    img_array[400:700, 800:1100, 3] = 255
+    
+    return Image.fromarray(img_array, mode='RGBA')
+
+
+def colorful_object():
+    """Red, green and blue bands"""
+    width, height = 1920, 1080
+    img_array = np.zeros((height, width, 3), dtype=np.uint8)
+    
+    # Rainbow colors
+    img_array[:, :width//3, 0] = 255  # Red section
+    img_array[:, width//3:2*width//3, 1] = 255  # Green section
+    img_array[:, 2*width//3:, 2] = 255  # Blue section
+    
+    return Image.fromarray(img_array, mode='RGB')
+
+
 def test_flower_image():
     """
     Simulate a photo of a flower (like in your screenshot)
@@ -16,27 +65,7 @@ def test_flower_image():
     print("TEST: Photo of a flower (should be REJECTED)")
     print("=" * 70)
     
-    # Create an image that simulates a colorful flower
-    width, height = 1920, 1080
-    
-    # Create RGB image with pink/red colors (like a flower)
-    img_array = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    # Background (white/transparent-like)
-    img_array[:, :, :] = 240
-    
-    # Add "flower" area with pink/red colors
-    flower_center_y, flower_center_x = height // 2, width // 2
-    for y in range(height):
-        for x in range(width):
-            dist = np.sqrt((x - flower_center_x)**2 + (y - flower_center_y)**2)
-            if dist < 300:
-                # Pink/red flower
-                img_array[y, x, 0] = 255  # Red channel (high)
-                img_array[y, x, 1] = int(150 - dist/3)  # Green channel (medium)
-                img_array[y, x, 2] = int(180 - dist/3)  # Blue channel (medium)
-    
-    image = Image.fromarray(img_array, mode='RGB')
+    image = flower_photo()
     
     is_valid, error = validate_mammogram_image(image, "image/png")
     
@@ -57,20 +86,7 @@ def test_transparent_png():
     print("TEST: PNG with transparency (should be REJECTED)")
     print("=" * 70)
     
-    # Create RGBA image (with alpha channel)
-    width, height = 1920, 1080
-    img_array = np.zeros((height, width, 4), dtype=np.uint8)
-    
-    # Semi-transparent background
-    img_array[:, :, 3] = 128  # Alpha channel
-    
-    # Pink flower
-    img_array[400:700, 800:1100, 0] = 255
-    img_array[400:700, 800:1100, 1] = 150
-    img_array[400:700, 800:1100, 2] = 180
-    img_array[400:700, 800:1100, 3] = 255
-    
-    image = Image.fromarray(img_array, mode='RGBA')
+    image = transparent_png()
     
     is_valid, error = validate_mammogram_image(image, "image/png")
     
@@ -91,17 +107,7 @@ def test_colorful_object():
     print("TEST: Colorful object (should be REJECTED)")
     print("=" * 70)
     
-    width, height = 1920, 1080
-    
-    # Create very colorful image
-    img_array = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    # Rainbow colors
-    img_array[:, :width//3, 0] = 255  # Red section
-    img_array[:, width//3:2*width//3, 1] = 255  # Green section
-    img_array[:, 2*width//3:, 2] = 255  # Blue section
-    
-    image = Image.fromarray(img_array, mode='RGB')
+    image = colorful_object()
     
     is_valid, error = validate_mammogram_image(image, "image/jpeg")
     
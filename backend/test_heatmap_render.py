@@ -0,0 +1,57 @@
+"""
+Test the LUT-based heatmap renderer
+Colors must match matplotlib's jet, blending must respect the tissue mask and the
+standalone panel must keep its 600x600 layout
+"""
+
+import numpy as np
+from PIL import Image
+
+from heatmap_render import blend_heatmap, colorize, colormap_lut, render_heatmap_panel
+
+
+def test_jet_lut_matches_matplotlib():
+    """Known jet colors: dark blue at 0, green-ish at the middle, dark red at 1"""
+    lut = colormap_lut("jet")
+    assert lut.shape == (256, 3) and lut.dtype == np.uint8
+    assert tuple(lut[0]) == (0, 0, 127)
+    assert tuple(lut[128]) == (124, 255, 121)
+    assert tuple(lut[255]) == (127, 0, 0)
+    assert tuple(colorize(np.array([[0, 255]], dtype=np.uint8))[0, 1]) == (127, 0, 0)
+    try:
+        colormap_lut("no-such-map")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✅ jet LUT matches matplotlib")
+
+
+def test_blend_respects_mask():
+    """Pixels outside the mask keep the original; inside they are a 50/50 blend"""
+    image = Image.new("RGB", (4, 2), (100, 100, 100))
+    intensity = np.full((2, 4), 255, dtype=np.uint8)
+    mask = np.zeros((2, 4), dtype=bool)
+    mask[:, :2] = True
+
+    out = np.asarray(blend_heatmap(image, intensity, alpha=0.5, mask=mask))
+    assert tuple(out[0, 3]) == (100, 100, 100)
+    assert tuple(out[0, 0]) == (113, 50, 50)  # (100 + 127) / 2, (100 + 0) / 2
+    print("✅ Heatmap blended only inside the mask")
+
+
+def test_heatmap_panel():
+    """The standalone panel is 600x600 RGB with the heatmap colors in it"""
+    heatmap = np.zeros((7, 7), dtype=np.float32)
+    heatmap[3, 3] = 1.0
+    panel = render_heatmap_panel(heatmap)
+    assert panel.size == (600, 600) and panel.mode == "RGB"
+    colors = {tuple(c) for c in np.asarray(panel).reshape(-1, 3)[::37]}
+    assert (0, 0, 127) in colors, "Low activation should be dark blue"
+    print("✅ Heatmap panel rendered")
+
+
+if __name__ == "__main__":
+    test_jet_lut_matches_matplotlib()
+    test_blend_respects_mask()
+    test_heatmap_panel()
+    print("\n✅ ALL HEATMAP RENDER TESTS PASSED")
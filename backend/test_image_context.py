@@ -0,0 +1,75 @@
+"""
+Test the per-request ImageContext
+Each representation must be computed once, match what the stages used to compute
+for themselves, and be protected against in-place modification
+"""
+
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from image_context import ImageContext, preprocess_image
+from mammogram_validator import validate_mammogram_image
+
+
+def make_image(color=False, width=120, height=160):
+    rng = np.random.default_rng(1)
+    gray = rng.integers(0, 255, (height, width), dtype=np.uint8)
+    gray[:, : width // 4] = 0  # Background strip
+    rgb = np.stack([gray] * 3, axis=-1)
+    if color:
+        rgb[:, :, 0] = rng.integers(0, 255, (height, width), dtype=np.uint8)
+    return Image.fromarray(rgb)
+
+
+def test_memoized_and_read_only():
+    """Arrays are computed once and cannot be modified by a stage"""
+    context = ImageContext(make_image(), b"upload-bytes")
+    assert context.rgb is context.rgb
+    assert context.gray is context.gray
+    assert context.tissue_mask(15) is context.tissue_mask(15)
+    assert context.model_input is context.model_input
+    assert context.file_hash == hashlib.sha256(b"upload-bytes").hexdigest()
+    try:
+        context.rgb[0, 0, 0] = 1
+        assert False, "Expected a read-only array"
+    except ValueError:
+        pass
+    assert ImageContext.of(context.image, context) is context
+    assert ImageContext.of(make_image(), context) is not context
+    print("✅ Context arrays memoized and read-only")
+
+
+def test_matches_previous_conversions():
+    """Masks, grayscale and model input equal the per-stage conversions they replace"""
+    for color in (False, True):
+        image = make_image(color=color)
+        context = ImageContext(image)
+        rgb = np.array(image)
+        gray = np.array(image.convert("L"))
+
+        assert np.array_equal(context.rgb, rgb)
+        assert np.array_equal(context.gray, gray)
+        assert context.is_grayscale == (not color)
+        for threshold in (15, 20):
+            assert np.array_equal(context.tissue_mask(threshold), np.mean(rgb, axis=2) > threshold)
+            assert np.array_equal(context.gray_tissue_mask(threshold), gray > threshold)
+        assert np.array_equal(context.model_input, preprocess_image(image))
+    print("✅ Context matches the conversions it replaces")
+
+
+def test_validator_uses_context():
+    """Validation with a shared context gives the same answer and fills the context"""
+    for image in (make_image(), make_image(color=True), Image.new("RGB", (200, 200), (250, 250, 250))):
+        context = ImageContext(image)
+        assert validate_mammogram_image(image, "image/png", context=context) == validate_mammogram_image(image, "image/png")
+        assert "rgb" in context.__dict__, "Validator should read the shared RGB array"
+    print("✅ Validator shares the request context")
+
+
+if __name__ == "__main__":
+    test_memoized_and_read_only()
+    test_matches_previous_conversions()
+    test_validator_uses_context()
+    print("\n✅ ALL IMAGE CONTEXT TESTS PASSED")
@@ -0,0 +1,74 @@
+"""
+Test the image encoding layer
+Lossless formats must round-trip exactly, max_dim must keep the aspect ratio,
+and negotiation must prefer query parameters, then Accept, then the server default
+"""
+
+import io
+
+import numpy as np
+from fastapi import HTTPException
+from PIL import Image
+
+from image_encoding import ImageEncoding, encode_image, negotiate_encoding
+
+
+def make_image(width=300, height=400):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8))
+
+
+def decode(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def test_lossless_round_trip():
+    """PNG at any level and lossless WebP give back the exact pixels"""
+    image = make_image()
+    for encoding in (ImageEncoding("png"), ImageEncoding("png", png_compress_level=1), ImageEncoding("webp")):
+        decoded = decode(encode_image(image, encoding))
+        assert decoded.format == encoding.format.upper()
+        assert np.array_equal(np.array(decoded.convert("RGB")), np.array(image)), encoding
+    print("✅ PNG and lossless WebP are exact")
+
+
+def test_lossy_and_max_dim():
+    """JPEG honours quality; max_dim downscales the longest side only"""
+    image = make_image()
+    small = encode_image(image, ImageEncoding("jpeg", quality=30))
+    large = encode_image(image, ImageEncoding("jpeg", quality=95))
+    assert decode(small).format == "JPEG" and len(small) < len(large)
+
+    assert decode(encode_image(image, ImageEncoding("png", max_dim=200))).size == (150, 200)
+    assert decode(encode_image(image, ImageEncoding("png", max_dim=1000))).size == (300, 400), "Never upscale"
+    print("✅ Quality and max_dim applied")
+
+
+def test_negotiation():
+    """Query parameters beat Accept, Accept beats the default"""
+    default = ImageEncoding("png", max_dim=1024, png_compress_level=1)
+    browser = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+    assert negotiate_encoding(default) == default
+    assert negotiate_encoding(default, accept=browser) == ImageEncoding("webp", None, 1024, 1)
+    assert negotiate_encoding(default, accept="image/webp;q=0.5, image/jpeg").format == "jpeg"
+    assert negotiate_encoding(default, accept="*/*").format == "png"
+    assert negotiate_encoding(default, format="JPG", quality=70, max_dim=0, accept=browser) == ImageEncoding("jpeg", 70, None, 1)
+    assert negotiate_encoding(default, format="png", quality=70).quality is None
+
+    for kwargs in ({"format": "gif"}, {"format": "jpeg", "quality": 0}, {"max_dim": 4}):
+        try:
+            negotiate_encoding(default, **kwargs)
+            assert False, f"Expected HTTPException for {kwargs}"
+        except HTTPException as e:
+            assert e.status_code == 400
+    print("✅ Encoding negotiated from query, Accept and default")
+
+
+if __name__ == "__main__":
+    test_lossless_round_trip()
+    test_lossy_and_max_dim()
+    test_negotiation()
+    print("\n✅ ALL IMAGE ENCODING TESTS PASSED")
@@ -0,0 +1,152 @@
+"""
+Test the perceptual hashes and the fingerprint backfill
+A re-encoded or resized mammogram must stay within the near-duplicate distance,
+different mammograms must not
+"""
+
+import base64
+import io
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+from scipy.fft import dctn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import image_hashing as h
+from benchmarks.synthetic import synthetic_mammogram
+from database import Analysis, Base, UploadFingerprint
+from duplicate_detector import NEAR_DUPLICATE_DISTANCE, DuplicateDetector
+from duplicate_store import DatabaseFingerprintStore, backfill_fingerprints, from_signed64, to_signed64
+from image_context import ImageContext
+from phash_index import hamming
+
+
+def jpeg(image, quality=70):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+
+
+def test_dct_matches_scipy():
+    x = np.random.default_rng(0).random((3, 32, 32)) * 255
+    d = h._dct_matrix(32)
+    assert np.allclose(d @ x @ d.T, dctn(x, axes=(1, 2), norm="ortho"), atol=1e-2)
+
+
+@pytest.mark.parametrize("method", h.HASH_METHODS)
+def test_batch_matches_single(method):
+    thumbnails = np.random.default_rng(1).random((10, 32, 32)).astype(np.float32) * 255
+    single = {"ahash": h.average_hash, "dhash": h.difference_hash, "dct": h.dct_hash}[method]
+    batch = h.hash_thumbnails(thumbnails, method)
+    assert batch.dtype == np.uint64
+    assert [int(value) for value in batch] == [single(t) for t in thumbnails]
+
+
+def test_bit_order():
+    """Row-major bits, first most significant: a bright top-left block sets the top bit only"""
+    thumbnail = np.zeros((32, 32), dtype=np.float32)
+    thumbnail[:4, :4] = 255
+    assert h.average_hash(thumbnail) == 1 << 63
+    assert h.to_hex(h.average_hash(thumbnail)) == "8000000000000000"
+    with pytest.raises(ValueError):
+        h.hash_thumbnails(thumbnail, "sha")
+
+
+def test_dct_hash_tolerates_reencoding_only():
+    hashes = []
+    for seed in range(12):
+        image = synthetic_mammogram(seed, 410, 512)
+        phash = h.dct_hash(ImageContext(image).hash_thumbnail)
+        hashes.append(phash)
+        for variant in (jpeg(image), image.resize((205, 256), Image.LANCZOS), image.resize((1640, 2048))):
+            assert hamming(phash, h.dct_hash(ImageContext(variant).hash_thumbnail)) <= NEAR_DUPLICATE_DISTANCE
+    for i, a in enumerate(hashes):
+        for b in hashes[:i]:
+            assert hamming(a, b) > NEAR_DUPLICATE_DISTANCE
+    print("✅ DCT hash matches re-encoded copies and separates different mammograms")
+
+
+def test_detector_reuses_context_thumbnail():
+    image = synthetic_mammogram(3, 300, 400)
+    context = ImageContext(image)
+    assert DuplicateDetector.get_perceptual_hash(image) == h.to_hex(h.dct_hash(context.hash_thumbnail))
+    assert not context.hash_thumbnail.flags.writeable
+    DuplicateDetector().check_duplicate(b"data", image, "a.png", context=context)
+    assert "hash_thumbnail" in vars(context)
+
+
+def test_hashing_runs_outside_detector_lock():
+    """A cold context builds its thumbnail while another request holds the store lock"""
+    detector = DuplicateDetector()
+    image = synthetic_mammogram(4, 1200, 1500)
+    context = ImageContext(image)
+    with detector.store._lock:
+        checker = threading.Thread(target=detector.check_duplicate, args=(b"data", image, "a.png"),
+                                   kwargs={"context": context})
+        checker.start()
+        deadline = time.time() + 10
+        while "hash_thumbnail" not in vars(context) and time.time() < deadline:
+            time.sleep(0.005)
+        assert "hash_thumbnail" in vars(context), "Hashing waited for the lock"
+    checker.join(5)
+    assert not checker.is_alive()
+
+
+def test_backfill_indexes_stored_analyses(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(engine, tables=[Analysis.__table__, UploadFingerprint.__table__])
+    session_factory = sessionmaker(bind=engine)
+
+    uploads = []
+    db = session_factory()
+    for seed in range(5):
+        buffer = io.BytesIO()
+        synthetic_mammogram(seed, 300, 400).save(buffer, format="PNG")
+        uploads.append(buffer.getvalue())
+        db.add(Analysis(
+            user_id=seed % 2 or None, filename=f"{seed}.png",
+            original_image_b64=base64.b64encode(uploads[-1]).decode("utf-8"),
+        ))
+    db.add(Analysis(user_id=1, filename="broken.png", original_image_b64="bm90IGFuIGltYWdl"))
+    db.add(Analysis(user_id=1, filename="no-image.png"))
+    # Fingerprint written by an older hash function: rehashed, not duplicated
+    stale = DuplicateDetector.get_file_hash(uploads[1])
+    db.add(UploadFingerprint(scope="user:1", file_hash=stale, phash=to_signed64(12345), filename="1.png"))
+    db.commit()
+    db.close()
+
+    counts = backfill_fingerprints(session_factory, batch_size=2)
+    assert counts == {"analyses": 6, "added": 4, "updated": 1, "skipped": 1}
+    db = session_factory()
+    row = db.query(UploadFingerprint).filter(UploadFingerprint.file_hash == stale).one()
+    image = Image.open(io.BytesIO(uploads[1])).convert("RGB")
+    assert from_signed64(row.phash) == int(DuplicateDetector.get_perceptual_hash(image), 16)
+    db.close()
+
+    detector = DuplicateDetector(store=DatabaseFingerprintStore(session_factory, ttl_seconds=0))
+    is_dup, message = detector.check_duplicate(uploads[3], image, "again.png", scope="user:1")
+    assert is_dup and "'3.png'" in message
+    reencoded = jpeg(Image.open(io.BytesIO(uploads[2])).convert("RGB"))
+    is_dup, message = detector.check_duplicate(b"jpeg", reencoded, "copy.jpg", scope="anonymous")
+    assert is_dup and "very similar to '2.png'" in message
+    print("✅ Backfill fingerprints stored analyses")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_dct_matches_scipy()
+    for method in h.HASH_METHODS:
+        test_batch_matches_single(method)
+    test_bit_order()
+    test_dct_hash_tolerates_reencoding_only()
+    test_detector_reuses_context_thumbnail()
+    test_hashing_runs_outside_detector_lock()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_backfill_indexes_stored_analyses(Path(tmp))
+    print("\n✅ ALL IMAGE HASHING TESTS PASSED")
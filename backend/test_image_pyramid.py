@@ -0,0 +1,114 @@
+"""
+Test the ImageContext pyramid
+Levels must be memoized and sized as level() promises, and the analyzers that run on
+a downscaled level must reach the same categorical findings as at full resolution
+"""
+
+import contextlib
+import io
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.synthetic import synthetic_mammogram
+from image_context import ImageContext
+from mammogram_validator import MammogramValidator
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import grad_cam
+
+SEEDS = range(4)
+
+# Analyzer -> (categorical fields, (score field, largest drift from full resolution))
+MASKED_ANALYZERS = {
+    grad_cam.analyze_breast_density: (("category",), ("density_percentage", 2)),
+    grad_cam.analyze_tissue_texture: (("pattern", "distribution"), ("coefficient_of_variation", 3)),
+    grad_cam.analyze_skin_and_nipple: (("skin_status", "nipple_retraction"), ("skin_thickness_score", 3)),
+    grad_cam.analyze_vascular_patterns: (("pattern",), ("vascular_score", 3)),
+}
+UNMASKED_ANALYZERS = {
+    grad_cam.analyze_breast_symmetry: (("assessment",), ("symmetry_score", 2)),
+    grad_cam.analyze_pectoral_muscle: (("visibility", "side"), ("visibility_score", 2)),
+}
+
+
+def mammogram(seed):
+    return synthetic_mammogram(seed, width=1600, height=2000)
+
+
+def test_levels():
+    """Levels halve the image until it fits, and are built once"""
+    context = ImageContext(mammogram(0))
+    assert context.level(None) is context
+    assert context.level(4096) is context
+
+    level = context.level(1024)
+    assert level.size == (800, 1000) and level.scale == 2
+    assert context.level(1024) is level
+    assert context.level(1000) is level
+    assert context.level(512).size == (400, 500) and context.level(512).scale == 4
+    assert context.level(512) is context.level(999)
+    assert np.array_equal(level.rgb, np.asarray(context.image.reduce(2)))
+
+    # Modes Image.reduce cannot handle stay at full resolution
+    palette = ImageContext(Image.new("P", (2000, 2000)))
+    assert palette.level(512) is palette
+    print("✅ Pyramid levels sized and memoized")
+
+
+def test_analyzer_categories_stable_across_levels():
+    """Each analyzer's findings on its declared level match the full-resolution findings"""
+    for seed in SEEDS:
+        context = ImageContext(mammogram(seed))
+        analyzers = [(analyzer, True, spec) for analyzer, spec in MASKED_ANALYZERS.items()]
+        analyzers += [(analyzer, False, spec) for analyzer, spec in UNMASKED_ANALYZERS.items()]
+        for analyzer, masked, (categories, (score, tolerance)) in analyzers:
+            level = context.level(analyzer.max_dim)
+            assert level is not context, f"{analyzer.__name__} should run downscaled"
+            results = []
+            for ctx in (context, level):
+                args = (ctx.gray, ctx.tissue_mask(15)) if masked else (ctx.gray,)
+                results.append(analyzer(*args))
+            full, coarse = results
+            for field in categories:
+                assert full[field] == coarse[field], (seed, analyzer.__name__, field, full[field], coarse[field])
+            assert abs(full[score] - coarse[score]) <= tolerance, (seed, analyzer.__name__, full[score], coarse[score])
+    print("✅ Analyzer categories stable across pyramid levels")
+
+
+def test_view_detection_stable_across_levels():
+    """Laterality and view type from tissue agree between full resolution and their levels"""
+    for seed in SEEDS:
+        context = ImageContext(mammogram(seed))
+        with contextlib.redirect_stdout(io.StringIO()):
+            full_view = grad_cam.detect_mammogram_view_type(context.gray, check_text_label=False)
+            view = grad_cam.detect_mammogram_view_type(
+                context.level(grad_cam.detect_mammogram_view_type.max_dim).gray, check_text_label=False
+            )
+        assert full_view == view, (seed, full_view, view)
+        full_side = grad_cam.detect_breast_laterality(context.gray)
+        side = grad_cam.detect_breast_laterality(context.level(grad_cam.detect_breast_laterality.max_dim).gray)
+        assert full_side == side, (seed, full_side, side)
+    print("✅ View detection stable across pyramid levels")
+
+
+def test_validator_stable_across_levels():
+    """The validator reaches the same decision on its level as at full resolution"""
+    full_resolution = MammogramValidator()
+    full_resolution.ANALYSIS_MAX_DIM = None
+    rng = np.random.default_rng(0)
+    colorful = Image.fromarray(rng.integers(0, 255, (1800, 1500, 3), dtype=np.uint8))
+    images = [mammogram(seed) for seed in SEEDS] + [colorful, Image.new("RGB", (1500, 1800), (2, 2, 2))]
+    for image in images:
+        context = ImageContext(image)
+        assert MammogramValidator().validate(image, context) == full_resolution.validate(image, context)
+        assert context.level(MammogramValidator.ANALYSIS_MAX_DIM) is not context
+    print("✅ Validator decisions stable across pyramid levels")
+
+
+if __name__ == "__main__":
+    test_levels()
+    test_analyzer_categories_stable_across_levels()
+    test_view_detection_stable_across_levels()
+    test_validator_stable_across_levels()
+    print("\n✅ ALL IMAGE PYRAMID TESTS PASSED")
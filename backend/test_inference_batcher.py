@@ -0,0 +1,63 @@
+"""
+Test the micro-batching inference queue
+Concurrent submissions should share forward passes and each get their own result
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from inference_batcher import InferenceBatcher
+
+
+def fake_model(batch):
+    """Stand-in for model.predict: returns the mean of each sample"""
+    time.sleep(0.01)
+    return [float(sample.mean()) for sample in batch]
+
+
+def test_results_fan_out_to_callers():
+    """Each caller must get the result for its own tensor"""
+    batcher = InferenceBatcher(fake_model, max_batch_size=4, window_ms=50)
+    tensors = [np.full((1, 4, 4, 3), i, dtype=np.float32) for i in range(8)]
+    results = [None] * len(tensors)
+
+    def worker(i):
+        results[i] = batcher.predict(tensors[i], timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(tensors))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [float(i) for i in range(len(tensors))]
+
+    stats = batcher.stats()
+    assert stats["total_items"] == 8
+    assert stats["total_batches"] < 8, "Concurrent requests should have been batched"
+    assert max(stats["batch_size_counts"]) <= 4
+    print(f"✅ 8 requests served in {stats['total_batches']} batches")
+
+
+def test_errors_propagate_to_every_caller():
+    """A failing forward pass should fail all requests in the batch, not hang them"""
+    def broken_model(batch):
+        raise RuntimeError("model exploded")
+
+    batcher = InferenceBatcher(broken_model, max_batch_size=2, window_ms=1)
+    try:
+        batcher.predict(np.zeros((1, 2, 2, 3), dtype=np.float32), timeout=5)
+        assert False, "Expected the model error to be raised"
+    except RuntimeError as e:
+        assert "model exploded" in str(e)
+
+    assert batcher.stats()["errors"] == 1
+    print("✅ Model errors reach the waiting caller")
+
+
+if __name__ == "__main__":
+    test_results_fan_out_to_callers()
+    test_errors_propagate_to_every_caller()
+    print("\n✅ ALL BATCHER TESTS PASSED")
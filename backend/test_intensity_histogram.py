@@ -0,0 +1,98 @@
+"""
+Test histogram-derived image statistics
+Every statistic must match numpy on the pixels it summarizes
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.synthetic import synthetic_mammogram
+from image_context import ImageContext
+from intensity_histogram import IntensityHistogram
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import grad_cam
+    from main import get_image_statistics
+
+
+def assert_matches(histogram, pixels):
+    pixels = np.asarray(pixels).ravel()
+    assert histogram.count == pixels.size
+    assert histogram.mean == pytest.approx(np.mean(pixels), rel=1e-12)
+    assert histogram.std == pytest.approx(np.std(pixels), rel=1e-9)
+    assert histogram.min == pixels.min() and histogram.max == pixels.max()
+    assert histogram.median == np.median(pixels)
+    for q in (0, 1, 5, 25, 33.3, 75, 95, 99, 100):
+        assert histogram.percentile(q) == np.percentile(pixels, q), q
+    for threshold in (-1, 0, 14.5, 15, 100.25, 255, 300):
+        assert histogram.count_above(threshold) == np.count_nonzero(pixels > threshold)
+        assert histogram.count_below(threshold) == np.count_nonzero(pixels < threshold)
+    for order in (3, 4):
+        expected = np.mean(((pixels - np.mean(pixels)) / (np.std(pixels) + 1e-6)) ** order)
+        assert histogram.standardized_moment(order, eps=1e-6) == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (7, 9), (64, 50)])
+def test_matches_numpy(shape):
+    rng = np.random.default_rng(sum(shape))
+    gray = rng.integers(0, 256, shape, dtype=np.uint8)
+    mask = rng.random(shape) < 0.6
+    mask.flat[0] = True
+    assert_matches(IntensityHistogram.of_array(gray), gray)
+    assert_matches(IntensityHistogram.of_array(gray, mask), gray[mask])
+    sums = rng.integers(0, 766, shape).astype(np.uint16)
+    assert_matches(IntensityHistogram.of_array(sums), sums)
+    rgb = rng.integers(0, 256, shape + (3,), dtype=np.uint8)
+    assert_matches(IntensityHistogram.of_image(Image.fromarray(rgb)), rgb)
+    print("✅ Histogram statistics match numpy")
+
+
+@pytest.mark.parametrize("color", [False, True])
+def test_context_histograms(color):
+    image = synthetic_mammogram(2, 300, 400)
+    if color:
+        rgb = np.asarray(image).copy()
+        rgb[:, :, 0] = np.clip(rgb[:, :, 0].astype(int) + 9, 0, 255)
+        image = Image.fromarray(rgb)
+    context = ImageContext(image)
+    assert context.is_grayscale != color
+    assert_matches(context.rgb_histogram, context.rgb)
+    assert_matches(context.channel_sum_histogram, context.channel_sum)
+    assert_matches(context.tissue_histogram(15), context.gray[context.tissue_mask(15)])
+    assert context.tissue_histogram(15) is context.tissue_histogram(15)
+    # View analysis reads gray[gray_tissue_mask()] as the gray histogram above 15
+    assert_matches(context.gray_histogram.above(15), context.gray[context.gray_tissue_mask()])
+
+
+def test_statistics_and_analyzers_unchanged():
+    image = synthetic_mammogram(1, 600, 800, calcifications=10)
+    rgb = np.asarray(image)
+    stats = get_image_statistics(image)
+    expected = {
+        "mean_intensity": np.mean(rgb), "std_intensity": np.std(rgb), "min_intensity": np.min(rgb),
+        "max_intensity": np.max(rgb), "median_intensity": np.median(rgb),
+        "brightness": np.mean(rgb) / 255.0 * 100, "contrast": np.std(rgb) / 255.0 * 100,
+    }
+    assert stats.keys() == expected.keys()
+    for key, value in expected.items():
+        assert stats[key] == pytest.approx(float(value), rel=1e-12), key
+
+    context = ImageContext(image)
+    gray, mask = context.gray, context.tissue_mask(15)
+    for analyzer in (grad_cam.analyze_breast_density, grad_cam.analyze_tissue_texture):
+        assert analyzer(gray, mask) == analyzer(gray, mask, histogram=context.tissue_histogram(15))
+        assert analyzer(gray, np.zeros_like(mask)) is None
+    print("✅ Statistics and analyzers agree with and without a shared histogram")
+
+
+if __name__ == "__main__":
+    for test_shape in [(1, 1), (7, 9), (64, 50)]:
+        test_matches_numpy(test_shape)
+    test_context_histograms(False)
+    test_context_histograms(True)
+    test_statistics_and_analyzers_unchanged()
+    print("\n✅ ALL INTENSITY HISTOGRAM TESTS PASSED")
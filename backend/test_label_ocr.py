@@ -0,0 +1,124 @@
+"""
+Test the batched, cached view-label OCR
+Tesseract is replaced by a recording function, so these run without the binary
+"""
+
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from label_ocr import PASSES, LabelOCR, label_candidates, label_regions, parse_mammogram_label
+
+
+def labeled_mammogram(seed=0):
+    """Dark image with tissue noise and a bright label in the top-left corner"""
+    rng = np.random.default_rng(seed)
+    gray = np.zeros((800, 600), dtype=np.uint8)
+    gray[200:700, 150:550] = rng.integers(60, 200, (500, 400), dtype=np.uint8)
+    image = Image.fromarray(gray)
+    ImageDraw.Draw(image).text((20, 20), "R-MLO", fill=255)
+    return np.asarray(image)
+
+
+class FakeTesseract:
+    def __init__(self, text="", delay=0.0):
+        self.text = text
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, image, config="", timeout=0):
+        self.calls.append((image, config, timeout))
+        if self.delay > timeout:
+            raise RuntimeError("Tesseract process timeout")
+        time.sleep(self.delay)
+        return self.text
+
+
+def test_one_batched_call_and_cache():
+    """All candidates go to Tesseract in one sheet; the same corners are not read twice"""
+    tesseract = FakeTesseract("\n\nR-MLO\n")
+    ocr = LabelOCR(image_to_string=tesseract)
+    img_array = labeled_mammogram()
+
+    assert ocr.read_label(img_array) == ("R", "MLO")
+    assert len(tesseract.calls) == 1
+    sheet, config, timeout = tesseract.calls[0]
+    assert isinstance(sheet, Image.Image) and sheet.mode == "L"
+    assert config == PASSES[0] and 0 < timeout <= ocr.budget_ms / 1000
+
+    assert ocr.read_label(img_array.copy()) == ("R", "MLO")
+    assert len(tesseract.calls) == 1
+    stats = ocr.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["tesseract_calls"] == 1
+    print("✅ One batched Tesseract call, then cached")
+
+
+def test_no_label_runs_both_passes_and_is_cached():
+    tesseract = FakeTesseract("")
+    ocr = LabelOCR(image_to_string=tesseract)
+    assert ocr.read_label(labeled_mammogram()) == (None, None)
+    assert [config for _, config, _ in tesseract.calls] == list(PASSES)
+    ocr.read_label(labeled_mammogram())
+    assert len(tesseract.calls) == len(PASSES)
+    print("✅ Missing label costs len(PASSES) calls once")
+
+
+def test_budget_cuts_off_and_is_not_cached():
+    tesseract = FakeTesseract("RCC", delay=0.5)
+    ocr = LabelOCR(image_to_string=tesseract, budget_ms=50)
+    assert ocr.read_label(labeled_mammogram()) == (None, None)
+    assert ocr.stats()["timeouts"] == 1 and ocr.stats()["entries"] == 0
+
+    ocr.budget_ms = 5000
+    assert ocr.read_label(labeled_mammogram()) == ("R", "CC")
+    print("✅ Time budget enforced, timed-out reads retried")
+
+
+def test_tesseract_error_is_not_a_timeout():
+    class TesseractError(RuntimeError):
+        """Stands in for pytesseract.TesseractError, which subclasses RuntimeError"""
+
+    def failing(image, config="", timeout=0):
+        raise TesseractError(1, "Error opening data file eng.traineddata")
+
+    ocr = LabelOCR(image_to_string=failing)
+    assert ocr.read_label(labeled_mammogram()) == (None, None)
+    assert ocr.stats()["timeouts"] == 0 and ocr.stats()["entries"] == 0
+
+
+def test_candidates_dark_text_on_white():
+    """Candidates are deduplicated, trimmed, and have a white background whatever the label's polarity"""
+    img_array = labeled_mammogram()
+    for array in (img_array, 255 - img_array):
+        candidates = label_candidates(label_regions(array))
+        assert 0 < len(candidates) <= 25
+        for candidate in candidates:
+            assert candidate.dtype == np.uint8
+            assert (candidate[0] == 255).all() and (candidate[:, 0] == 255).all()
+    assert label_candidates(label_regions(np.zeros((400, 300), dtype=np.uint8))) == []
+    print("✅ Candidates normalized to dark text on white")
+
+
+def test_unavailable_ocr():
+    ocr = LabelOCR(image_to_string=None)
+    ocr.image_to_string = None
+    assert not ocr.available
+    assert ocr.read_label(labeled_mammogram()) == (None, None)
+
+
+def test_parse_label():
+    assert parse_mammogram_label("L-CC") == ("L", "CC")
+    assert parse_mammogram_label("RMLO") == ("R", "MLO")
+    assert parse_mammogram_label("") == (None, None)
+
+
+if __name__ == "__main__":
+    test_one_batched_call_and_cache()
+    test_no_label_runs_both_passes_and_is_cached()
+    test_budget_cuts_off_and_is_not_cached()
+    test_tesseract_error_is_not_a_timeout()
+    test_candidates_dark_text_on_white()
+    test_unavailable_ocr()
+    test_parse_label()
+    print("\n✅ ALL LABEL OCR TESTS PASSED")
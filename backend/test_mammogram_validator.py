@@ -0,0 +1,123 @@
+"""
+Test the single-pass validator against a straightforward full-resolution version
+Every image must get the same decision, from the same check, as before the rewrite
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.synthetic import synthetic_mammogram
+from image_context import ImageContext
+from mammogram_validator import MammogramValidator
+from test_flower_rejection import colorful_object, flower_photo, transparent_png
+
+
+def reference_check(image):
+    """The checks as originally written: float64 copies of the full image. Returns the rejecting check, or ''"""
+    v = MammogramValidator
+    width, height = image.size
+    if image.mode in ("RGBA", "LA", "PA") or width < v.MIN_WIDTH or height < v.MIN_HEIGHT:
+        return "metadata"
+    if not v.MIN_ASPECT_RATIO <= width / height <= v.MAX_ASPECT_RATIO:
+        return "metadata"
+    if image.mode != "L":
+        rgb = np.asarray(image.convert("RGB")).astype(np.float64)
+        r, g, b = rgb[:, :, 0], rgb[:, :, 1], rgb[:, :, 2]
+        color_diff = (np.abs(r - g).mean() + np.abs(r - b).mean() + np.abs(g - b).mean()) / 3
+        saturation = (np.maximum(np.maximum(r, g), b) - np.minimum(np.minimum(r, g), b)).mean()
+        skin = np.mean((r > g) & (g > b) & (r > 100) & (r < 255)) * 100
+        if color_diff > v.MAX_COLOR_VARIANCE or saturation > 25 or skin > 15:
+            return "color"
+        gray = rgb.mean(axis=2)
+    else:
+        gray = np.asarray(image).astype(np.float64)
+    if not 3 <= gray.mean() <= 252 or gray.std() < 2:
+        return "intensity"
+    if np.mean((gray > 20) & (gray < 235)) * 100 < 0.1:
+        return "intensity"
+    if np.mean((gray < 10) | (gray >= 246)) > 0.95:
+        return "intensity"
+    return ""
+
+
+def image_set():
+    rng = np.random.default_rng(0)
+    images = {
+        "flower": flower_photo(),
+        "transparent": transparent_png(),
+        "colorful": colorful_object(),
+        "noise": Image.fromarray(rng.integers(0, 255, (900, 700, 3), dtype=np.uint8)),
+        "dark": Image.new("RGB", (800, 600), (2, 2, 2)),
+        "bright": Image.new("RGB", (800, 600), (254, 254, 254)),
+        "uniform": Image.new("RGB", (800, 600), (120, 120, 120)),
+        "tiny": Image.new("RGB", (5, 50)),
+        "panorama": Image.new("RGB", (2100, 100), (90, 90, 90)),
+    }
+    person = np.full((1080, 1920, 3), 240, dtype=np.uint8)
+    person[200:900, 600:1300] = (220, 180, 150)
+    images["person"] = Image.fromarray(person)
+    tinted = np.full((800, 600, 3), 130, dtype=np.uint8)
+    tinted[:, :, 1] -= 2
+    tinted[:, :, 2] -= 4
+    images["skin_tint"] = Image.fromarray(tinted)
+    pastel = np.full((800, 600, 3), 128, dtype=np.uint8)
+    pastel[:400] = (200, 130, 200)  # Saturated enough for the saturation check only
+    images["pastel"] = Image.fromarray(pastel)
+    two_tone = np.zeros((800, 600), dtype=np.uint8)
+    two_tone[:, 300:] = 255
+    two_tone[:20] = 128  # Some tissue, but 97% of pixels at the extremes
+    images["two_tone"] = Image.fromarray(two_tone)
+    extreme = np.zeros((800, 600), dtype=np.uint8)
+    extreme[:2, :2] = 100
+    extreme[400:] = 255
+    images["extreme_gray"] = Image.fromarray(extreme)
+    for seed in range(4):
+        mammogram = synthetic_mammogram(seed, 1500, 1800, pectoral=seed % 2 == 0, calcifications=10 * seed)
+        images[f"mammogram_{seed}"] = mammogram
+        images[f"mammogram_{seed}_L"] = mammogram.convert("L")
+    return images
+
+
+IMAGES = image_set()
+
+
+@pytest.mark.parametrize("name", sorted(IMAGES))
+def test_same_decisions_as_reference(name):
+    image = IMAGES[name]
+    result = MammogramValidator().check(image, ImageContext(image))
+    assert result.check == reference_check(image)
+    assert result.is_valid == (result.check == "") and bool(result.message) != result.is_valid
+    if name.startswith("mammogram"):
+        assert result.is_valid
+
+
+def test_early_exit_and_timings():
+    validator = MammogramValidator()
+    # Rejected from metadata: no pixel is read
+    context = ImageContext(transparent_png())
+    result = validator.check(context.image, context)
+    assert list(result.timings) == ["metadata"] and "rgb" not in vars(context)
+
+    result = validator.check(colorful_object())
+    assert result.check == "color" and list(result.timings) == ["metadata", "thumbnail", "color"]
+
+    mammogram = IMAGES["mammogram_1"]
+    result = validator.check(mammogram)
+    assert list(result.timings) == ["metadata", "thumbnail", "color", "intensity"]
+    assert all(seconds >= 0 for seconds in result.timings.values())
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        assert validator.validate(mammogram) == (True, "")
+    assert output.getvalue() == ""  # The edge-density note is no longer computed
+    print("✅ Validator stops at the first failing check and times each one")
+
+
+if __name__ == "__main__":
+    for image_name in sorted(IMAGES):
+        test_same_decisions_as_reference(image_name)
+    print("✅ Validator decisions match the full-resolution reference")
+    test_early_exit_and_timings()
+    print("\n✅ ALL MAMMOGRAM VALIDATOR TESTS PASSED")
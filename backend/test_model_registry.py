@@ -0,0 +1,144 @@
+"""
+Test the model registry
+Concurrent first requests must share one load, and a reload must never take the
+model away from requests already using it
+"""
+
+import threading
+import time
+
+import pytest
+
+from model_registry import ModelRegistry
+from serve import read_model_request, write_model_request
+
+
+class SlowLoader:
+    """Stand-in for keras load_model: returns the file contents after a delay"""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ValueError("corrupt model file")
+        return path.read_text()
+
+
+def test_concurrent_first_requests_load_once(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_text("weights-v1")
+    loader = SlowLoader()
+    registry = ModelRegistry(path, loader)
+    results = [None] * 8
+
+    def worker(i):
+        results[i] = registry.get()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(results))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loader.calls == 1
+    assert results == ["weights-v1"] * len(results)
+    assert registry.stats()["loads"] == 1
+    print("✅ Concurrent first requests share one load")
+
+
+def test_version_is_known_before_loading(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_text("weights-v1")
+    registry = ModelRegistry(path, SlowLoader())
+    version = registry.version()
+    assert version.startswith("model-") and not registry.loaded
+    assert registry.current().version == version
+    assert ModelRegistry(tmp_path / "missing.keras", SlowLoader()).version() == "unknown"
+    with pytest.raises(RuntimeError):
+        ModelRegistry(tmp_path / "missing.keras", SlowLoader()).get()
+
+
+def test_reload_swaps_without_dropping_in_flight(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_text("weights-v1")
+    registry = ModelRegistry(path, SlowLoader(delay=0.2))
+    in_flight = registry.current()
+
+    new_path = tmp_path / "model_v2.keras"
+    new_path.write_text("weights-v2")
+    reloader = threading.Thread(target=registry.reload, args=(new_path,))
+    reloader.start()
+    time.sleep(0.05)
+    # Still loading: requests keep getting the old model without waiting
+    started = time.perf_counter()
+    assert registry.get() == "weights-v1"
+    assert time.perf_counter() - started < 0.1
+    reloader.join()
+
+    assert registry.get() == "weights-v2"
+    assert registry.version() != in_flight.version
+    assert in_flight.model == "weights-v1"  # The request that started earlier keeps its model
+    assert registry.stats()["reloads"] == 1
+    print("✅ Reload swaps the model for new requests only")
+
+
+def test_failed_reload_keeps_serving(tmp_path):
+    path = tmp_path / "model.keras"
+    path.write_text("weights-v1")
+    loader = SlowLoader(delay=0)
+    registry = ModelRegistry(path, loader)
+    version = registry.version()
+    registry.get()
+
+    loader.fail = True
+    with pytest.raises(ValueError):
+        registry.reload()
+
+    def reject(model):
+        raise RuntimeError("prediction is not a probability")
+
+    loader.fail = False
+    path.write_text("weights-v2")
+    with pytest.raises(RuntimeError):
+        registry.reload(check=reject)
+
+    assert registry.get() == "weights-v1" and registry.version() == version
+    stats = registry.stats()
+    assert stats["failed_reloads"] == 2 and "probability" in stats["last_error"]
+    print("✅ A failed reload leaves the old model serving")
+
+
+def test_install_in_memory_model():
+    registry = ModelRegistry("unused.keras", SlowLoader())
+    loaded = registry.install("in-memory", version="random-weights-seed0")
+    assert registry.get() == "in-memory" and registry.version() == "random-weights-seed0"
+    assert loaded.checksum is None and registry.stats()["loads"] == 0
+
+
+def test_prefork_model_request_file(tmp_path):
+    """Pre-fork workers share the requested model path and which worker already loaded it"""
+    path_file = str(tmp_path / "serve-model.json")
+    assert read_model_request(path_file) == {}
+    write_model_request(path_file, None)
+    assert read_model_request(path_file) == {"path": None, "origin_pid": None}
+    write_model_request(path_file, "/models/v2.keras", 1234)
+    assert read_model_request(path_file) == {"path": "/models/v2.keras", "origin_pid": 1234}
+    assert [p.name for p in tmp_path.iterdir()] == ["serve-model.json"]
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_concurrent_first_requests_load_once, test_version_is_known_before_loading,
+                 test_reload_swaps_without_dropping_in_flight, test_failed_reload_keeps_serving,
+                 test_prefork_model_request_file):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    test_install_in_memory_model()
+    print("\n✅ ALL MODEL REGISTRY TESTS PASSED")
@@ -0,0 +1,102 @@
+"""
+Test the near-duplicate perceptual hash index
+Indexed lookups must find exactly what a scan over every stored hash finds
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.bench_duplicates import near, random_hashes, run
+from duplicate_detector import DuplicateDetector, index_bands
+from phash_index import HammingIndex, hamming
+
+
+def brute_force(stored, h, max_distance):
+    distances = [(hamming(h, s), i) for i, s in enumerate(stored) if hamming(h, s) <= max_distance]
+    return min(distances)[0] if distances else None
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "clustered"])
+def test_matches_brute_force(distribution):
+    rng = np.random.default_rng(7)
+    stored = random_hashes(rng, 2000, distribution)
+    assert all(0 <= h < 2 ** 64 for h in stored) and max(stored) >= 2 ** 63
+    index = HammingIndex()
+    for i, h in enumerate(stored):
+        index.add(h, i)
+
+    queries = [near(rng, stored[i]) for i in rng.integers(0, len(stored), 200)]
+    queries += random_hashes(rng, 200, distribution)
+    for q in queries:
+        match = index.nearest(q, 3)
+        expected = brute_force(stored, q, 3)
+        assert (match[1] if match else None) == expected
+        if match:
+            assert hamming(q, stored[match[0]]) == match[1]
+    print("✅ Indexed search matches a full scan")
+
+
+def test_add_remove_and_limits():
+    index = HammingIndex()
+    index.add(0b1011, "a.png")
+    index.add(0b1011, "b.png")  # Same hash again replaces the value
+    assert len(index) == 1 and index.nearest(0b1010, 3) == ("b.png", 1)
+    assert index.remove(0b1011) == "b.png" and index.remove(0b1011) is None
+    assert index.nearest(0b1011, 3) is None and len(index) == 0
+    with pytest.raises(ValueError):
+        index.nearest(0, 4)  # 4 bands cannot guarantee a shared band at distance 4
+    assert index_bands(3) == 4 and index_bands(5) == 8
+    for out_of_range in (-1, 2 ** 64):
+        with pytest.raises(ValueError):
+            index.add(out_of_range, "signed.png")
+        with pytest.raises(ValueError):
+            index.nearest(out_of_range, 3)
+    index.add(2 ** 64 - 1, "top.png")
+    assert index.nearest(2 ** 64 - 2, 3) == ("top.png", 1)
+
+
+def test_detector_uses_index():
+    detector = DuplicateDetector()
+    base = np.zeros((64, 64), dtype=np.uint8)
+    base[:32, :32] = 200
+    first = Image.fromarray(base)
+    assert detector.check_duplicate(b"first", first, "first.png") == (False, "")
+    # Checking stores nothing: an upload whose analysis failed can be retried
+    assert detector.check_duplicate(b"first", first, "retry.png") == (False, "")
+    assert detector.count() == 0
+    detector.remember(*detector.fingerprint(b"first", first), "first.png")
+
+    is_dup, message = detector.check_duplicate(b"first", first, "again.png")
+    assert is_dup and "Exact duplicate" in message and "first.png" in message
+
+    # Different bytes, same picture: caught by the perceptual hash
+    is_dup, message = detector.check_duplicate(b"re-encoded", first.copy(), "copy.png")
+    assert is_dup and "similarity: 64/64" in message
+
+    other = Image.fromarray(np.ascontiguousarray(base.T[::-1]))
+    assert detector.check_duplicate(b"other", other, "other.png") == (False, "")
+    detector.remember(*detector.fingerprint(b"other", other), "other.png")
+    assert detector.count() == 2
+    detector.clear()
+    assert detector.count() == 0
+    print("✅ Duplicate detector finds exact and near duplicates")
+
+
+def test_benchmark_runs():
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run([1000], queries=50)
+    assert results[0]["stored"] == 1000 and results[0]["index_hit"]["p50_us"] > 0
+    assert "linear_miss" in results[0]
+
+
+if __name__ == "__main__":
+    test_matches_brute_force("uniform")
+    test_matches_brute_force("clustered")
+    test_add_remove_and_limits()
+    test_detector_uses_index()
+    test_benchmark_runs()
+    print("\n✅ ALL PERCEPTUAL HASH INDEX TESTS PASSED")
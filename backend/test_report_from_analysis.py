@@ -0,0 +1,242 @@
+"""
+Test building reports from a stored analysis
+An Analysis row must round-trip into everything generate_report_pdf needs, without the model
+"""
+
+import base64
+import io
+import re
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from analysis_store import analysis_record_fields, analysis_from_record, has_stored_images
+from api_routes import reports_router
+from auth import get_current_active_user
+from database import Analysis, Base, Report, User, get_db
+from report_generator import generate_report_pdf, generate_view_analysis
+
+
+def image_b64(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (120, 160), color).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def make_record():
+    analysis = {
+        "result": "Malignant (Cancerous)",
+        "probability": 82.0,
+        "confidence": 0.82,
+        "benign_prob": 18.0,
+        "malignant_prob": 82.0,
+        "risk_level": "High Risk",
+        "risk_icon": "🔴",
+        "risk_color": "red",
+        "stats": {"mean_intensity": 90.0, "std_intensity": 40.0, "min_intensity": 0.0,
+                  "max_intensity": 255.0, "brightness": 35.0, "contrast": 15.7},
+        "image_size": {"width": 120, "height": 160},
+        "file_format": "PNG",
+        "model_version": "breast_cancer_model-1a2b3c4d5e6f",
+        "findings": {"regions": [{"cancer_type": "Mass", "confidence": 80.0}]},
+        "view_analysis": {"view_type": "Right MLO (Medio-Lateral Oblique)", "laterality": "Right"},
+    }
+    images_b64 = {
+        "original": image_b64((90, 90, 90)),
+        "overlay_image": image_b64((200, 50, 50)),
+        "heatmap_only": image_b64((0, 0, 255)),
+        "bbox_image": image_b64((90, 200, 90)),
+        "cancer_type_image": image_b64((120, 120, 0)),
+    }
+    fields = analysis_record_fields(analysis, images_b64)
+    return SimpleNamespace(id=1, filename="r_mlo.png", patient=None, **fields), analysis
+
+
+def test_record_round_trip():
+    """Fields used by the PDF must survive the trip through the Analysis row"""
+    record, original = make_record()
+    analysis, images = analysis_from_record(record)
+
+    for key in ("result", "probability", "confidence", "benign_prob", "malignant_prob", "risk_level", "model_version"):
+        assert analysis[key] == original[key], key
+    assert analysis["findings"] == original["findings"]
+    assert analysis["view_analysis"]["view_type"] == original["view_analysis"]["view_type"]
+    assert images["overlay_image"].getpixel((0, 0)) == (200, 50, 50)
+    assert has_stored_images(record)
+    print("✅ Stored analysis round-trips into report inputs")
+
+
+def test_missing_images_render_from_stored_heatmap():
+    """Rows saved with only the original and the render state still produce every image"""
+    record, original = make_record()
+    heatmap = np.zeros((12, 12), dtype=np.float32)
+    heatmap[3:6, 3:6] = 1.0
+    fields = analysis_record_fields(
+        original,
+        {"original": image_b64((90, 90, 90))},
+        render_state={"heatmap": heatmap.tolist(), "boxes": []},
+    )
+    record = SimpleNamespace(id=2, filename="lazy.png", patient=None, **fields)
+    for column in ("overlay_image_b64", "heatmap_image_b64", "bbox_image_b64", "cancer_type_image_b64"):
+        setattr(record, column, getattr(record, column, None))
+
+    assert has_stored_images(record)
+    _, images = analysis_from_record(record)
+    assert images["overlay_image"].size == (120, 160)
+    assert images["heatmap_only"] is not None
+    print("✅ Missing images rendered from the stored heatmap")
+
+
+def test_pdf_from_stored_analysis():
+    """A PDF can be built from the stored row alone"""
+    record, _ = make_record()
+    analysis, images = analysis_from_record(record)
+    view_analysis = generate_view_analysis(analysis, images["original"])
+    assert "mlo" in view_analysis
+
+    pdf = generate_report_pdf(
+        result=analysis["result"],
+        probability=analysis["probability"],
+        risk_level=analysis["risk_level"],
+        benign_prob=analysis["benign_prob"],
+        malignant_prob=analysis["malignant_prob"],
+        stats=analysis["stats"],
+        image_size=(analysis["image_size"]["width"], analysis["image_size"]["height"]),
+        file_format=analysis["file_format"],
+        original_image=images["original"],
+        overlay_image=images["overlay_image"],
+        heatmap_only=images["heatmap_only"],
+        bbox_image=images["bbox_image"],
+        cancer_type_image=images["cancer_type_image"],
+        confidence=analysis["confidence"],
+        findings=analysis["findings"],
+        view_analysis=view_analysis,
+    )
+    assert pdf.startswith(b"%PDF")
+    print(f"✅ Report built from stored analysis ({len(pdf)} bytes)")
+
+
+def pdf_text(pdf):
+    """Decompressed content of every stream in the PDF, enough to look for the printed fields"""
+    streams = re.findall(rb"stream\r?\n(.*?)endstream", pdf, re.S)
+    return b"".join(zlib.decompressobj().decompress(stream) for stream in streams).decode("latin-1")
+
+
+@pytest.fixture
+def api(tmp_path):
+    """Reports router on a private SQLite database; X-User picks the authenticated user"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'reports.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    db = session_factory()
+    for user_id in (1, 2):
+        db.add(User(id=user_id, email=f"user{user_id}@example.com", name=f"User {user_id}", password_hash="x"))
+    record, analysis = make_record()
+    db.add(Analysis(user_id=1, **vars(record)))
+    db.add(Analysis(id=2, user_id=1, filename="no_images.png", **analysis_record_fields(analysis, {})))
+    db.commit()
+    db.close()
+
+    def session():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def current_user(request: Request):
+        db = session_factory()
+        try:
+            return db.get(User, int(request.headers["X-User"]))
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(reports_router)
+    app.dependency_overrides[get_db] = session
+    app.dependency_overrides[get_current_active_user] = current_user
+    return TestClient(app), session_factory
+
+
+def test_report_route_owner_only(api):
+    """Only the owner of the analysis gets a report; stored images are required"""
+    client, session_factory = api
+    response = client.post("/reports/1", json={"patient_name": "Jane Roe"}, headers={"X-User": "1"})
+    assert response.status_code == 200 and response.content.startswith(b"%PDF")
+    assert response.headers["content-type"] == "application/pdf"
+    report_id = int(response.headers["X-Report-Id"])
+
+    assert client.post("/reports/1", json={}, headers={"X-User": "2"}).status_code == 404
+    assert client.post("/reports/99", headers={"X-User": "1"}).status_code == 404
+    missing = client.post("/reports/2", headers={"X-User": "1"})
+    assert missing.status_code == 409 and "no stored images" in missing.json()["detail"]
+
+    db = session_factory()
+    assert [r.id for r in db.query(Report).all()] == [report_id]
+    db.close()
+    print("✅ Report route checks ownership and stored images")
+
+
+def test_regenerate_overwrites_pdf(api):
+    """Regenerating replaces the stored PDF and keeps fields that are not supplied"""
+    client, session_factory = api
+    first = client.post("/reports/1", json={"report_by": "Dr. A", "department": "Breast Imaging"},
+                        headers={"X-User": "1"})
+    report_id = int(first.headers["X-Report-Id"])
+
+    assert client.post(f"/reports/{report_id}/regenerate", json={}, headers={"X-User": "2"}).status_code == 404
+    regenerated = client.post(f"/reports/{report_id}/regenerate", json={"report_by": "Dr. B"},
+                              headers={"X-User": "1"})
+    assert regenerated.status_code == 200
+    assert int(regenerated.headers["X-Report-Id"]) == report_id
+    assert regenerated.headers["X-Report-Number"] == first.headers["X-Report-Number"]
+
+    db = session_factory()
+    report = db.get(Report, report_id)
+    assert report.pdf_data == regenerated.content != first.content
+    assert (report.report_by, report.department) == ("Dr. B", "Breast Imaging")
+    assert db.query(Report).count() == 1
+    db.close()
+    print("✅ Regenerate overwrites the report in place")
+
+
+def test_regenerate_keeps_patient_fields(api):
+    """Correcting only the radiologist must not replace the patient details on the report"""
+    client, session_factory = api
+    patient = {"patient_name": "Jane Roe", "patient_age": "52", "patient_sex": "Female", "patient_hn": "HN-0042"}
+    first = client.post("/reports/1", json={**patient, "report_by": "Dr. A"}, headers={"X-User": "1"})
+    report_id = int(first.headers["X-Report-Id"])
+
+    regenerated = client.post(f"/reports/{report_id}/regenerate", json={"report_by": "Dr. B"},
+                              headers={"X-User": "1"})
+    assert regenerated.status_code == 200
+
+    db = session_factory()
+    report = db.get(Report, report_id)
+    assert {field: getattr(report, field) for field in patient} == patient
+    assert report.report_by == "Dr. B"
+    db.close()
+    text = pdf_text(regenerated.content)
+    assert "Jane Roe" in text and "HN-0042" in text and "Patient Name" not in text
+    print("✅ Regenerate keeps the stored patient details")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_record_round_trip()
+    test_missing_images_render_from_stored_heatmap()
+    test_pdf_from_stored_analysis()
+    for test in (test_report_route_owner_only, test_regenerate_overwrites_pdf, test_regenerate_keeps_patient_fields):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(api.__wrapped__(Path(tmp)))
+    print("\n✅ ALL STORED REPORT TESTS PASSED")
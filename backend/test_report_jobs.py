@@ -0,0 +1,140 @@
+"""
+Test the in-process report job queue
+Jobs must run in the background, report failures, respect the queue bound and expire
+"""
+
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from analysis_executor import QueueFullError
+from database import Base, ReportJob
+from report_jobs import LOST_JOB_ERROR, DatabaseJobStore, ReportJobQueue
+
+
+def wait_for(jobs, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_runs_in_background():
+    """submit() returns before the work is done; the result shows up on the job"""
+    jobs = ReportJobQueue(workers=1)
+    release = threading.Event()
+
+    job = jobs.submit(lambda: release.wait(5) and {"report_id": 7})
+    assert job["status"] == "queued"
+    release.set()
+
+    finished = wait_for(jobs, job["job_id"])
+    assert finished["status"] == "done"
+    assert finished["result"] == {"report_id": 7}
+    print("✅ Job completed in the background")
+
+
+def test_failure_is_reported():
+    """Exceptions become a failed status with the error message"""
+    jobs = ReportJobQueue(workers=1)
+
+    def broken():
+        raise ValueError("not a mammogram")
+
+    finished = wait_for(jobs, jobs.submit(broken)["job_id"])
+    assert finished["status"] == "failed"
+    assert "not a mammogram" in finished["error"]
+    print("✅ Failed job carries its error")
+
+
+def test_queue_bound_and_ttl():
+    """Submissions beyond the bound are rejected; finished jobs expire after the TTL"""
+    jobs = ReportJobQueue(workers=1, max_queue=1, ttl_seconds=0.05, retry_after=3)
+    release = threading.Event()
+
+    running = jobs.submit(release.wait, 5)
+    deadline = time.time() + 5
+    while jobs.get(running["job_id"])["status"] != "running" and time.time() < deadline:
+        time.sleep(0.01)
+    waiting = jobs.submit(lambda: "second")
+    try:
+        jobs.submit(lambda: "third")
+        assert False, "Expected QueueFullError"
+    except QueueFullError as e:
+        assert e.retry_after == 3
+    assert jobs.get(waiting["job_id"])["queue_position"] == 0
+
+    release.set()
+    wait_for(jobs, waiting["job_id"])
+    time.sleep(0.1)
+    assert jobs.get(running["job_id"]) is None, "Finished job should have expired"
+
+    stats = jobs.stats()
+    assert stats["rejected"] == 1 and stats["expired"] == 2
+    print("✅ Queue bound enforced and finished jobs expired")
+
+
+def test_other_worker_sees_job_through_store(tmp_path):
+    """A job run by one worker can be polled from another worker sharing the database"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine, tables=[ReportJob.__table__])
+    store = DatabaseJobStore(sessionmaker(bind=engine))
+    worker_a = ReportJobQueue(workers=1, ttl_seconds=0.2, store=store)
+    worker_b = ReportJobQueue(workers=1, ttl_seconds=0.2, store=store)
+    release = threading.Event()
+
+    job = worker_a.submit(lambda: release.wait(5) and {"report_id": 7})
+    assert worker_b.get(job["job_id"])["status"] in ("queued", "running")
+    release.set()
+    wait_for(worker_a, job["job_id"])
+    seen = worker_b.get(job["job_id"])
+    assert seen["status"] == "done" and seen["result"] == {"report_id": 7}
+    assert abs(seen["finished_at"] - worker_a.get(job["job_id"])["finished_at"]) < 1e-3
+
+    failed = wait_for(worker_a, worker_a.submit(lambda: 1 / 0)["job_id"])
+    assert worker_b.get(failed["job_id"])["error"] == failed["error"]
+    assert worker_b.get("unknown") is None
+
+    time.sleep(0.3)
+    assert worker_b.get(job["job_id"]) is None, "Expired jobs are not served from the store"
+    assert store.load(job["job_id"]) is None, "Expired rows are purged"
+    print("✅ Job status shared through the database")
+
+
+def test_job_of_dead_worker_fails(tmp_path):
+    """A job left running by a worker that died is reported failed once stale, and marked so in the table"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine, tables=[ReportJob.__table__])
+    store = DatabaseJobStore(sessionmaker(bind=engine))
+    now = time.time()
+    for job_id, created_at in (("lost", now - 120), ("recent", now - 5)):
+        store.save({"job_id": job_id, "status": "running", "created_at": created_at, "started_at": created_at,
+                    "finished_at": None, "result": None, "error": None})
+
+    restarted = ReportJobQueue(workers=1, store=store, stale_seconds=60)
+    lost = restarted.get("lost")
+    assert lost["status"] == "failed" and lost["error"] == LOST_JOB_ERROR and lost["finished_at"] >= now
+    assert restarted.get("recent")["status"] == "running"
+    stored = store.load("lost")
+    assert stored["status"] == "failed" and stored["finished_at"] is not None
+    assert store.load("recent")["status"] == "running"
+    print("✅ Jobs of dead workers fail instead of running forever")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_job_runs_in_background()
+    test_failure_is_reported()
+    test_queue_bound_and_ttl()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_other_worker_sees_job_through_store(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_job_of_dead_worker_fails(Path(tmp))
+    print("\n✅ ALL REPORT JOB TESTS PASSED")
@@ -9,6 +9,7 @@ import { useNavigate } from "react-router-dom";
 import FullComparisonView from "./components/FullComparisonView";
 import html2pdf from "html2pdf.js";
 import { getFileHash, getPerceptualHash, hammingDistance } from "./utils/imageHash";
+import { sessionHeaders } from "./utils/session";
 
 const getDefaultApiBase = () => {
   // Auto-detect: Use local backend when running on localhost
@@ -45,7 +46,12 @@ const buildEndpoint = (base, endpoint) => {
 
 
 
-const asDataUrl = (value) => (value ? `data:image/png;base64,${value}` : null);
+// /analyze returns either image URLs (served by the backend) or inline base64 PNGs
+const asImageSrc = (base, value, mediaType = "image/png") => {
+  if (!value) return null;
+  if (value.startsWith("/")) return buildEndpoint(base, value);
+  return `data:${mediaType};base64,${value}`;
+};
 
 function AppContent() {
   const apiBase = useMemo(() => getDefaultApiBase(), []);
@@ -534,7 +540,7 @@ function AppContent() {
     try {
       const endpoint = "/clear-duplicates";
       const currentApiUrl = apiUrl(endpoint);
-      await fetch(currentApiUrl, { method: "POST" });
+      await fetch(currentApiUrl, { method: "POST", headers: sessionHeaders() });
     } catch (error) {
       console.warn("Could not clear backend duplicates:", error);
     }
@@ -635,6 +641,7 @@ function AppContent() {
 
     const response = await fetch(currentApiUrl, {
       method: "POST",
+      headers: sessionHeaders(),
       body: formData,
       signal: controller.signal,
     });
@@ -656,11 +663,11 @@ function AppContent() {
     return {
       fileName: selectedFile.name,
       index: index,
-      original: asDataUrl(images.original),
-      overlay: asDataUrl(images.overlay),
-      heatmap: asDataUrl(images.heatmap_only),
-      bbox: asDataUrl(images.bbox),
-      cancer_type: asDataUrl(images.cancer_type),
+      original: asImageSrc(apiBase, images.original, data.image_media_type),
+      overlay: asImageSrc(apiBase, images.overlay, data.image_media_type),
+      heatmap: asImageSrc(apiBase, images.heatmap_only, data.image_media_type),
+      bbox: asImageSrc(apiBase, images.bbox, data.image_media_type),
+      cancer_type: asImageSrc(apiBase, images.cancer_type, data.image_media_type),
       malignant: data.malignant_prob ?? null,
       benign: data.benign_prob ?? null,
       risk: data.risk_level ?? "Unavailable",
@@ -810,6 +817,7 @@ function AppContent() {
 
       const response = await fetch(currentApiUrl, {
         method: "POST",
+        headers: sessionHeaders(),
         body: formData,
         signal: controller.signal,
       });
@@ -830,11 +838,11 @@ function AppContent() {
           : data.confidence ?? null;
 
       const resultData = {
-        original: asDataUrl(images.original),
-        overlay: asDataUrl(images.overlay),
-        heatmap: asDataUrl(images.heatmap_only),
-        bbox: asDataUrl(images.bbox),
-        cancer_type: asDataUrl(images.cancer_type),
+        original: asImageSrc(apiBase, images.original, data.image_media_type),
+        overlay: asImageSrc(apiBase, images.overlay, data.image_media_type),
+        heatmap: asImageSrc(apiBase, images.heatmap_only, data.image_media_type),
+        bbox: asImageSrc(apiBase, images.bbox, data.image_media_type),
+        cancer_type: asImageSrc(apiBase, images.cancer_type, data.image_media_type),
         malignant: data.malignant_prob ?? null,
         benign: data.benign_prob ?? null,
         risk: data.risk_level ?? "Unavailable",
@@ -905,6 +913,7 @@ function AppContent() {
 
       const response = await fetch(currentApiUrl, {
         method: "POST",
+        headers: sessionHeaders(),
         body: formData,
         signal: controller.signal,
       });
@@ -925,11 +934,11 @@ function AppContent() {
           : data.confidence ?? null;
 
       const resultData = {
-        original: asDataUrl(images.original),
-        overlay: asDataUrl(images.overlay),
-        heatmap: asDataUrl(images.heatmap_only),
-        bbox: asDataUrl(images.bbox),
-        cancer_type: asDataUrl(images.cancer_type),
+        original: asImageSrc(apiBase, images.original, data.image_media_type),
+        overlay: asImageSrc(apiBase, images.overlay, data.image_media_type),
+        heatmap: asImageSrc(apiBase, images.heatmap_only, data.image_media_type),
+        bbox: asImageSrc(apiBase, images.bbox, data.image_media_type),
+        cancer_type: asImageSrc(apiBase, images.cancer_type, data.image_media_type),
         malignant: data.malignant_prob ?? null,
         benign: data.benign_prob ?? null,
         risk: data.risk_level ?? "Unavailable",
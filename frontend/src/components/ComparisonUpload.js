@@ -3,6 +3,7 @@ import { FiUploadCloud, FiLogOut } from "react-icons/fi";
 import { useAuth } from "../context/AuthContext";
 import { useNavigate } from "react-router-dom";
 import ComparisonView from "./ComparisonView";
+import { sessionHeaders } from "../utils/session";
 import "../App.css";
 
 const getDefaultApiBase = () => {
@@ -31,7 +32,12 @@ const buildEndpoint = (base, endpoint) => {
   return `${safeBase}${safeEndpoint}`;
 };
 
-const asDataUrl = (value) => (value ? `data:image/png;base64,${value}` : null);
+// /analyze returns either image URLs (served by the backend) or inline base64 PNGs
+const asImageSrc = (base, value, mediaType = "image/png") => {
+  if (!value) return null;
+  if (value.startsWith("/")) return buildEndpoint(base, value);
+  return `data:${mediaType};base64,${value}`;
+};
 
 function ComparisonUpload() {
   const apiBase = useMemo(() => getDefaultApiBase(), []);
@@ -205,6 +211,7 @@ function ComparisonUpload() {
 
       const response = await fetch(currentApiUrl, {
         method: "POST",
+        headers: sessionHeaders(),
         body: formData,
         signal: controller.signal,
       });
@@ -225,11 +232,11 @@ function ComparisonUpload() {
           : data.confidence ?? null;
 
       const resultData = {
-        original: asDataUrl(images.original),
-        overlay: asDataUrl(images.overlay),
-        heatmap: asDataUrl(images.heatmap_only),
-        bbox: asDataUrl(images.bbox),
-        cancer_type: asDataUrl(images.cancer_type),
+        original: asImageSrc(apiBase, images.original, data.image_media_type),
+        overlay: asImageSrc(apiBase, images.overlay, data.image_media_type),
+        heatmap: asImageSrc(apiBase, images.heatmap_only, data.image_media_type),
+        bbox: asImageSrc(apiBase, images.bbox, data.image_media_type),
+        cancer_type: asImageSrc(apiBase, images.cancer_type, data.image_media_type),
         malignant: data.malignant_prob ?? null,
         benign: data.benign_prob ?? null,
         risk: data.risk_level ?? "Unavailable",
@@ -0,0 +1,34 @@
+/**
+ * Browser session id sent with uploads, so the backend checks duplicates per session
+ * (and "Clear All Files" clears only this session's uploads)
+ */
+
+const SESSION_KEY = "duplicateSessionId";
+
+function newSessionId() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+/**
+ * Id of this tab's session, created on first use
+ * @returns {string}
+ */
+export function getSessionId() {
+  let id = sessionStorage.getItem(SESSION_KEY);
+  if (!id) {
+    id = newSessionId();
+    sessionStorage.setItem(SESSION_KEY, id);
+  }
+  return id;
+}
+
+/**
+ * Headers identifying this session to the backend
+ * @returns {Object}
+ */
+export function sessionHeaders() {
+  return { "X-Session-Id": getSessionId() };
+}
@@ -54,6 +54,8 @@ def test_exact_duplicate():
     print(f"First upload: {'DUPLICATE' if is_dup else 'UNIQUE'}")
     print(f"Message: {msg}")
     assert not is_dup, "First image should not be marked as duplicate"
+    # Analysis succeeded: the upload is remembered
+    detector.remember(*detector.fingerprint(data1, img1), "test_image_1.jpg")
     
     # Second upload of same file should be detected as duplicate
     is_dup, msg = detector.check_duplicate(data1, img1, "test_image_1_copy.jpg")
@@ -88,6 +90,7 @@ def test_perceptual_duplicate():
     is_dup, msg = detector.check_duplicate(data1, img1, "test_image_2a.jpg")
     print(f"First upload: {'DUPLICATE' if is_dup else 'UNIQUE'}")
     assert not is_dup, "First image should not be marked as duplicate"
+    detector.remember(*detector.fingerprint(data1, img1), "test_image_2a.jpg")
     img1.close()
     
     # Create very similar image (same content, slightly different compression)
@@ -132,6 +135,7 @@ def test_different_images():
     is_dup, msg = detector.check_duplicate(data1, img1, "test_image_3a.jpg")
     print(f"First upload (gradient image): {'DUPLICATE' if is_dup else 'UNIQUE'}")
     assert not is_dup, "First image should not be marked as duplicate"
+    detector.remember(*detector.fingerprint(data1, img1), "test_image_3a.jpg")
     img1.close()
     
     # Create different image (noise pattern)
@@ -176,6 +180,7 @@ def test_cache_clear():
     is_dup, msg = detector.check_duplicate(data, img, "test_image_4.jpg")
     print(f"First upload: {'DUPLICATE' if is_dup else 'UNIQUE'}")
     assert not is_dup, "First image should not be marked as duplicate"
+    detector.remember(*detector.fingerprint(data, img), "test_image_4.jpg")
     
     # Try to upload same image again (should be duplicate)
     is_dup, msg = detector.check_duplicate(data, img, "test_image_4.jpg")